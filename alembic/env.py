@@ -1,4 +1,5 @@
 from logging.config import fileConfig
+import re
 
 from sqlalchemy import create_engine
 from sqlalchemy import pool
@@ -28,6 +29,13 @@ sync_db_url = app_config.DB_URL.replace('postgresql+asyncpg', 'postgresql')
 config.set_main_option("sqlalchemy.url", sync_db_url)
 print(sync_db_url)
 
+
+def include_name(name, type_, parent_names):
+    # Hash partitions of contacts, made by src.database.partitions, are not
+    # in the models
+    return not (type_ == "table" and re.fullmatch(r"contacts_p\d+", name))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +58,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -72,7 +81,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,33 @@
+"""Birthday digest versions
+
+Revision ID: a6e2c8f4b017
+Revises: d9c3a5e7f148
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e2c8f4b017'
+down_revision: Union[str, None] = 'd9c3a5e7f148'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('birthday_digests') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.alter_column('day', existing_type=sa.Date(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DELETE FROM birthday_digests WHERE day IS NULL')
+    with op.batch_alter_table('birthday_digests') as batch_op:
+        batch_op.alter_column('day', existing_type=sa.Date(), nullable=False)
+        batch_op.drop_column('version')
@@ -0,0 +1,42 @@
+"""Hash partition contacts by user
+
+Revision ID: b5d1e7a3c824
+Revises: f2b8c4d6e913
+Create Date: 2026-10-19 18:00:00.000000
+
+This revision used to partition contacts when CONTACTS_PARTITIONS was set in
+the environment, which the schema did not record. Partitioning is now an
+explicit step, ``python -m src.database.partitions <count>``, and the
+revision changes nothing.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d1e7a3c824'
+down_revision: Union[str, None] = 'f2b8c4d6e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    partitioned = bind.execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'contacts'::regclass")
+    ).scalar()
+    if partitioned:
+        raise RuntimeError(
+            'contacts is partitioned; run "python -m src.database.partitions 0"'
+            ' before downgrading'
+        )
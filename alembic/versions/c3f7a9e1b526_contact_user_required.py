@@ -0,0 +1,41 @@
+"""Contacts require a user
+
+Revision ID: c3f7a9e1b526
+Revises: a6e2c8f4b017
+Create Date: 2026-10-19 19:00:00.000000
+
+Contacts without a user cannot be read by anyone, as every query filters on
+the user, and would not fit the ``(id, user_id)`` primary key of a
+partitioned table. They are deleted before the column becomes NOT NULL.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f7a9e1b526'
+down_revision: Union[str, None] = 'a6e2c8f4b017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('DELETE FROM contacts WHERE user_id IS NULL')
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql' and bind.execute(
+        sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'contacts'::regclass")
+    ).scalar():
+        # Part of the primary key of a partitioned table
+        return
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
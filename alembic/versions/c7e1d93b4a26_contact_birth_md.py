@@ -0,0 +1,44 @@
+"""Contact birthday month and day
+
+Revision ID: c7e1d93b4a26
+Revises: 8d4f6a2c9b15
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e1d93b4a26'
+down_revision: Union[str, None] = '8d4f6a2c9b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('birth_md', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE contacts SET birth_md = "
+            "EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday)"
+        )
+    else:
+        op.execute(
+            "UPDATE contacts SET birth_md = "
+            "CAST(strftime('%m', birthday) AS INTEGER) * 100 "
+            "+ CAST(strftime('%d', birthday) AS INTEGER)"
+        )
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('birth_md', existing_type=sa.SmallInteger(), nullable=False)
+    op.create_index('ix_contacts_user_birth_md', 'contacts', ['user_id', 'birth_md'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_birth_md', table_name='contacts')
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('birth_md')
@@ -0,0 +1,107 @@
+"""Normalized contact email and phone
+
+Revision ID: e3a9f5b7c210
+Revises: c7e1d93b4a26
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9f5b7c210'
+down_revision: Union[str, None] = 'c7e1d93b4a26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+
+# Frozen copies of src.database.models.normalize_email and normalize_phone as
+# of this revision, so later changes to them do not change this backfill
+def normalize_email(email):
+    normalized = (email or "").strip().lower()
+    return normalized or None
+
+
+def normalize_phone(phone, country_code="380"):
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if not phone.lstrip().startswith("+"):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            digits = country_code + digits[1:]
+    if not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    return f"+{digits}"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # A run interrupted during the backfill has committed the columns already
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('contacts')}
+    if 'email_normalized' not in columns:
+        op.add_column('contacts', sa.Column('email_normalized', sa.String(), nullable=True))
+    if 'phone_e164' not in columns:
+        op.add_column('contacts', sa.Column('phone_e164', sa.String(length=16), nullable=True))
+
+    # E.164 normalization is done in Python, in keyset batches by id. Each
+    # batch commits on its own, so rows are locked for one batch at a time
+    # rather than until the end of the migration.
+    contacts = sa.table(
+        'contacts',
+        sa.column('id', sa.Integer()),
+        sa.column('email', sa.String()),
+        sa.column('phone', sa.String()),
+        sa.column('email_normalized', sa.String()),
+        sa.column('phone_e164', sa.String()),
+    )
+    with op.get_context().autocommit_block():
+        with bind.engine.connect() as connection:
+            last_id = 0
+            while True:
+                with connection.begin():
+                    rows = connection.execute(
+                        sa.select(contacts.c.id, contacts.c.email, contacts.c.phone)
+                        .where(contacts.c.id > last_id)
+                        .order_by(contacts.c.id)
+                        .limit(BATCH_SIZE)
+                    ).all()
+                    if not rows:
+                        break
+                    connection.execute(
+                        contacts.update()
+                        .where(contacts.c.id == sa.bindparam('contact_id'))
+                        .values(
+                            email_normalized=sa.bindparam('email_value'),
+                            phone_e164=sa.bindparam('phone_value'),
+                        ),
+                        [
+                            {
+                                'contact_id': row.id,
+                                'email_value': normalize_email(row.email),
+                                'phone_value': normalize_phone(row.phone),
+                            }
+                            for row in rows
+                        ],
+                    )
+                last_id = rows[-1].id
+
+    op.create_index('ix_contacts_user_email_normalized', 'contacts', ['user_id', 'email_normalized'], unique=False)
+    op.create_index('ix_contacts_user_phone_e164', 'contacts', ['user_id', 'phone_e164'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_phone_e164', table_name='contacts')
+    op.drop_index('ix_contacts_user_email_normalized', table_name='contacts')
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('phone_e164')
+        batch_op.drop_column('email_normalized')
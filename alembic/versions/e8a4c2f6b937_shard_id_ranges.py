@@ -0,0 +1,34 @@
+"""Shard contact ID ranges
+
+Revision ID: e8a4c2f6b937
+Revises: c3f7a9e1b526
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4c2f6b937'
+down_revision: Union[str, None] = 'c3f7a9e1b526'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('shards',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('id_start', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name'),
+    sa.UniqueConstraint('id_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('shards')
@@ -0,0 +1,137 @@
+"""Contact name keys and duplicate reports
+
+Revision ID: f2b8c4d6e913
+Revises: e3a9f5b7c210
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from functools import lru_cache
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8c4d6e913'
+down_revision: Union[str, None] = 'e3a9f5b7c210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+
+# Frozen copy of src.database.models.phonetic_key as of this revision, so
+# later changes to it do not change this backfill
+TRANSLIT = dict(
+    zip(
+        "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя",
+        [
+            "a", "b", "v", "h", "g", "d", "e", "ie", "zh", "z", "y", "i", "i",
+            "i", "k", "l", "m", "n", "o", "p", "r", "s", "t", "u", "f", "kh",
+            "ts", "ch", "sh", "shch", "", "iu", "ia",
+        ],  # fmt: skip
+    )
+)
+
+SOUNDEX = {
+    letter: code
+    for letters, code in (
+        ("bfpv", "1"),
+        ("cgjkqsxz", "2"),
+        ("dt", "3"),
+        ("l", "4"),
+        ("mn", "5"),
+        ("r", "6"),
+    )
+    for letter in letters
+}
+
+
+@lru_cache(maxsize=65536)
+def soundex(name):
+    letters = [
+        ch
+        for ch in "".join(TRANSLIT.get(ch, ch) for ch in name.lower())
+        if "a" <= ch <= "z"
+    ]
+    if not letters:
+        return ""
+    code, previous = letters[0].upper(), SOUNDEX.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = SOUNDEX.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_key(first_name, last_name):
+    key = soundex(last_name or "") + soundex(first_name or "")
+    return key or None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # A run interrupted during the backfill has committed the column already
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('contacts')}
+    if 'name_key' not in columns:
+        op.add_column('contacts', sa.Column('name_key', sa.String(length=8), nullable=True))
+
+    # Phonetic keys are computed in Python, in keyset batches by id. Each
+    # batch commits on its own, so rows are locked for one batch at a time
+    # rather than until the end of the migration.
+    contacts = sa.table(
+        'contacts',
+        sa.column('id', sa.Integer()),
+        sa.column('first_name', sa.String()),
+        sa.column('last_name', sa.String()),
+        sa.column('name_key', sa.String()),
+    )
+    with op.get_context().autocommit_block():
+        with bind.engine.connect() as connection:
+            last_id = 0
+            while True:
+                with connection.begin():
+                    rows = connection.execute(
+                        sa.select(contacts.c.id, contacts.c.first_name, contacts.c.last_name)
+                        .where(contacts.c.id > last_id)
+                        .order_by(contacts.c.id)
+                        .limit(BATCH_SIZE)
+                    ).all()
+                    if not rows:
+                        break
+                    connection.execute(
+                        contacts.update()
+                        .where(contacts.c.id == sa.bindparam('contact_id'))
+                        .values(name_key=sa.bindparam('key')),
+                        [
+                            {
+                                'contact_id': row.id,
+                                'key': phonetic_key(row.first_name, row.last_name),
+                            }
+                            for row in rows
+                        ],
+                    )
+                last_id = rows[-1].id
+
+    op.create_index('ix_contacts_user_name_key', 'contacts', ['user_id', 'name_key', 'birthday'], unique=False)
+    op.create_table('duplicate_reports',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('clusters', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('duplicate_reports')
+    op.drop_index('ix_contacts_user_name_key', table_name='contacts')
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.drop_column('name_key')
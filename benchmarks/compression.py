@@ -0,0 +1,76 @@
+"""
+Compare the CPU cost of response compression with the bytes it saves.
+
+Builds contact list pages of several sizes from the seed data generator,
+serializes them the way the API does and compresses each with every gzip
+level and brotli quality::
+
+    python -m benchmarks.compression --pages 50,100,500,1000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.database.seed import contact_row
+from src.schemas import ContactResponse
+from src.services.compression import BrotliStream, GzipStream
+
+CODECS = {
+    **{f"gzip-{level}": (GzipStream, level) for level in (1, 6, 9)},
+    **{f"br-{quality}": (BrotliStream, quality) for quality in (1, 4, 6, 11)},
+}
+
+
+def page(limit: int) -> bytes:
+    rnd = random.Random(limit)
+    contacts = [
+        ContactResponse(id=i, **contact_row(rnd, 1, date(2025, 1, 1)))
+        for i in range(limit)
+    ]
+    return JSONResponse(jsonable_encoder(contacts)).body
+
+
+def measure(codec, setting: int, body: bytes, iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        stream = codec(setting)
+        data = stream.compress(body) + stream.finish()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        "median_ms": median * 1000,
+        "size": len(data),
+        "ratio": len(body) / len(data),
+        "mb_per_s": len(body) / median / 1e6,
+    }
+
+
+def main(args):
+    for limit in args.pages:
+        body = page(limit)
+        print(f"page of {limit} contacts: {len(body)} bytes")
+        for name, (codec, setting) in CODECS.items():
+            stats = measure(codec, setting, body, args.iterations)
+            print(
+                f"{name:>8}: {stats['median_ms']:8.3f}ms  {stats['size']:8d}B"
+                f"  ratio {stats['ratio']:5.2f}  saved {len(body) - stats['size']:8d}B"
+                f"  {stats['mb_per_s']:7.1f}MB/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--pages",
+        type=lambda value: [int(limit) for limit in value.split(",")],
+        default=[50, 100, 500, 1000],
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    main(parser.parse_args())
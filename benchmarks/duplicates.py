@@ -0,0 +1,141 @@
+"""
+Time a duplicate scan of one large address book::
+
+    python -m benchmarks.duplicates --contacts 1000000
+    python -m benchmarks.duplicates --contacts 1000000 --db-url postgresql+asyncpg://...
+
+Contacts come from the seed data generator; ``--duplicate-rate`` of them are
+copies of an earlier contact with the phone, email or name written
+differently, so the scan has real clusters to find.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import (
+    Base,
+    Contact,
+    User,
+    normalize_email,
+    normalize_phone,
+    phonetic_key,
+    transliterate,
+)
+from src.database.seed import contact_row
+from src.repositories.duplicates import DuplicateRepository
+from src.services.duplicates import find_clusters
+
+DATA_DIR = Path(".bench")
+BATCH = 10_000
+
+
+def variant(rnd: random.Random, row: dict) -> dict:
+    """
+    A copy of a contact as a second import might have written it.
+    """
+    copy = dict(row)
+    change = rnd.choice(("phone", "email", "name"))
+    if change == "phone":
+        copy["phone"] = (
+            "0" + row["phone"][-9:] if row["phone"][0] == "+" else row["phone"]
+        )
+        copy["email"] = f"other{rnd.randrange(10**9)}@example.com"
+    elif change == "email":
+        copy["email"] = row["email"].upper()
+        copy["phone"] = f"+38067{rnd.randrange(10**7):07d}"
+    else:
+        copy["first_name"] = transliterate(row["first_name"]).title()
+        copy["last_name"] = transliterate(row["last_name"]).title()
+        copy["email"] = f"other{rnd.randrange(10**9)}@example.com"
+        copy["phone"] = f"+38068{rnd.randrange(10**7):07d}"
+    copy["email_normalized"] = normalize_email(copy["email"])
+    copy["phone_e164"] = normalize_phone(copy["phone"])
+    copy["name_key"] = phonetic_key(copy["first_name"], copy["last_name"])
+    return copy
+
+
+async def seed(engine, contacts: int, duplicate_rate: float) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        user_id = (
+            await conn.execute(select(User.id).where(User.username == "dup_bench"))
+        ).scalar()
+        if user_id is not None:
+            count = (
+                await conn.execute(
+                    select(func.count()).where(Contact.user_id == user_id)
+                )
+            ).scalar()
+            if count == contacts:
+                return user_id
+            raise RuntimeError(f"database already holds {count} contacts")
+
+        user_id = (
+            await conn.execute(
+                insert(User)
+                .values(username="dup_bench", email="dup_bench@example.com")
+                .returning(User.id)
+            )
+        ).scalar()
+        rnd = random.Random(contacts)
+        today = date(2025, 1, 1)
+        originals = []
+        for start in range(0, contacts, BATCH):
+            rows = []
+            for _ in range(min(BATCH, contacts - start)):
+                if originals and rnd.random() < duplicate_rate:
+                    rows.append(variant(rnd, rnd.choice(originals)))
+                else:
+                    row = contact_row(rnd, user_id, today)
+                    rows.append(row)
+                    if len(originals) < 100_000:
+                        originals.append(row)
+            await conn.execute(insert(Contact), rows)
+    return user_id
+
+
+async def run(args) -> None:
+    if args.db_url:
+        url = args.db_url
+    else:
+        DATA_DIR.mkdir(exist_ok=True)
+        url = f"sqlite+aiosqlite:///{DATA_DIR / f'duplicates_{args.contacts}.db'}"
+    engine = create_async_engine(url)
+
+    start = time.perf_counter()
+    user_id = await seed(engine, args.contacts, args.duplicate_rate)
+    print(f"Seeded {args.contacts} contacts in {time.perf_counter() - start:.1f}s")
+
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    for _ in range(args.iterations):
+        async with session_maker() as session:
+            start = time.perf_counter()
+            clusters = await find_clusters(
+                DuplicateRepository(session), user_id, args.max_block
+            )
+            elapsed = time.perf_counter() - start
+        print(
+            f"Scanned in {elapsed:.2f}s: {len(clusters)} clusters,"
+            f" {sum(map(len, clusters))} contacts"
+            f" ({args.contacts / elapsed:,.0f} contacts/s)"
+        )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--db-url", help="Postgres URL of an empty database")
+    parser.add_argument("--max-block", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+
+import httpx
+
+from benchmarks.load.runner import compare, run_workload
+from benchmarks.load.scenarios import build_scenarios
+
+
+def server_env(args, db_path: str) -> dict:
+    env = dict(os.environ)
+    env["DB_URL"] = args.db_url or f"sqlite+aiosqlite:///{db_path}"
+    env.setdefault("JWT_SECRET", "load-test-secret")
+    env.setdefault("CLOUDINARY_NAME", "load-test")
+    env["RATE_LIMIT_ENABLED"] = "true" if args.rate_limit else "false"
+    env.pop("REDIS_URL", None)
+    if args.redis_url:
+        env["REDIS_URL"] = args.redis_url
+    return env
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run end-to-end load tests.")
+    parser.add_argument("--db-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--redis-url", help="defaults to an in-process fake Redis")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts-per-user", type=int, default=200)
+    parser.add_argument(
+        "--workloads",
+        default="mixed",
+        help="comma-separated scenarios to run one after another, or 'mixed'",
+    )
+    parser.add_argument("--rate", type=float, default=50, help="requests/second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--rate-limit", action="store_true", help="keep limiter on")
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="fail on regressions against this run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    scenarios = build_scenarios(args.users)
+    workloads = args.workloads.split(",")
+    for workload in workloads:
+        if workload != "mixed" and workload not in scenarios:
+            parser.error(f"unknown workload {workload!r}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.load.server",
+                f"--port={args.port}",
+                f"--workers={args.workers}",
+                f"--users={args.users}",
+                f"--contacts-per-user={args.contacts_per_user}",
+            ],
+            env=server_env(args, os.path.join(tmp, "load.db")),
+        )
+        try:
+            wait_until_ready(base_url, process, timeout=120)
+            results = {}
+            for workload in workloads:
+                print(f"Running {workload} at {args.rate} rps for {args.duration}s")
+                results[workload] = asyncio.run(
+                    run_workload(
+                        base_url,
+                        scenarios,
+                        workload,
+                        args.rate,
+                        args.duration,
+                        args.users,
+                    )
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "meta": {
+            "at": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "database": "postgresql" if args.db_url else "sqlite",
+            "redis": "redis" if args.redis_url else "fake",
+            "workers": args.workers,
+            "rate": args.rate,
+            "duration": args.duration,
+        },
+        "workloads": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for workload, stats in results.items():
+        for name, s in stats.items():
+            print(
+                f"{workload:>10}/{name:<10} {s['throughput_rps']:8.1f} rps"
+                f"  p50 {s['p50_ms']}ms  p95 {s['p95_ms']}ms  p99 {s['p99_ms']}ms"
+                f"  errors {s['errors']}"
+            )
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
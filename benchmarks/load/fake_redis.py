@@ -0,0 +1,88 @@
+import fnmatch
+import time
+
+from redis.exceptions import RedisError
+
+
+class FakeScript:
+    """
+    Stand-in for a registered Lua script. Every call grants the requested
+    tokens, so with the fake Redis the rate limiter never limits, and the
+    job queue's promotion script is never run by the app itself.
+    """
+
+    async def __call__(self, keys=None, args=None, client=None):
+        return [int(args[2]) if args else 1, 0]
+
+
+class FakeRedis:
+    """
+    Minimal in-process replacement for ``redis.asyncio.Redis`` covering the
+    commands the load scenarios reach: token blacklist and user cache lookups,
+    rate limiting, and the contact cache.
+
+    Any other command, such as the job queue's pipelines and streams or event
+    subscriptions, raises :class:`RedisError` as if Redis were down, so the
+    app takes the same fallbacks it takes without Redis.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    async def exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    async def get(self, key):
+        return self._data.get(key) if self._alive(key) else None
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = value
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = time.monotonic() + ex
+        if px is not None:
+            self._expires[key] = time.monotonic() + px / 1000
+        return True
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def incr(self, key, amount=1):
+        value = int(await self.get(key) or 0) + amount
+        self._data[key] = value
+        return value
+
+    async def keys(self, pattern="*"):
+        return [
+            key
+            for key in list(self._data)
+            if self._alive(key) and fnmatch.fnmatch(key, pattern)
+        ]
+
+    async def publish(self, channel, message):
+        return 0
+
+    async def ping(self):
+        return True
+
+    def register_script(self, script):
+        return FakeScript()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def unsupported(*args, **kwargs):
+            raise RedisError(f"{name} is not supported by the fake Redis")
+
+        return unsupported
@@ -0,0 +1,160 @@
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+from benchmarks.load.scenarios import MIXED_WEIGHTS, Scenario
+from benchmarks.load.server import BENCH_PASSWORD, bench_username
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Recorder:
+    """
+    Collects latencies and errors per scenario.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, scenario: str, latency: float, error: str | None) -> None:
+        if error is None:
+            self.latencies[scenario].append(latency)
+        else:
+            self.errors[scenario][error] += 1
+
+    def summary(self, duration: float) -> dict:
+        result = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies[name]
+            errors = sum(self.errors[name].values())
+            result[name] = {
+                "requests": len(latencies) + errors,
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "p50_ms": _ms(percentile(latencies, 50)),
+                "p95_ms": _ms(percentile(latencies, 95)),
+                "p99_ms": _ms(percentile(latencies, 99)),
+                "errors": errors,
+                "error_breakdown": dict(self.errors[name]),
+            }
+        return result
+
+
+def _ms(value: float | None) -> float | None:
+    return None if value is None else round(value * 1000, 3)
+
+
+async def login_tokens(client: httpx.AsyncClient, users: int) -> list[str]:
+    tokens = []
+    for index in range(users):
+        response = await client.post(
+            "/api/auth/login",
+            data={"username": bench_username(index), "password": BENCH_PASSWORD},
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def run_workload(
+    base_url: str,
+    scenarios: dict[str, Scenario],
+    workload: str,
+    rate: float,
+    duration: float,
+    users: int,
+    seed: int = 0,
+) -> dict:
+    """
+    Send requests at a fixed arrival rate for ``duration`` seconds.
+
+    Requests are started on schedule whether or not earlier ones finished, and
+    latency is measured from the scheduled start, so server-side queueing is
+    fully visible in the percentiles (no coordinated omission).
+
+    :param workload: A scenario name, or ``mixed`` for the weighted mix.
+    :return: Per-scenario statistics.
+    """
+    rnd = random.Random(seed)
+    if workload == "mixed":
+        names = list(MIXED_WEIGHTS)
+        weights = [MIXED_WEIGHTS[name] for name in names]
+    else:
+        names, weights = [workload], [1]
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=30
+    ) as client:
+        tokens = await login_tokens(client, users)
+
+        async def fire(scenario: Scenario, scheduled: float, token: str, rnd):
+            error = None
+            try:
+                response = await scenario.request(client, token, rnd)
+                if response.status_code >= 400:
+                    error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            recorder.record(scenario.name, time.perf_counter() - scheduled, error)
+
+        tasks = []
+        start = time.perf_counter()
+        total = int(rate * duration)
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = scenarios[rnd.choices(names, weights)[0]]
+            request_rnd = random.Random(rnd.random())
+            tasks.append(
+                asyncio.create_task(
+                    fire(scenario, scheduled, rnd.choice(tokens), request_rnd)
+                )
+            )
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return recorder.summary(elapsed)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare two runs and describe every scenario whose p95 latency or
+    throughput regressed by more than ``tolerance`` (a fraction).
+    """
+    regressions = []
+    for workload, scenarios in current["workloads"].items():
+        for name, stats in scenarios.items():
+            base = baseline.get("workloads", {}).get(workload, {}).get(name)
+            if not base:
+                continue
+            if (
+                base["p95_ms"]
+                and stats["p95_ms"]
+                and (stats["p95_ms"] > base["p95_ms"] * (1 + tolerance))
+            ):
+                regressions.append(
+                    f"{workload}/{name}: p95 {base['p95_ms']}ms -> {stats['p95_ms']}ms"
+                )
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{workload}/{name}: throughput {base['throughput_rps']}"
+                    f" -> {stats['throughput_rps']} rps"
+                )
+            if stats["errors"] > base["errors"]:
+                regressions.append(
+                    f"{workload}/{name}: errors {base['errors']} -> {stats['errors']}"
+                )
+    return regressions
@@ -0,0 +1,83 @@
+import random
+
+import httpx
+
+from benchmarks.load.server import BENCH_PASSWORD, FIRST_NAMES, bench_username
+
+
+class Scenario:
+    """
+    One kind of request. ``request`` returns the response of a single call;
+    authenticated scenarios get a bearer token of a random seeded user.
+    """
+
+    name = ""
+    authenticated = True
+
+    async def request(
+        self, client: httpx.AsyncClient, token: str, rnd: random.Random
+    ) -> httpx.Response:
+        raise NotImplementedError
+
+
+class Login(Scenario):
+    name = "login"
+    authenticated = False
+
+    def __init__(self, users: int):
+        self.users = users
+
+    async def request(self, client, token, rnd):
+        return await client.post(
+            "/api/auth/login",
+            data={
+                "username": bench_username(rnd.randrange(self.users)),
+                "password": BENCH_PASSWORD,
+            },
+        )
+
+
+class ListContacts(Scenario):
+    name = "contacts"
+
+    async def request(self, client, token, rnd):
+        return await client.get(
+            "/api/contacts",
+            params={"skip": rnd.choice([0, 0, 0, 50, 100]), "limit": 50},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+
+class SearchContacts(Scenario):
+    name = "search"
+
+    async def request(self, client, token, rnd):
+        return await client.get(
+            "/api/contacts/search",
+            params={"first_name": rnd.choice(FIRST_NAMES)[:3]},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+
+class Birthdays(Scenario):
+    name = "birthdays"
+
+    async def request(self, client, token, rnd):
+        return await client.get(
+            "/api/contacts/birthdays",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+
+def build_scenarios(users: int) -> dict[str, Scenario]:
+    scenarios = [Login(users), ListContacts(), SearchContacts(), Birthdays()]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+# Share of each scenario in the "mixed" workload
+MIXED_WEIGHTS = {
+    "login": 0.05,
+    "contacts": 0.45,
+    "search": 0.3,
+    "birthdays": 0.2,
+}
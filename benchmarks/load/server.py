@@ -0,0 +1,108 @@
+"""
+Boot the app for load tests: create and seed the schema, then serve it with
+uvicorn. Configuration comes from the environment prepared by the runner;
+without a REDIS_URL every Redis client of the app talks to one in-process
+fake Redis.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+from datetime import date, timedelta
+
+import uvicorn
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+BENCH_PASSWORD = "benchpass"
+FIRST_NAMES = ["John", "Jane", "Olena", "Taras", "Maria", "Petro", "Anna", "Ivan"]
+LAST_NAMES = ["Doe", "Smith", "Shevchenko", "Kovalenko", "Bondar", "Melnyk"]
+
+
+def bench_username(index: int) -> str:
+    return f"bench_{index}"
+
+
+def use_fake_redis() -> None:
+    """
+    Hand every Redis client the app creates the same in-process fake. The
+    app's modules create their clients when imported, so this runs first.
+    """
+    import redis.asyncio
+
+    from benchmarks.load.fake_redis import FakeRedis
+
+    fake = FakeRedis()
+    redis.asyncio.from_url = lambda *args, **kwargs: fake
+
+
+async def seed(db_url: str, users: int, contacts_per_user: int) -> None:
+    from src.database.models import Base, Contact, User
+    from src.services.auth import Hash
+
+    engine = create_async_engine(db_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    rnd = random.Random(42)
+    hashed_password = Hash().get_password_hash(BENCH_PASSWORD)
+    async with session_maker() as session:
+        existing = await session.execute(
+            select(User.username).where(User.username.like("bench\\_%", escape="\\"))
+        )
+        existing = set(existing.scalars().all())
+        for index in range(users):
+            username = bench_username(index)
+            if username in existing:
+                continue
+            user = User(
+                username=username,
+                email=f"{username}@example.com",
+                hashed_password=hashed_password,
+                confirmed=True,
+            )
+            session.add(user)
+            await session.flush()
+            session.add_all(
+                Contact(
+                    first_name=rnd.choice(FIRST_NAMES),
+                    last_name=rnd.choice(LAST_NAMES),
+                    email=f"contact{i}.{username}@example.com",
+                    phone=f"+38050{rnd.randrange(10**7):07d}",
+                    birthday=date(1970, 1, 1) + timedelta(days=rnd.randrange(365 * 40)),
+                    user_id=user.id,
+                )
+                for i in range(contacts_per_user)
+            )
+        await session.commit()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--contacts-per-user", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.environ.get("REDIS_URL"):
+        if args.workers != 1:
+            parser.error("the fake Redis only supports a single worker")
+        use_fake_redis()
+
+    asyncio.run(seed(os.environ["DB_URL"], args.users, args.contacts_per_user))
+
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
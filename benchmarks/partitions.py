@@ -0,0 +1,178 @@
+"""
+Compare the contacts table hash partitioned by user with a single table, in
+two empty Postgres databases::
+
+    python -m benchmarks.partitions --size 1m --partitions 16 \\
+        --db-url postgresql+asyncpg://.../plain \\
+        --partitioned-db-url postgresql+asyncpg://.../partitioned
+
+Both databases are seeded alike and every repository method is timed as in
+``benchmarks.repositories``. Then, a few times over, the contacts of one user
+in twenty are updated and ``VACUUM contacts`` is timed, as tenant-local churn
+leaves dead rows in a few partitions but all over a single table.
+
+The partitioned database is partitioned with :mod:`src.database.partitions`
+before it is seeded. Results of a run are kept in ``benchmarks/results``.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.repositories import SIZES, bench_size
+from src.database.models import Base, Contact
+from src.database.partitions import contact_partitions, repartition
+
+CHURN_EVERY = 20
+
+
+async def partitions_scanned(engine, user_id: int) -> int:
+    """
+    Number of tables read by a query for one user's contacts.
+    """
+    stmt = select(Contact).where(Contact.user_id == user_id).limit(50)
+    sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    async with engine.connect() as conn:
+        plan = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    def relations(node):
+        yield node.get("Relation Name")
+        for child in node.get("Plans", []):
+            yield from relations(child)
+
+    return len(set(relations(plan[0]["Plan"])) - {None})
+
+
+async def bench_vacuum(engine, rounds: int) -> list[float]:
+    timings = []
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE contacts"))
+        for i in range(rounds):
+            await conn.execute(
+                text(
+                    "UPDATE contacts SET description = :description"
+                    " WHERE user_id % :every = :round"
+                ),
+                {"description": f"churn {i}", "every": CHURN_EVERY, "round": i},
+            )
+            start = time.perf_counter()
+            await conn.execute(text("VACUUM contacts"))
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def partition(db_url: str, partitions: int) -> None:
+    engine = create_async_engine(db_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if await conn.run_sync(contact_partitions) != partitions:
+            await conn.run_sync(repartition, partitions)
+    await engine.dispose()
+
+
+async def bench_layout(
+    db_url: str, partitions: int, label: str, iterations: int, rounds: int
+) -> dict:
+    await partition(db_url, partitions)
+    results = await bench_size(db_url, label, iterations)
+    engine = create_async_engine(db_url)
+    async with engine.connect() as conn:
+        user_id = (
+            await conn.execute(text("SELECT min(user_id) FROM contacts"))
+        ).scalar()
+        # A partitioned table holds no rows itself, so its partitions are
+        # summed; pg_partition_tree() is empty for a single table
+        size = (
+            await conn.execute(
+                text(
+                    "SELECT coalesce(("
+                    "SELECT sum(pg_total_relation_size(relid))"
+                    " FROM pg_partition_tree('contacts')"
+                    "), pg_total_relation_size('contacts'))"
+                )
+            )
+        ).scalar()
+    vacuum = await bench_vacuum(engine, rounds)
+    scanned = await partitions_scanned(engine, user_id)
+    await engine.dispose()
+    return {
+        "methods": results,
+        "vacuum_ms": round(statistics.median(vacuum) * 1000, 3),
+        "tables_scanned": scanned,
+        "size_bytes": int(size),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size", default="1m", choices=SIZES)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--db-url", required=True, help="Postgres URL, single table")
+    parser.add_argument("--partitioned-db-url", help="Postgres URL, partitioned")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--vacuum-rounds", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    if not args.partitioned_db_url or not args.db_url.startswith("postgresql"):
+        parser.error("two Postgres URLs are needed: --db-url and --partitioned-db-url")
+    if args.partitions < 2:
+        parser.error("--partitions must be at least 2")
+
+    print(f"Benchmarking a single table ({args.size} contacts)")
+    plain = asyncio.run(
+        bench_layout(args.db_url, 0, args.size, args.iterations, args.vacuum_rounds)
+    )
+    print(f"Benchmarking {args.partitions} partitions ({args.size} contacts)")
+    partitioned = asyncio.run(
+        bench_layout(
+            args.partitioned_db_url,
+            args.partitions,
+            args.size,
+            args.iterations,
+            args.vacuum_rounds,
+        )
+    )
+
+    print(f"  {'':<42} {'single':>11} {'partitioned':>11}")
+    for method, stats in plain["methods"].items():
+        other = partitioned["methods"][method]
+        print(f"  {method:<42} {stats['median_ms']:9.3f}ms {other['median_ms']:9.3f}ms")
+    print(
+        f"  {'VACUUM contacts':<42} {plain['vacuum_ms']:9.3f}ms"
+        f" {partitioned['vacuum_ms']:9.3f}ms"
+    )
+    print(
+        f"  {'tables read for one user':<42} {plain['tables_scanned']:11}"
+        f" {partitioned['tables_scanned']:11}"
+    )
+    print(
+        f"  {'size with indexes (MB)':<42} {plain['size_bytes'] / 2**20:11.1f}"
+        f" {partitioned['size_bytes'] / 2**20:11.1f}"
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "single": plain,
+                    "partitioned": partitioned,
+                    "partitions": args.partitions,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure the latency the rate limiter adds to a request.
+
+Runs the same trivial endpoint with and without :class:`RateLimitMiddleware`
+in-process and reports the difference. Requires a running Redis::
+
+    python -m benchmarks.rate_limit --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import redis.asyncio as redis
+from fastapi import FastAPI
+
+from src.services.rate_limit import RateLimiter, RateLimitMiddleware
+
+
+def build_app(limiter: RateLimiter | None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if limiter is not None:
+        app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    return app
+
+
+async def measure(app: FastAPI, requests: int) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    timings = []
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get("/ping")
+            timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+    return timings
+
+
+def summary(timings: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99)] * 1e6,
+    }
+
+
+async def main(args):
+    client = redis.from_url(args.redis_url)
+    await client.flushdb()
+    results = {"baseline": summary(await measure(build_app(None), args.requests))}
+    for lease_size in (1, args.lease_size):
+        limiter = RateLimiter(
+            client,
+            default=f"{args.requests * 10}/minute",
+            lease_size=lease_size,
+        )
+        name = f"lease_{lease_size}"
+        results[name] = summary(await measure(build_app(limiter), args.requests))
+    await client.aclose()
+
+    base = results["baseline"]["mean_us"]
+    for name, stats in results.items():
+        print(
+            f"{name:>10}: mean {stats['mean_us']:8.1f}us  p50 {stats['p50_us']:8.1f}us"
+            f"  p99 {stats['p99_us']:8.1f}us  added {stats['mean_us'] - base:8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--lease-size", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
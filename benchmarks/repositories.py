@@ -0,0 +1,384 @@
+"""
+Micro-benchmarks of every ContactRepository and UserRepository method against
+seeded databases, with per-method regression thresholds::
+
+    python -m benchmarks.repositories --sizes 1k,100k
+    python -m benchmarks.repositories --sizes 1m --db-url postgresql+asyncpg://...
+    python -m benchmarks.repositories --update-thresholds
+
+Each method is timed over several iterations and the number of SQL statements
+it issues is counted. The run fails when a method is slower, or issues more
+statements, than its stored threshold for the same dialect and size.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+from src.repositories.birthdays import BirthdayRepository
+from src.repositories.contacts import ContactRepository
+from src.repositories.duplicates import DuplicateRepository
+from src.repositories.users import UserRepository
+from src.schemas import ContactModel, ContactUpdate, UserCreate
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+THRESHOLDS = Path(__file__).parent / "thresholds" / "repositories.json"
+DATA_DIR = Path(".bench")
+CONTACTS_PER_USER = 500
+BATCH = 10_000
+TARGET_USERNAME = "bench_target"
+
+
+async def seed(engine, size: int) -> None:
+    """
+    Fill an empty database with ``size`` contacts spread across users. The
+    first user is the one every benchmark runs as.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        count = (await conn.execute(select(func.count()).select_from(Contact))).scalar()
+        if count == size:
+            return
+        if count:
+            raise RuntimeError(f"database already holds {count} contacts, not {size}")
+
+        rnd = random.Random(size)
+        users = max(1, size // CONTACTS_PER_USER)
+        await conn.execute(
+            insert(User),
+            [
+                {
+                    "username": TARGET_USERNAME if i == 0 else f"bench_{i}",
+                    "email": f"bench_{i}@example.com",
+                    "hashed_password": "x",
+                    "confirmed": True,
+                }
+                for i in range(users)
+            ],
+        )
+        user_ids = (
+            (await conn.execute(select(User.id).order_by(User.id))).scalars().all()
+        )
+        names = ["John", "Jane", "Olena", "Taras", "Maria", "Petro", "Anna", "Ivan"]
+        for start in range(0, size, BATCH):
+            await conn.execute(
+                insert(Contact),
+                [
+                    {
+                        "first_name": rnd.choice(names),
+                        "last_name": f"Last{i % 997}",
+                        "email": f"contact{i}@example.com",
+                        "phone": f"+38050{i:07d}",
+                        "birthday": date(1970, 1, 1)
+                        + timedelta(days=rnd.randrange(365 * 40)),
+                        "user_id": user_ids[i % len(user_ids)],
+                    }
+                    for i in range(start, min(start + BATCH, size))
+                ],
+            )
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE"))
+
+
+def contact_cases(state: dict) -> dict:
+    user = state["user"]
+
+    def body(i):
+        return ContactModel(
+            first_name="Bench",
+            last_name=f"Case{i}",
+            email=f"case{i}@example.com",
+            phone="+380501234567",
+            birthday=date(1990, 5, 17),
+        )
+
+    return {
+        "get_contacts": lambda repo, i: repo.get_contacts(0, 50, user),
+        "get_contact_by_id": lambda repo, i: repo.get_contact_by_id(
+            state["contact_id"], user
+        ),
+        "create_contact": lambda repo, i: repo.create_contact(body(i), user),
+        "update_contact": lambda repo, i: repo.update_contact(
+            state["contact_id"], ContactUpdate(description=f"update {i}"), user
+        ),
+        "remove_contact": lambda repo, i: repo.remove_contact(
+            state["created"].pop(), user
+        ),
+        "get_changes": lambda repo, i: repo.get_changes(
+            user, (datetime(2025, 1, 1), 0), 100
+        ),
+        "get_tombstones": lambda repo, i: repo.get_tombstones(
+            user, (datetime(2025, 1, 1), 0), 100
+        ),
+        "get_watermark": lambda repo, i: repo.get_watermark(user),
+        "search_contacts": lambda repo, i: repo.search_contacts("Jo", None, None, user),
+        "lookup_contacts": lambda repo, i: repo.lookup_contacts(
+            user, phone_e164="+380501234567"
+        ),
+        "get_upcoming_birthdays": lambda repo, i: repo.get_upcoming_birthdays(user),
+    }
+
+
+def user_cases(state: dict) -> dict:
+    user = state["user"]
+    return {
+        "get_user_by_id": lambda repo, i: repo.get_user_by_id(user.id),
+        "get_user_by_username": lambda repo, i: repo.get_user_by_username(
+            user.username
+        ),
+        "get_user_by_email": lambda repo, i: repo.get_user_by_email(user.email),
+        "create_user": lambda repo, i: repo.create_user(
+            UserCreate(
+                username=f"new_{state['run']}_{i}",
+                email=f"new_{state['run']}_{i}@example.com",
+                password="x",
+            )
+        ),
+        "create_user_if_absent": lambda repo, i: repo.create_user_if_absent(
+            UserCreate(
+                username=f"new_{state['run']}_{i}",
+                email=f"new_{state['run']}_{i}@example.com",
+                password="x",
+            )
+        ),
+        "get_conflicting_field": lambda repo, i: repo.get_conflicting_field(
+            user.email, user.username
+        ),
+        "confirmed_email": lambda repo, i: repo.confirmed_email(user.email),
+        "update_avatar_url": lambda repo, i: repo.update_avatar_url(
+            user.email, f"https://example.com/{i}.png"
+        ),
+        "reset_password": lambda repo, i: repo.reset_password(user.email),
+        "update_password": lambda repo, i: repo.update_password(user.email, "x"),
+    }
+
+
+def birthday_cases(state: dict) -> dict:
+    user = state["user"]
+    today = date.today()
+    return {
+        "get_digest": lambda repo, i: repo.get_digest(user.id, today),
+        "get_versions": lambda repo, i: repo.get_versions([user.id]),
+        "save_digests": lambda repo, i: repo.save_digests({user.id: []}, today, {}),
+        "invalidate": lambda repo, i: repo.invalidate(user.id),
+        "get_upcoming": lambda repo, i: repo.get_upcoming(
+            list(range(user.id, user.id + 100)), today
+        ),
+        "get_calendar": lambda repo, i: repo.get_calendar(
+            user.id, today, today + timedelta(days=30), names=3
+        ),
+    }
+
+
+def duplicate_cases(state: dict) -> dict:
+    user = state["user"]
+    return {
+        "get_groups": lambda repo, i: repo.get_groups(
+            user.id, [Contact.phone_e164], 50
+        ),
+        "get_report": lambda repo, i: repo.get_report(user.id),
+        "save_report": lambda repo, i: repo.save_report(user.id, [[1, 2], [3, 4]]),
+        "get_contacts": lambda repo, i: repo.get_contacts(user.id, list(range(1, 101))),
+        "merge": lambda repo, i: repo.merge(user.id, dict([state["pairs"].pop()])),
+    }
+
+
+async def duplicate_pairs(session_maker, user, count: int) -> list[tuple]:
+    # Contacts for the merge case, which deletes half of them
+    async with session_maker() as session:
+        ids = (
+            await session.scalars(
+                insert(Contact).returning(Contact.id),
+                [
+                    {
+                        "first_name": "Twin",
+                        "last_name": f"Pair{i // 2}",
+                        "email": f"twin{i // 2}@example.com",
+                        "phone": f"+38066{i // 2:07d}",
+                        "birthday": date(1990, 5, 17),
+                        "user_id": user.id,
+                    }
+                    for i in range(2 * count)
+                ],
+            )
+        ).all()
+        await session.commit()
+    return [(ids[i], [ids[i + 1]]) for i in range(0, len(ids), 2)]
+
+
+def check_coverage(repository, cases: dict) -> list[str]:
+    methods = [
+        name
+        for name, value in inspect.getmembers(repository, inspect.iscoroutinefunction)
+        if not name.startswith("_")
+    ]
+    return [f"{repository.__name__}.{name}" for name in methods if name not in cases]
+
+
+async def bench_size(db_url: str, label: str, iterations: int) -> dict:
+    engine = create_async_engine(db_url)
+    await seed(engine, SIZES[label])
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(1),
+    )
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with session_maker() as session:
+        user = await UserRepository(session).get_user_by_username(TARGET_USERNAME)
+        contact = (
+            await session.execute(
+                select(Contact).where(Contact.user_id == user.id).limit(1)
+            )
+        ).scalar_one()
+    state = {
+        "user": user,
+        "contact_id": contact.id,
+        "created": [],
+        "run": time.time_ns(),
+        "pairs": await duplicate_pairs(session_maker, user, iterations),
+    }
+    state["twins"] = [i for kept, ids in state["pairs"] for i in (kept, *ids)]
+
+    results = {}
+    for repository, cases in (
+        (ContactRepository, contact_cases(state)),
+        (UserRepository, user_cases(state)),
+        (BirthdayRepository, birthday_cases(state)),
+        (DuplicateRepository, duplicate_cases(state)),
+    ):
+        for name, call in cases.items():
+            timings, counts = [], []
+            for i in range(iterations):
+                async with session_maker() as session:
+                    repo = repository(session)
+                    statements.clear()
+                    start = time.perf_counter()
+                    result = await call(repo, i)
+                    timings.append(time.perf_counter() - start)
+                    counts.append(len(statements))
+                if name == "create_contact":
+                    state["created"].append(result.id)
+            results[f"{repository.__name__}.{name}"] = {
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "max_ms": round(max(timings) * 1000, 3),
+                "statements": max(counts),
+            }
+
+    # Cases run without committing, so the merged pairs are still there
+    async with session_maker() as session:
+        await session.execute(delete(Contact).where(Contact.id.in_(state["twins"])))
+        await session.commit()
+
+    await engine.dispose()
+    return results
+
+
+def check_thresholds(key: str, results: dict, thresholds: dict) -> list[str]:
+    failures = []
+    for method, stats in results.items():
+        limit = thresholds.get(key, {}).get(method)
+        if limit is None:
+            continue
+        if stats["median_ms"] > limit["median_ms"]:
+            failures.append(
+                f"{key} {method}: {stats['median_ms']}ms > {limit['median_ms']}ms"
+            )
+        if stats["statements"] > limit["statements"]:
+            failures.append(
+                f"{key} {method}: {stats['statements']} statements"
+                f" > {limit['statements']}"
+            )
+    return failures
+
+
+def database_url(args, label: str) -> str:
+    if args.db_url:
+        return args.db_url
+    DATA_DIR.mkdir(exist_ok=True)
+    return f"sqlite+aiosqlite:///{DATA_DIR / f'repositories_{label}.db'}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1k,100k")
+    parser.add_argument(
+        "--db-url", help="Postgres URL of an empty or previously seeded database"
+    )
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--update-thresholds", action="store_true")
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=2.0,
+        help="threshold = measured median * headroom when updating",
+    )
+    args = parser.parse_args()
+
+    labels = args.sizes.lower().split(",")
+    if args.db_url and len(labels) > 1:
+        parser.error("a single --db-url holds one dataset; pass one size at a time")
+
+    missing = check_coverage(ContactRepository, contact_cases({"user": None}))
+    missing += check_coverage(UserRepository, user_cases({"user": None}))
+    missing += check_coverage(BirthdayRepository, birthday_cases({"user": None}))
+    missing += check_coverage(DuplicateRepository, duplicate_cases({"user": None}))
+    for method in missing:
+        print(f"WARNING: no benchmark case for {method}")
+
+    thresholds = json.loads(THRESHOLDS.read_text()) if THRESHOLDS.exists() else {}
+    report, failures = {}, []
+    for label in labels:
+        url = database_url(args, label)
+        dialect = "postgresql" if url.startswith("postgresql") else "sqlite"
+        key = f"{dialect}/{label}"
+        print(f"Benchmarking {key}")
+        results = asyncio.run(bench_size(url, label, args.iterations))
+        report[key] = results
+        for method, stats in results.items():
+            print(
+                f"  {method:<42} {stats['median_ms']:9.3f}ms"
+                f"  {stats['statements']} statements"
+            )
+        if args.update_thresholds:
+            thresholds[key] = {
+                method: {
+                    "median_ms": round(max(stats["median_ms"] * args.headroom, 1.0), 3),
+                    "statements": stats["statements"],
+                }
+                for method, stats in results.items()
+            }
+        else:
+            failures += check_thresholds(key, results, thresholds)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.update_thresholds:
+        THRESHOLDS.parent.mkdir(exist_ok=True)
+        THRESHOLDS.write_text(json.dumps(thresholds, indent=2, sort_keys=True) + "\n")
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Python-side cost of the hot repository lookups, with their statements built
+on every call as before and as cached lambda statements as now::
+
+    python -m benchmarks.statement_cache --calls 5000
+
+Lookups run against an in-memory SQLite database, whose query time is small
+and the same either way, so differences are Python overhead. For each lookup
+the report gives, per call, the wall time and the time cProfile attributes
+to deriving statement cache keys, which SQLAlchemy does on every execution
+of an eagerly built statement. The lambda variant runs through the
+repository, tracing wrapper included, so its savings are not overstated.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import time
+from datetime import date
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+from src.repositories.contacts import ContactRepository
+from src.repositories.users import UserRepository
+
+CONTACTS = 1000
+
+
+def eager_lookups(user: User) -> dict:
+    """
+    The statements the repository built before, by the method now using a
+    lambda statement.
+    """
+    return {
+        "ContactRepository.get_contacts": lambda: select(Contact)
+        .where(Contact.user_id == user.id)
+        .offset(0)
+        .limit(50),
+        "ContactRepository.get_contact_by_id": lambda: select(Contact).filter_by(
+            id=1, user=user
+        ),
+        "UserRepository.get_user_by_id": lambda: select(User).filter_by(id=user.id),
+        "UserRepository.get_user_by_username": lambda: select(User).filter_by(
+            username=user.username
+        ),
+        "UserRepository.get_user_by_email": lambda: select(User).filter_by(
+            email=user.email
+        ),
+    }
+
+
+def lambda_lookups(user: User) -> dict:
+    return {
+        "ContactRepository.get_contacts": lambda session: ContactRepository(
+            session
+        ).get_contacts(0, 50, user),
+        "ContactRepository.get_contact_by_id": lambda session: ContactRepository(
+            session
+        ).get_contact_by_id(1, user),
+        "UserRepository.get_user_by_id": lambda session: UserRepository(
+            session
+        ).get_user_by_id(user.id),
+        "UserRepository.get_user_by_username": lambda session: UserRepository(
+            session
+        ).get_user_by_username(user.username),
+        "UserRepository.get_user_by_email": lambda session: UserRepository(
+            session
+        ).get_user_by_email(user.email),
+    }
+
+
+async def seed(engine) -> User:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(User),
+            {"id": 1, "username": "bench", "email": "bench@example.com"},
+        )
+        await conn.execute(
+            insert(Contact),
+            [
+                {
+                    "id": i,
+                    "first_name": "Bench",
+                    "last_name": f"Contact{i}",
+                    "email": f"contact{i}@example.com",
+                    "phone": f"+38050{i:07d}",
+                    "birthday": date(1990, 5, 17),
+                    "user_id": 1,
+                }
+                for i in range(1, CONTACTS + 1)
+            ],
+        )
+    return User(id=1, username="bench", email="bench@example.com")
+
+
+def cache_key_seconds(profiler: cProfile.Profile) -> float:
+    stats = pstats.Stats(profiler)
+    return sum(
+        cumulative
+        for (_, _, name), (_, _, _, cumulative, _) in stats.stats.items()
+        if name == "_generate_cache_key"
+    )
+
+
+async def measure(call, calls: int) -> dict:
+    # Warm up, so both variants run with their statements compiled and cached
+    for _ in range(10):
+        await call()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await call()
+    elapsed = time.perf_counter() - start
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(calls):
+        await call()
+    profiler.disable()
+    return {
+        "call_us": round(elapsed / calls * 1e6, 2),
+        "cache_key_us": round(cache_key_seconds(profiler) / calls * 1e6, 2),
+    }
+
+
+async def run(calls: int, cache_size: int) -> dict:
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", query_cache_size=cache_size
+    )
+    user = await seed(engine)
+    session_maker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    results = {}
+    eager, cached = eager_lookups(user), lambda_lookups(user)
+    async with session_maker() as session:
+        for name, build in eager.items():
+
+            async def before():
+                return (await session.execute(build())).scalars().all()
+
+            async def after():
+                return await cached[name](session)
+
+            results[name] = {
+                "before": await measure(before, calls),
+                "after": await measure(after, calls),
+            }
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--cache-size", type=int, default=500)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.calls, args.cache_size))
+    print(
+        f"  {'':<38} {'call before':>12} {'call after':>12}"
+        f" {'key before':>11} {'key after':>10}"
+    )
+    for name, result in results.items():
+        before, after = result["before"], result["after"]
+        saved = 1 - after["call_us"] / before["call_us"]
+        print(
+            f"  {name:<38} {before['call_us']:10.1f}us {after['call_us']:10.1f}us"
+            f" {before['cache_key_us']:9.1f}us {after['cache_key_us']:8.1f}us"
+            f"  saved {saved:.0%}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,54 @@
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
-from starlette.responses import JSONResponse
+import asyncio
+import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.api import contacts, utils, auth, users
+from fastapi.staticfiles import StaticFiles
+from src.api import contacts, utils, auth, users, metrics, jobs, batch
+from src.conf.config import settings
+from src.services.compression import CompressionMiddleware
+from src.services.events import event_hub
+from src.services.health import prober
+from src.services.metrics import MetricsMiddleware, mark_process_dead
+from src.services.rate_limit import RateLimitMiddleware, limiter
+from src.services.tracing import TracingMiddleware, get_exporter
+from src.services.upload_file import MULTIPART_OVERHEAD, UploadLimitMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Live gauges of workers that died without shutting down
+    mark_process_dead()
+    # Keeps health probe results fresh, so probes themselves do no I/O
+    prober.start()
+    yield
+    await prober.stop()
+    await event_hub.close()
+    if app.state.trace_exporter is not None:
+        await asyncio.to_thread(app.state.trace_exporter.close)
+    mark_process_dead(os.getpid())
 
 
 def create_app():
-    app = FastAPI()
-    limiter = Limiter(key_func=get_remote_address)
+    app = FastAPI(lifespan=lifespan)
+
+    # Apply the rate limit to the entire app, shared across workers via Redis
+    app.state.limiter = limiter
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(
+            RateLimitMiddleware, limiter=limiter, exempt=settings.RATE_LIMIT_EXEMPT
+        )
+
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware, **CompressionMiddleware.options_from_settings()
+        )
+
+    app.add_middleware(
+        UploadLimitMiddleware,
+        limits={"/api/users/avatar": settings.AVATAR_MAX_BYTES + MULTIPART_OVERHEAD},
+    )
 
     app.add_middleware(
         CORSMiddleware,
@@ -20,36 +58,40 @@ def create_app():
         allow_headers=["*"],
     )
 
-    # Attach the limiter to the FastAPI app
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-    app.exception_handler(RateLimitExceeded)
-
-
-    async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
-        return JSONResponse(
-            status_code=429,
-            content={"error": "Перевищено ліміт запитів. Спробуйте пізніше."},
+    # Closed on shutdown, to write out buffered traces
+    app.state.trace_exporter = None
+    if settings.TRACING_SAMPLE_RATE > 0:
+        app.state.trace_exporter = get_exporter(settings.TRACING_EXPORTER)
+        app.add_middleware(
+            TracingMiddleware,
+            sample_rate=settings.TRACING_SAMPLE_RATE,
+            exporter=app.state.trace_exporter,
         )
 
+    # Outermost, so the measured time includes the other middleware
+    app.add_middleware(MetricsMiddleware)
 
-    # Apply the rate limit to the entire app
-    @app.middleware("http")
-    async def add_process_time_header(request: Request, call_next):
-        response = await call_next(request)
-        return response
-
-
+    app.include_router(metrics.router)
     app.include_router(utils.router, prefix="/api")
     app.include_router(contacts.router, prefix="/api")
     app.include_router(auth.router, prefix="/api")
     app.include_router(users.router, prefix="/api")
+    app.include_router(jobs.router, prefix="/api")
+    app.include_router(batch.router, prefix="/api")
+
+    if settings.AVATAR_STORAGE == "local":
+        app.mount(
+            settings.AVATAR_LOCAL_URL,
+            StaticFiles(directory=settings.AVATAR_LOCAL_DIR, check_dir=False),
+            name="media",
+        )
 
     return app
 
+
 app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -4,7 +4,6 @@ from fastapi import (
     Depends,
     status,
     Security,
-    BackgroundTasks,
     Request,
 )
 from sqlalchemy.orm import Session
@@ -24,7 +23,7 @@ from src.services.auth import (
     get_current_user,
 )
 from src.services.users import UserService
-from src.services.email import send_email, send_email_reset_password
+from src.services.email import queue_email, request_delivery
 from src.database.db import get_db
 from src.database.models import User
 
@@ -37,30 +36,31 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 )
 async def register_user(
     user_data: UserCreate,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
     user_service = UserService(db)
 
-    email_user = await user_service.get_user_by_email(user_data.email)
-    if email_user:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Користувач з таким email вже існує",
+    user_data.password = await Hash().aget_password_hash(user_data.password)
+    new_user = await user_service.create_user_if_absent(user_data)
+    if new_user is None:
+        field = await user_service.get_conflicting_field(
+            user_data.email, user_data.username
         )
-
-    username_user = await user_service.get_user_by_username(user_data.username)
-    if username_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail="Користувач з таким іменем вже існує",
+            detail=(
+                "Користувач з таким іменем вже існує"
+                if field == "username"
+                else "Користувач з таким email вже існує"
+            ),
         )
-    user_data.password = Hash().get_password_hash(user_data.password)
-    new_user = await user_service.create_user(user_data)
-    background_tasks.add_task(
-        send_email, new_user.email, new_user.username, request.base_url
+    # Committed together with the new user
+    queue_email(
+        db, "verify_email", user_data.email, user_data.username, request.base_url
     )
+    await db.commit()
+    await request_delivery()
 
     return new_user
 
@@ -72,7 +72,9 @@ async def login_user(
 ):
     user_service = UserService(db)
     user = await user_service.get_user_by_username(form_data.username)
-    if not user or not Hash().verify_password(form_data.password, user.hashed_password):
+    if not user or not await Hash().averify_password(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неправильний логін або пароль",
@@ -93,40 +95,38 @@ async def login_user(
 async def confirmed_email(token: str, db: Session = Depends(get_db)):
     email = await get_email_from_token(token)
     user_service = UserService(db)
+    if await user_service.confirmed_email(email):
+        return {"message": "Електронну пошту підтверджено"}
+    # Only unconfirmed users are updated; find out which case this is
     user = await user_service.get_user_by_email(email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error"
         )
-    if user.confirmed:
-        return {"message": "Ваша електронна пошта вже підтверджена"}
-    await user_service.confirmed_email(email)
-    return {"message": "Електронну пошту підтверджено"}
+    return {"message": "Ваша електронна пошта вже підтверджена"}
 
 
 @router.post("/request_email")
 async def request_email(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
     user_service = UserService(db)
     user = await user_service.get_user_by_email(body.email)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Ваша електронна пошта вже підтверджена"}
     if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+        queue_email(db, "verify_email", user.email, user.username, request.base_url)
+        await db.commit()
+        await request_delivery()
     return {"message": "Перевірте свою електронну пошту для підтвердження"}
 
 
 @router.post("/request_email_reset_password")
 async def request_email_reset_password(
     body: RequestEmail,
-    background_tasks: BackgroundTasks,
     request: Request,
     db: Session = Depends(get_db),
 ):
@@ -140,9 +140,11 @@ async def request_email_reset_password(
         )
 
     if user:
-        background_tasks.add_task(
-            send_email_reset_password, user.email, user.username, request.base_url
+        queue_email(
+            db, "reset_password", user.email, user.username, request.base_url
         )
+        await db.commit()
+        await request_delivery()
     return {"message": "Перевірте свою електронну пошту для скидання пароля"}
 
 
@@ -150,12 +152,11 @@ async def request_email_reset_password(
 async def reset_password(token: str, db: Session = Depends(get_db)):
     email = await get_email_from_token(token)
     user_service = UserService(db)
-    user = await user_service.get_user_by_email(email)
+    user = await user_service.reset_password(email)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error"
         )
-    await user_service.reset_password(email)
     return {"message": "Пароль скинуто"}
 
 
@@ -166,6 +167,6 @@ async def update_password(
     db: Session = Depends(get_db),
 ):
     user_service = UserService(db)
-    new_password = Hash().get_password_hash(body.password)
+    new_password = await Hash().aget_password_hash(body.password)
 
     return await user_service.update_password(user.email, new_password)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.schemas import BatchRequest, BatchResponse, User
+from src.services.auth import get_current_user
+from src.services.batch import BatchService
+from src.services.shards import get_contact_db
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(
+    body: BatchRequest,
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    if len(body.operations) > settings.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Не більше {settings.BATCH_MAX_OPERATIONS} операцій у пакеті",
+        )
+    batch_service = BatchService(db)
+    return await batch_service.run(body.operations, user, body.atomic)
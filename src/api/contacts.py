@@ -1,11 +1,28 @@
+from datetime import date
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
-from src.schemas import ContactModel, ContactUpdate, ContactResponse
+from src.conf.config import settings
+from src.schemas import (
+    BirthdayCalendarDay,
+    ContactChanges,
+    ContactModel,
+    DuplicateMerge,
+    DuplicateMergeResponse,
+    DuplicateReportResponse,
+    DuplicateScanResponse,
+    ContactUpdate,
+    ContactResponse,
+)
 from src.services.contacts import ContactService
+from src.services.duplicates import DuplicateService, scan_duplicates_in_background
+from src.services.events import event_hub, sse_stream
+from src.services.jobs import job_queue
+from src.services.shards import get_contact_db
 
 from src.schemas import User
 from src.services.auth import get_current_user
@@ -17,7 +34,7 @@ router = APIRouter(prefix="/contacts", tags=["contacts"])
 async def get_contacts(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
@@ -30,7 +47,7 @@ async def search_contacts(
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
     email: Optional[str] = None,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
@@ -38,19 +55,108 @@ async def search_contacts(
     return contacts
 
 
+@router.get("/lookup", response_model=List[ContactResponse])
+async def lookup_contacts(
+    phone: Optional[str] = Query(None, max_length=32),
+    email: Optional[str] = Query(None, max_length=254),
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    contact_service = ContactService(db)
+    return await contact_service.lookup_contacts(phone, email, user)
+
+
 @router.get("/birthdays", response_model=List[ContactResponse])
 async def get_upcoming_birthdays(
-    db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_contact_db), user: User = Depends(get_current_user)
 ):
     contact_service = ContactService(db)
     contacts = await contact_service.get_upcoming_birthdays(user)
     return contacts
 
 
+@router.get("/birthdays/calendar", response_model=List[BirthdayCalendarDay])
+async def get_birthday_calendar(
+    start: date = Query(alias="from"),
+    end: date = Query(alias="to"),
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    contact_service = ContactService(db)
+    return await contact_service.get_birthday_calendar(start, end, user)
+
+
+@router.get("/duplicates", response_model=DuplicateReportResponse)
+async def get_duplicates(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    duplicate_service = DuplicateService(db)
+    return await duplicate_service.get_report(skip, limit, user)
+
+
+@router.post(
+    "/duplicates/scan",
+    response_model=DuplicateScanResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    description="Duplicates are searched in the background; "
+    "track it with GET /api/jobs/{job_id}",
+)
+async def scan_duplicates(user: User = Depends(get_current_user)):
+    payload = {"user_id": user.id}
+    try:
+        job_id = await job_queue.enqueue(
+            "contacts.duplicates", payload, user_id=user.id
+        )
+    except (RedisError, OSError):
+        job_id = None
+        scan_duplicates_in_background(payload)
+    return {"job_id": job_id}
+
+
+@router.post("/duplicates/merge", response_model=DuplicateMergeResponse)
+async def merge_duplicates(
+    body: DuplicateMerge,
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    duplicate_service = DuplicateService(db)
+    return await duplicate_service.merge(body.clusters, user)
+
+
+@router.get("/changes", response_model=ContactChanges)
+async def get_contact_changes(
+    since: Optional[str] = None,
+    limit: int = Query(settings.SYNC_PAGE_SIZE, ge=1, le=settings.SYNC_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_contact_db),
+    user: User = Depends(get_current_user),
+):
+    contact_service = ContactService(db)
+    return await contact_service.get_changes(since, limit, user)
+
+
+@router.get("/events")
+async def contact_events(user: User = Depends(get_current_user)):
+    try:
+        subscription = await event_hub.subscribe(user.id)
+    except (RedisError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сповіщення недоступні",
+        )
+    return StreamingResponse(
+        sse_stream(event_hub, subscription, settings.EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def read_contact(
     contact_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
@@ -65,7 +171,7 @@ async def read_contact(
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
 async def create_contact(
     body: ContactModel,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
@@ -76,7 +182,7 @@ async def create_contact(
 async def update_contact(
     contact_id: int,
     body: ContactUpdate,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
@@ -91,7 +197,7 @@ async def update_contact(
 @router.delete("/{contact_id}", response_model=ContactResponse)
 async def remove_contact(
     contact_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_contact_db),
     user: User = Depends(get_current_user),
 ):
     contact_service = ContactService(db)
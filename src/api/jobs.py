@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from redis.exceptions import RedisError
+
+from src.database.models import User, UserRole
+from src.schemas import JobResponse
+from src.services.auth import get_current_user
+from src.services.jobs import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def read_job(job_id: str, user: User = Depends(get_current_user)):
+    try:
+        job = await job_queue.status(job_id)
+    except (RedisError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Черга завдань недоступна",
+        )
+    if job is None or (job["user_id"] != user.id and user.role != UserRole.ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Завдання не знайдено"
+        )
+    return job
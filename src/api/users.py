@@ -1,23 +1,44 @@
-from fastapi import APIRouter, Depends, Request, File, UploadFile, HTTPException
-
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import FileResponse
+import httpx
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.services.users import UserService
-from src.services.upload_file import UploadFileService
+from src.services.avatar_cache import (
+    avatar_cache,
+    render_variant,
+    source_digests,
+    source_url,
+)
+from src.services.jobs import job_queue
+from src.services.upload_file import (
+    avatar_service,
+    check_image,
+    process_avatar_in_background,
+    read_upload,
+)
 from src.services.dependencies import get_current_moderator_user, get_current_admin_user
 
 from src.conf.config import settings
 from src.database.db import get_db
+from src.database.slow_query import slow_query_log
 from src.database.models import User, UserRole
 
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-
-from src.schemas import UserResponse
+from src.schemas import AvatarUploadResponse, UserResponse
 from src.services.auth import get_current_user
+from src.services.users import UserService
 
 router = APIRouter(prefix="/users", tags=["users"])
-limiter = Limiter(key_func=get_remote_address)
 
 
 @router.get(
@@ -25,16 +46,20 @@ limiter = Limiter(key_func=get_remote_address)
     response_model=UserResponse,
     description="No more than 10 requests per minute",
 )
-@limiter.limit("10/minute")
-async def me(request: Request, user: UserResponse = Depends(get_current_user)):
+async def me(user: UserResponse = Depends(get_current_user)):
     return user
 
 
-@router.patch("/avatar", response_model=UserResponse)
+@router.patch(
+    "/avatar",
+    response_model=AvatarUploadResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    description="The avatar is resized and stored in the background; "
+    "track it with GET /api/jobs/{job_id}",
+)
 async def update_avatar_user(
     file: UploadFile = File(),
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
 ):
 
     if user.role != UserRole.ADMIN:
@@ -42,16 +67,80 @@ async def update_avatar_user(
             status_code=403, detail="Недостатньо прав доступу для виконання цієї дії"
         )
 
-    avatar_url = UploadFileService(
-        settings.CLOUDINARY_NAME,
-        settings.CLOUDINARY_API_KEY,
-        settings.CLOUDINARY_API_SECRET,
-    ).upload_file(file, user.username)
+    data = await read_upload(file, settings.AVATAR_MAX_BYTES)
+    check_image(data, settings.AVATAR_MAX_PIXELS)
+    staged = await avatar_service.stage(data)
+    payload = {"email": user.email, **staged}
+    try:
+        job_id = await job_queue.enqueue("avatar.process", payload, user_id=user.id)
+    except (RedisError, OSError):
+        job_id = None
+        process_avatar_in_background(payload)
 
-    user_service = UserService(db)
-    user = await user_service.update_avatar_url(user.email, avatar_url)
+    return {"job_id": job_id, "avatar": avatar_service.url(staged["digest"])}
 
-    return user
+
+def source_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail="Не вдалося отримати аватар",
+    )
+
+
+@router.get(
+    "/{user_id}/avatar",
+    response_class=FileResponse,
+    description="Serves a size variant of the avatar. Pass the ETag as ?v= "
+    "to get a URL that can be cached for a year.",
+)
+async def read_avatar(
+    user_id: int,
+    size: str | None = None,
+    v: str | None = None,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    size = size or settings.AVATAR_DEFAULT_SIZE
+    if size not in settings.AVATAR_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Доступні розміри: {', '.join(settings.AVATAR_SIZES)}",
+        )
+    user = await UserService(db).get_user_by_id(user_id)
+    if user is None or not user.avatar:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Аватар не знайдено"
+        )
+
+    source = source_url(user.avatar, settings.AVATAR_SIZES)
+    pixels = settings.AVATAR_SIZES[size]
+    try:
+        digest, data = await source_digests.resolve(source)
+    except (httpx.HTTPError, OSError, ValueError) as e:
+        raise source_unavailable() from e
+    key = avatar_cache.key(digest, pixels)
+    etag = f'"{key}"'
+    # The same URL serves a new image after an avatar change, so only
+    # versioned URLs may be cached without revalidation
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            "public, max-age=31536000, immutable"
+            if v == key
+            else "public, no-cache"
+        ),
+    }
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        path = await avatar_cache.get_or_create(
+            key, lambda: render_variant(source, pixels, data)
+        )
+    except (httpx.HTTPError, OSError, ValueError) as e:
+        raise source_unavailable() from e
+    # Served with sendfile by servers that support the pathsend extension
+    return FileResponse(path, media_type="image/webp", headers=headers)
 
 
 @router.get("/moderator")
@@ -66,3 +155,16 @@ def read_moderator(
 @router.get("/admin")
 def read_admin(current_user: User = Depends(get_current_admin_user)):
     return {"message": f"Вітаємо, {current_user.username}! Це адміністративний маршрут"}
+
+
+@router.get("/admin/slow_queries")
+def read_slow_queries(
+    limit: int = Query(50, ge=1, le=settings.SLOW_QUERY_LOG_SIZE),
+    current_user: User = Depends(get_current_admin_user),
+):
+    return slow_query_log.entries(limit)
+
+
+@router.delete("/admin/slow_queries", status_code=204)
+def clear_slow_queries(current_user: User = Depends(get_current_admin_user)):
+    slow_query_log.clear()
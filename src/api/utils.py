@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from src.database.db import get_db
+from src.services.health import prober
 
 router = APIRouter(tags=["utils"])
 
@@ -26,3 +28,17 @@ async def healthchecker(db: AsyncSession = Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error connecting to the database",
         )
+
+
+@router.get("/health/live")
+async def liveness():
+    # Answered from memory: if this responds, the event loop is running
+    return prober.liveness()
+
+
+@router.get("/health/ready")
+async def readiness():
+    # Served from the background prober's latest results, without any I/O
+    ready, report = prober.readiness()
+    code = status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=code, content=report)
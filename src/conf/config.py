@@ -4,9 +4,12 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DB_URL: str
+    # Compiled SQL statements cached per engine (SQLAlchemy's default is 500)
+    DB_QUERY_CACHE_SIZE: int = 500
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_SECONDS: int = 3600
+    HASH_WORKERS: int = 4
 
     MAIL_USERNAME: EmailStr = "example@meta.ua"
     MAIL_PASSWORD: str = "secretPassword"
@@ -18,13 +21,131 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = True
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_TIMEOUT_SECONDS: float = 30.0
+    MAIL_POOL_SIZE: int = 4
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_MAX_ATTEMPTS: int = 8
+    MAIL_RETRY_BASE_SECONDS: float = 30.0
+    MAIL_POLL_INTERVAL_SECONDS: float = 2.0
+    # How long a claimed batch is hidden from other dispatchers; longer than
+    # sending a batch takes, or its emails may be sent twice
+    MAIL_LEASE_SECONDS: float = 600.0
 
     CLOUDINARY_NAME: str
     CLOUDINARY_API_KEY: int = 326488457974591
     CLOUDINARY_API_SECRET: str = "secret"
 
+    AVATAR_STORAGE: str = "cloudinary"
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    AVATAR_MAX_PIXELS: int = 40_000_000
+    AVATAR_SIZES: dict[str, int] = {"sm": 64, "md": 250, "lg": 512}
+    AVATAR_DEFAULT_SIZE: str = "md"
+    AVATAR_WORKERS: int = 2
+    # Must be shared with the job workers
+    AVATAR_STAGING_DIR: str = "uploads/staging"
+    AVATAR_LOCAL_DIR: str = "media"
+    AVATAR_LOCAL_URL: str = "/media"
+    AVATAR_CACHE_DIR: str = "cache/avatars"
+    AVATAR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    AVATAR_FETCH_TIMEOUT_SECONDS: float = 10.0
+    AVATAR_SOURCE_TTL_SECONDS: int = 300
+
+    S3_BUCKET: str | None = None
+    S3_ENDPOINT_URL: str | None = None
+    S3_PUBLIC_URL: str | None = None
+    S3_REGION: str = "us-east-1"
+
     REDIS_URL: str = "redis://localhost"
 
+    JOBS_REDIS_URL: str | None = None
+    JOBS_STREAM: str = "jobs"
+    JOBS_GROUP: str = "workers"
+    JOBS_CONCURRENCY: int = 10
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 5.0
+    JOBS_TIMEOUT_SECONDS: float = 300.0
+    JOBS_CLAIM_IDLE_SECONDS: float = 600.0
+    JOBS_RESULT_TTL_SECONDS: int = 86400
+    JOBS_STREAM_MAXLEN: int = 100_000
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS_URL: str | None = None
+    RATE_LIMIT_DEFAULT: str = "300/minute"
+    RATE_LIMIT_ROUTES: dict[str, str] = {
+        "/api/users/me": "10/minute",
+        "/api/auth/login": "30/minute",
+        "/api/auth/register": "10/minute",
+    }
+    RATE_LIMIT_USERS: dict[str, str] = {}
+    RATE_LIMIT_EXEMPT: list[str] = ["/metrics", "/api/health/live", "/api/health/ready"]
+    RATE_LIMIT_LEASE_SIZE: int = 20
+    RATE_LIMIT_LEASE_TTL_SECONDS: float = 1.0
+
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_TYPES: list[str] = [
+        "application/json",
+        "text/html",
+        "text/plain",
+        "text/csv",
+        "application/javascript",
+        "image/svg+xml",
+    ]
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_OFFLOAD_SIZE: int = 64 * 1024
+
+    BATCH_MAX_OPERATIONS: int = 100
+
+    SYNC_PAGE_SIZE: int = 500
+    SYNC_MAX_PAGE_SIZE: int = 1000
+    SYNC_WINDOW_SECONDS: float = 5.0
+
+    BIRTHDAYS_BATCH_SIZE: int = 1000
+    BIRTHDAYS_REFRESH_HOUR: int = 0
+    BIRTHDAYS_CALENDAR_NAMES: int = 3
+
+    # Contacts sharing a key with more than this many others (placeholder
+    # phones, shared inboxes) are not treated as duplicates on that key
+    DUPLICATES_MAX_BLOCK: int = 50
+    DUPLICATES_MERGE_MAX: int = 10_000
+
+    # Databases holding users' contact data, as {"name": "url"}; users and the
+    # shard directory stay on DB_URL. Empty keeps all data on DB_URL
+    SHARDS: dict[str, str] = {}
+    # Each shard gets its own range of this many contact IDs when first
+    # migrated, so contacts keep their IDs when moved between shards
+    SHARD_ID_SPAN: int = 100_000_000
+    SHARD_MOVE_BATCH_SIZE: int = 1000
+    # Writes to a user's contacts are refused this long before a move
+    # finishes, so requests already past the check complete first
+    SHARD_MOVE_GRACE_SECONDS: float = 5.0
+
+    CACHE_REDIS_URL: str | None = None
+    CACHE_TTL_SECONDS: int = 86400
+
+    EVENTS_REDIS_URL: str | None = None
+    EVENTS_CHANNEL_PREFIX: str = "contacts:events"
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+
+    HEALTH_INTERVAL_SECONDS: float = 5.0
+    HEALTH_SMTP_INTERVAL_SECONDS: float = 60.0
+    HEALTH_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_SLOW_MS: float = 100.0
+    HEALTH_POOL_SATURATION: float = 0.9
+    HEALTH_CRITICAL: list[str] = ["database", "redis"]
+
+    TRACING_SAMPLE_RATE: float = 0.0
+    TRACING_EXPORTER: str = "none"
+    TRACING_FILE: str = "traces.jsonl"
+
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN: bool = False
+    SLOW_QUERY_EXPLAIN_LIMIT: int = 1
+
     model_config = ConfigDict(
         extra="ignore", env_file=".env", env_file_encoding="utf-8", case_sensitive=True
     )
@@ -1,4 +1,6 @@
 import contextlib
+import zlib
+
 import asyncpg
 import asyncio
 
@@ -11,6 +13,8 @@ from sqlalchemy.ext.asyncio import (
 
 from src.conf.config import settings
 from src.database.models import Base
+from src.database.slow_query import slow_query_log
+from src.services.metrics import instrument_engine
 
 
 async def create_database_if_not_exists():
@@ -32,9 +36,19 @@ async def create_tables_if_not_exists(engine: AsyncEngine):
 
 class DatabaseSessionManager:
     def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
+        self._engine: AsyncEngine | None = create_async_engine(
+            url, query_cache_size=settings.DB_QUERY_CACHE_SIZE
+        )
+        instrument_engine(self._engine)
+        if settings.SLOW_QUERY_LOG_ENABLED:
+            slow_query_log.attach(self._engine)
+        # Objects stay usable after commit, so handlers can return what they
+        # just wrote without another SELECT
         self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+            bind=self._engine,
         )
 
     @contextlib.asynccontextmanager
@@ -51,6 +65,55 @@ class DatabaseSessionManager:
             await session.close()
 
 
+class ShardMap:
+    """
+    The databases holding users' contact data, by shard name. Users and the
+    shard directory stay on the global database. Without configured shards,
+    the global database is the only shard.
+    """
+
+    def __init__(
+        self,
+        global_manager: DatabaseSessionManager,
+        shards: dict[str, DatabaseSessionManager] | None = None,
+    ):
+        self.global_manager = global_manager
+        self.sharded = bool(shards)
+        self.shards = shards or {"default": global_manager}
+
+    @classmethod
+    def from_settings(cls, global_manager: DatabaseSessionManager, config=settings):
+        return cls(
+            global_manager,
+            {
+                # The global database may also be a shard
+                name: (
+                    global_manager
+                    if url == config.DB_URL
+                    else DatabaseSessionManager(url)
+                )
+                for name, url in config.SHARDS.items()
+            },
+        )
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.shards)
+
+    def place(self, user_id: int) -> str:
+        """
+        The shard a user without one is placed on, the same in every process.
+        """
+        names = sorted(self.shards)
+        return names[zlib.crc32(str(user_id).encode()) % len(names)]
+
+    def is_global(self, name: str) -> bool:
+        return self.shards[name] is self.global_manager
+
+    def session(self, name: str):
+        return self.shards[name].session()
+
+
 async def initialize_database():
     try:
         await create_database_if_not_exists()
@@ -62,6 +125,7 @@ async def initialize_database():
 
 
 sessionmanager = DatabaseSessionManager(settings.DB_URL)
+shard_map = ShardMap.from_settings(sessionmanager)
 
 
 async def get_db():
@@ -1,14 +1,134 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, func, Enum as SqlEnum
-from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy import (
+    Column,
+    Integer,
+    SmallInteger,
+    String,
+    Boolean,
+    Date,
+    Index,
+    JSON,
+    func,
+    Enum as SqlEnum,
+)
+from sqlalchemy.orm import DeclarativeBase, relationship, validates
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
+from datetime import date, datetime, UTC
 from enum import Enum
+from functools import lru_cache
+import re
+
+# Calling code assumed for phone numbers written without one
+DEFAULT_COUNTRY_CODE = "380"
 
 
 class Base(DeclarativeBase):
     pass
 
 
+def utcnow() -> datetime:
+    # Naive UTC with microseconds, so change cursors can tell apart updates
+    # made within the same second
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def month_day(day: date | None) -> int | None:
+    return None if day is None else day.month * 100 + day.day
+
+
+def normalize_email(email: str | None) -> str | None:
+    normalized = (email or "").strip().lower()
+    return normalized or None
+
+
+def normalize_phone(
+    phone: str | None, country_code: str = DEFAULT_COUNTRY_CODE
+) -> str | None:
+    """
+    Bring a phone number to E.164 (``+380501234567``), or None if it cannot
+    be one. National numbers (``0501234567``) get ``country_code``.
+    """
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if not phone.lstrip().startswith("+"):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            digits = country_code + digits[1:]
+    if not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    return f"+{digits}"
+
+
+TRANSLIT = dict(
+    zip(
+        "абвгґдеєжзиіїйклмнопрстуфхцчшщьюя",
+        [
+            "a", "b", "v", "h", "g", "d", "e", "ie", "zh", "z", "y", "i", "i",
+            "i", "k", "l", "m", "n", "o", "p", "r", "s", "t", "u", "f", "kh",
+            "ts", "ch", "sh", "shch", "", "iu", "ia",
+        ],  # fmt: skip
+    )
+)
+
+_SOUNDEX = {
+    letter: code
+    for letters, code in (
+        ("bfpv", "1"),
+        ("cgjkqsxz", "2"),
+        ("dt", "3"),
+        ("l", "4"),
+        ("mn", "5"),
+        ("r", "6"),
+    )
+    for letter in letters
+}
+
+
+def transliterate(value: str) -> str:
+    return "".join(TRANSLIT.get(ch, ch) for ch in value.lower())
+
+
+@lru_cache(maxsize=65536)
+def soundex(name: str) -> str:
+    """
+    Soundex code of a name. Cyrillic names are transliterated first, so
+    "Олена" and "Olena" share a code.
+    """
+    letters = [ch for ch in transliterate(name) if "a" <= ch <= "z"]
+    if not letters:
+        return ""
+    code, previous = letters[0].upper(), _SOUNDEX.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def phonetic_key(first_name: str | None, last_name: str | None) -> str | None:
+    """
+    Phonetic key of a full name, e.g. ``S125O450`` for both "Олена Шевченко"
+    and "Olena Shevchenko".
+    """
+    key = soundex(last_name or "") + soundex(first_name or "")
+    return key or None
+
+
+def _derived_default(derive, *sources: str):
+    # Column default for bulk inserts, which skip the validators below
+    def default(context):
+        parameters = context.get_current_parameters()
+        return derive(*(parameters.get(source) for source in sources))
+
+    return default
+
+
 class UserRole(str, Enum):
     USER = "USER"
     MODERATOR = "MODERATOR"
@@ -17,22 +137,163 @@ class UserRole(str, Enum):
 
 class Contact(Base):
     __tablename__ = "contacts"
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False)
     phone = Column(String, nullable=False)
+    # Normalized email and phone, for exact lookups through an index
+    email_normalized = Column(
+        String, default=_derived_default(normalize_email, "email"), nullable=True
+    )
+    phone_e164 = Column(
+        String(16), default=_derived_default(normalize_phone, "phone"), nullable=True
+    )
+    # Phonetic key of the name, for finding duplicates through an index
+    name_key = Column(
+        String(8),
+        default=_derived_default(phonetic_key, "first_name", "last_name"),
+        nullable=True,
+    )
     birthday = Column(Date, nullable=False)
+    # month * 100 + day of the birthday, so birthdays can be found by
+    # calendar day through an index
+    birth_md = Column(
+        SmallInteger, default=_derived_default(month_day, "birthday"), nullable=False
+    )
     description = Column(String, nullable=True)
     user_id = Column(
-        "user_id", ForeignKey("users.id", ondelete="CASCADE"), default=None
+        "user_id",
+        ForeignKey("users.id", ondelete="CASCADE"),
+        default=None,
+        nullable=False,
     )
     user = relationship("User", backref="contacts")
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_contacts_user_updated", "user_id", "updated_at", "id"),
+        Index("ix_contacts_user_birth_md", "user_id", "birth_md"),
+        Index("ix_contacts_user_email_normalized", "user_id", "email_normalized"),
+        Index("ix_contacts_user_phone_e164", "user_id", "phone_e164"),
+        Index("ix_contacts_user_name_key", "user_id", "name_key", "birthday"),
+    )
+    # The table may be hash partitioned by user (see src.database.partitions),
+    # and then its primary key is (id, user_id). The mapper identifies
+    # contacts by both either way, so ORM updates and deletes filter on the
+    # user and Postgres only touches one partition.
+    __mapper_args__ = {"primary_key": [id, user_id]}
+
+    @validates("first_name", "last_name")
+    def _set_name_key(self, key, value):
+        names = {"first_name": self.first_name, "last_name": self.last_name}
+        names[key] = value
+        self.name_key = phonetic_key(names["first_name"], names["last_name"])
+        return value
+
+    @validates("email")
+    def _set_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
+    @validates("phone")
+    def _set_phone_e164(self, key, phone):
+        self.phone_e164 = normalize_phone(phone)
+        return phone
+
+    @validates("birthday")
+    def _set_birth_md(self, key, birthday):
+        self.birth_md = month_day(birthday)
+        return birthday
 
     def __repr__(self):
         return f"<Contact(id={self.id}, first_name={self.first_name}, last_name={self.last_name}, email={self.email}, phone={self.phone}, birthday={self.birthday}, description={self.description}), user_id={self.user_id}>"
 
 
+class ContactTombstone(Base):
+    """
+    Records a deleted contact, so delta sync can report the deletion.
+    """
+
+    __tablename__ = "contact_tombstones"
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, nullable=False)
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    deleted_at = Column(DateTime, default=utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_contact_tombstones_user_deleted", "user_id", "deleted_at", "id"),
+    )
+
+
+class BirthdayDigest(Base):
+    """
+    A user's upcoming birthdays as of ``day``, serialized as returned by
+    the API, so reading them is a primary-key lookup.
+
+    Invalidating a digest clears ``day`` and increments ``version``; a digest
+    is only stored if the version is still the one read before computing it.
+    """
+
+    __tablename__ = "birthday_digests"
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, nullable=True)
+    contacts = Column(JSON, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class DuplicateReport(Base):
+    """
+    Clusters of a user's contacts that look like duplicates, as found by
+    the last duplicate scan. Each cluster is a sorted list of contact IDs.
+    """
+
+    __tablename__ = "duplicate_reports"
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    computed_at = Column(DateTime, default=utcnow, nullable=False)
+    clusters = Column(JSON, nullable=False)
+
+
+class Shard(Base):
+    """
+    A database holding users' contact data. Contacts created on it are
+    numbered from ``id_start``, so they keep their IDs when moved to another
+    shard. Recorded once, when the shard is first migrated.
+    """
+
+    __tablename__ = "shards"
+    name = Column(String(64), primary_key=True)
+    id_start = Column(Integer, nullable=False, unique=True)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+
+
+class ContactSequence(Base):
+    """
+    The last contact ID taken on a SQLite shard, in a single row. SQLite
+    numbers new rows after the highest ID in the table, which can be a
+    contact moved in from another shard's range, so a registered SQLite
+    shard takes contact IDs from here instead. Postgres shards use the
+    ``contacts_id_seq`` sequence.
+    """
+
+    __tablename__ = "contact_sequence"
+    id = Column(Integer, primary_key=True)
+    last_value = Column(Integer, nullable=False)
+
+
+class UserShard(Base):
+    """
+    The shard holding a user's contact data. While ``moving_to`` is set the
+    data is being copied to that shard and writes to it are refused.
+    """
+
+    __tablename__ = "user_shards"
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String(64), nullable=False)
+    moving_to = Column(String(64), nullable=True)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False)
+
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -43,3 +304,28 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
     role = Column(SqlEnum(UserRole), default=UserRole.USER, nullable=False)
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False)
+    recipient = Column(String, nullable=False)
+    username = Column(String, nullable=False)
+    host = Column(String, nullable=False)
+    status = Column(
+        SqlEnum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False
+    )
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=func.now(), nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_email_outbox_due", "status", "next_attempt_at"),)
@@ -0,0 +1,130 @@
+"""
+Hash partitioning of the contacts table by user, in Postgres::
+
+    python -m src.database.partitions
+    python -m src.database.partitions 16
+    python -m src.database.partitions 0
+
+Without an argument, prints the current number of partitions. With one, the
+table is rebuilt with that many partitions, or as a single table for 0.
+
+The layout is recorded in the database itself: the number of partitions is
+read back from the catalog, and the models work with either layout. The
+rebuild copies every contact while holding an exclusive lock on the table,
+so it is meant for a maintenance window; run ``alembic upgrade head`` first.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.conf.config import settings
+from src.database.models import Contact
+
+
+def partition_ddl(table: str, partitions: int) -> list[str]:
+    """
+    Statements creating the hash partitions ``<table>_p0`` and so on of a
+    table partitioned with ``PARTITION BY HASH``.
+    """
+    return [
+        f"CREATE TABLE {table}_p{remainder} PARTITION OF {table}"
+        f" FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        for remainder in range(partitions)
+    ]
+
+
+def contact_partitions(conn) -> int:
+    """
+    Number of hash partitions of ``contacts``, or 0 when it is a single table.
+    """
+    if conn.dialect.name != "postgresql":
+        return 0
+    return conn.execute(
+        text("SELECT count(*) FROM pg_inherits WHERE inhparent = 'contacts'::regclass")
+    ).scalar()
+
+
+def repartition(conn, partitions: int) -> None:
+    """
+    Copy contacts into a new table, hash partitioned by user into
+    ``partitions`` partitions, or a single table if 0. Keys and indexes are
+    added after the copy, so rows are loaded without maintaining them.
+
+    Every unique key of a partitioned table includes the partition key, so
+    the primary key is ``(id, user_id)`` when partitioned.
+    """
+    if conn.dialect.name != "postgresql":
+        raise ValueError("Only Postgres tables can be partitioned")
+    if partitions < 0 or partitions == 1:
+        raise ValueError("The number of partitions is 0 or at least 2")
+
+    conn.exec_driver_sql("LOCK TABLE contacts IN ACCESS EXCLUSIVE MODE")
+    conn.exec_driver_sql("ALTER TABLE contacts RENAME TO contacts_old")
+    # The id sequence outlives the old table and numbers the new one
+    conn.exec_driver_sql("ALTER SEQUENCE contacts_id_seq OWNED BY NONE")
+    partition_by = " PARTITION BY HASH (user_id)" if partitions else ""
+    conn.exec_driver_sql(
+        "CREATE TABLE contacts (LIKE contacts_old INCLUDING DEFAULTS"
+        f" INCLUDING CONSTRAINTS){partition_by}"
+    )
+    for statement in partition_ddl("contacts", partitions):
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql("INSERT INTO contacts SELECT * FROM contacts_old")
+    conn.exec_driver_sql("DROP TABLE contacts_old")
+    conn.exec_driver_sql("ALTER SEQUENCE contacts_id_seq OWNED BY contacts.id")
+
+    key = "id, user_id" if partitions else "id"
+    conn.exec_driver_sql(
+        f"ALTER TABLE contacts ADD CONSTRAINT contacts_pkey PRIMARY KEY ({key})"
+    )
+    conn.exec_driver_sql(
+        "ALTER TABLE contacts ADD CONSTRAINT contacts_user_id_fkey"
+        " FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    for index in Contact.__table__.indexes:
+        index.create(conn)
+    conn.exec_driver_sql("ANALYZE contacts")
+
+
+async def set_partitions(url: str, partitions: int | None) -> int:
+    """
+    Rebuild the contacts table with ``partitions`` partitions, unless it has
+    them already, or only read the number if None.
+
+    :return: The number of partitions.
+    """
+    engine = create_async_engine(url)
+    try:
+        async with engine.begin() as conn:
+            current = await conn.run_sync(contact_partitions)
+            if partitions is None or partitions == current:
+                return current
+            await conn.run_sync(repartition, partitions)
+            return partitions
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "partitions", type=int, nargs="?", help="number of partitions, 0 for none"
+    )
+    args = parser.parse_args()
+    try:
+        partitions = asyncio.run(set_partitions(settings.DB_URL, args.partitions))
+    except ValueError as e:
+        parser.error(str(e))
+    if partitions:
+        print(f"contacts is hash partitioned by user into {partitions} partitions")
+    else:
+        print("contacts is a single table")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Generate a reproducible synthetic dataset of users and contacts.
+
+    python -m src.database.seed --users 100000 --contacts 5000000 --seed 42
+
+Contacts per user follow a heavy-tailed (Pareto) distribution, names are a mix
+of Ukrainian (Cyrillic) and English (Latin) names, and birthdays follow a
+realistic age and month distribution. Every user gets the same pre-computed
+bcrypt hash of ``--password``, so seeding never waits on bcrypt. Rows are
+loaded with ``COPY`` on Postgres and batched ``executemany`` elsewhere.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.conf.config import settings
+from src.database.models import (
+    Base,
+    Contact,
+    User,
+    UserRole,
+    month_day,
+    phonetic_key,
+    normalize_email,
+    normalize_phone,
+    transliterate,
+)
+from src.services.auth import Hash
+
+LATIN_FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+    "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Daniel",
+    "Emma", "Oliver", "Sophia", "Lucas", "Mia", "Noah", "Olivia",
+]  # fmt: skip
+LATIN_LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Wilson", "Anderson", "Taylor",
+    "Thomas", "Moore", "Jackson", "Martin", "Lee", "Thompson", "White",
+]  # fmt: skip
+CYRILLIC_FIRST_NAMES = [
+    "Олександр", "Андрій", "Дмитро", "Максим", "Сергій", "Іван", "Тарас",
+    "Богдан", "Олена", "Ірина", "Наталія", "Оксана", "Марія", "Анна",
+    "Юлія", "Катерина", "Софія", "Вікторія", "Тетяна", "Людмила",
+]  # fmt: skip
+CYRILLIC_LAST_NAMES = [
+    "Мельник", "Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко",
+    "Олійник", "Шевчук", "Поліщук", "Бондар", "Ткачук", "Марченко", "Лисенко",
+    "Руденко", "Савченко", "Петренко", "Коваль", "Клименко", "Гончаренко",
+]  # fmt: skip
+MAIL_DOMAINS = ["gmail.com", "ukr.net", "meta.ua", "outlook.com", "i.ua", "yahoo.com"]
+MOBILE_CODES = ["50", "63", "66", "67", "68", "73", "93", "95", "96", "97", "98", "99"]
+# Relative share of births per month (northern hemisphere, summer peak)
+MONTH_WEIGHTS = [8.1, 7.5, 8.3, 8.0, 8.3, 8.3, 8.9, 9.0, 8.8, 8.6, 8.0, 8.2]
+DESCRIPTIONS = ["Колега", "Друг", "Family", "Work", "Сусід", "Gym", "University"]
+
+
+def allocate_contacts(rnd: random.Random, users: int, total: int) -> list[int]:
+    """
+    Split ``total`` contacts across ``users`` with a heavy tail: most users
+    have a handful of contacts and a few have a very large address book.
+    """
+    weights = [rnd.paretovariate(1.2) for _ in range(users)]
+    scale = total / sum(weights)
+    counts = [int(w * scale) for w in weights]
+    for i in rnd.sample(range(users), min(users, total - sum(counts))):
+        counts[i] += 1
+    return counts
+
+
+def random_birthday(rnd: random.Random, today: date) -> date:
+    age = min(max(int(rnd.gauss(38, 15)), 1), 95)
+    year = today.year - age
+    month = rnd.choices(range(1, 13), MONTH_WEIGHTS)[0]
+    first = date(year, month, 1)
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return first + timedelta(days=rnd.randrange(last.day))
+
+
+def random_phone(rnd: random.Random) -> str:
+    code = rnd.choice(MOBILE_CODES)
+    number = f"{rnd.randrange(10**7):07d}"
+    if rnd.random() < 0.8:
+        return f"+380{code}{number}"
+    return f"0{code}{number}"
+
+
+def random_person(rnd: random.Random) -> tuple[str, str, str]:
+    if rnd.random() < 0.6:
+        first = rnd.choice(CYRILLIC_FIRST_NAMES)
+        last = rnd.choice(CYRILLIC_LAST_NAMES)
+    else:
+        first = rnd.choice(LATIN_FIRST_NAMES)
+        last = rnd.choice(LATIN_LAST_NAMES)
+    local = f"{transliterate(first)}.{transliterate(last)}{rnd.randrange(1000)}"
+    return first, last, f"{local}@{rnd.choice(MAIL_DOMAINS)}"
+
+
+def user_row(rnd: random.Random, user_id: int, hashed_password: str) -> dict:
+    roll = rnd.random()
+    role = (
+        UserRole.ADMIN
+        if roll < 0.001
+        else UserRole.MODERATOR if roll < 0.01 else UserRole.USER
+    )
+    return {
+        "id": user_id,
+        "username": f"user{user_id}",
+        "email": f"user{user_id}@example.com",
+        "hashed_password": hashed_password,
+        "created_at": datetime(2020, 1, 1)
+        + timedelta(minutes=rnd.randrange(2_500_000)),
+        "avatar": None,
+        "confirmed": rnd.random() < 0.95,
+        "role": role,
+    }
+
+
+def contact_row(rnd: random.Random, user_id: int, today: date) -> dict:
+    first, last, email = random_person(rnd)
+    phone = random_phone(rnd)
+    birthday = random_birthday(rnd, today)
+    return {
+        "first_name": first,
+        "last_name": last,
+        "email": email,
+        "phone": phone,
+        "email_normalized": normalize_email(email),
+        "phone_e164": normalize_phone(phone),
+        "name_key": phonetic_key(first, last),
+        "birthday": birthday,
+        "birth_md": month_day(birthday),
+        "description": rnd.choice(DESCRIPTIONS) if rnd.random() < 0.3 else None,
+        "user_id": user_id,
+        # COPY skips column defaults, so every column is given explicitly
+        "updated_at": datetime.combine(today, datetime.min.time())
+        - timedelta(seconds=rnd.randrange(365 * 86400)),
+    }
+
+
+def generate(seed: int, users: int, contacts: int, first_user_id: int, password: str):
+    """
+    Yield ``("users", rows)`` and ``("contacts", rows)`` chunks. The output
+    depends only on the arguments, so a seed always reproduces the same data.
+    """
+    rnd = random.Random(seed)
+    today = date(2025, 1, 1)
+    hashed_password = Hash().get_password_hash(password)
+    counts = allocate_contacts(rnd, users, contacts)
+    user_ids = range(first_user_id, first_user_id + users)
+    for start in range(0, users, 10_000):
+        yield "users", [
+            user_row(rnd, user_id, hashed_password)
+            for user_id in user_ids[start : start + 10_000]
+        ]
+    for user_id, count in zip(user_ids, counts):
+        yield "contacts", [contact_row(rnd, user_id, today) for _ in range(count)]
+
+
+async def _copy(conn, table, rows: list[dict]) -> None:
+    raw = await conn.get_raw_connection()
+    columns = list(rows[0])
+    records = [
+        tuple(v.value if isinstance(v, UserRole) else v for v in row.values())
+        for row in rows
+    ]
+    await raw.driver_connection.copy_records_to_table(
+        table.name, records=records, columns=columns
+    )
+
+
+async def load(
+    engine: AsyncEngine,
+    seed: int,
+    users: int,
+    contacts: int,
+    password: str,
+    batch_size: int,
+) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        first_user_id = (await conn.execute(select(func.max(User.id)))).scalar() or 0
+        first_user_id += 1
+
+    postgres = engine.dialect.name == "postgresql"
+    pending = {"users": [], "contacts": []}
+    tables = {"users": User.__table__, "contacts": Contact.__table__}
+
+    async def flush(conn, name):
+        rows, pending[name] = pending[name], []
+        if not rows:
+            return
+        if postgres:
+            await _copy(conn, tables[name], rows)
+        else:
+            await conn.execute(insert(tables[name]), rows)
+
+    start = time.perf_counter()
+    loaded = 0
+    async with engine.begin() as conn:
+        for name, rows in generate(seed, users, contacts, first_user_id, password):
+            pending[name].extend(rows)
+            if len(pending[name]) >= batch_size or name == "users":
+                loaded += len(pending[name])
+                await flush(conn, name)
+        loaded += len(pending["contacts"])
+        await flush(conn, "contacts")
+        if postgres:
+            await conn.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('users', 'id'),"
+                    " (SELECT max(id) FROM users))"
+                )
+            )
+    if postgres:
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("ANALYZE users"))
+            await conn.execute(text("ANALYZE contacts"))
+
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {loaded} rows in {elapsed:.1f}s ({loaded / elapsed:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db-url", default=settings.DB_URL)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--contacts", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    engine = create_async_engine(args.db_url)
+
+    async def run():
+        try:
+            await load(
+                engine,
+                args.seed,
+                args.users,
+                args.contacts,
+                args.password,
+                args.batch_size,
+            )
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
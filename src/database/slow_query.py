@@ -0,0 +1,164 @@
+import logging
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, UTC
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The code running the current statements, e.g. a repository method. Set by
+# callers of the database layer; recorded with every slow statement.
+query_caller: ContextVar[str | None] = ContextVar("query_caller", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Not the type names of Postgres casts such as ``x::integer``
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape: literals and bind parameters become
+    ``?`` and ``IN`` lists of any length collapse to ``(...)``.
+
+    :param statement: The SQL statement.
+    :return: The normalized statement.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """
+    Describe bind parameters by their types only, so values are never logged.
+    """
+    if executemany:
+        parameters = list(parameters)
+        return {
+            "rows": len(parameters),
+            "row": parameters_shape(parameters[0]) if parameters else None,
+        }
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of statements slower than a threshold, filled by engine events.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        capacity: int = 200,
+        explain: bool = False,
+        explain_limit: int = 1,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.records = deque(maxlen=capacity)
+        self.explain = explain
+        self.explain_limit = explain_limit
+        self._occurrences = {}
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "SlowQueryLog":
+        return cls(
+            threshold_ms=config.SLOW_QUERY_THRESHOLD_MS,
+            capacity=config.SLOW_QUERY_LOG_SIZE,
+            explain=config.SLOW_QUERY_EXPLAIN,
+            explain_limit=config.SLOW_QUERY_EXPLAIN_LIMIT,
+        )
+
+    def attach(self, engine: AsyncEngine) -> None:
+        """
+        Start recording slow statements executed by an engine.
+
+        :param engine: The engine to instrument.
+        """
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+
+    def entries(self, limit: int | None = None) -> list[dict]:
+        """
+        Return the recorded statements, newest first.
+        """
+        entries = list(reversed(self.records))
+        return entries[:limit] if limit is not None else entries
+
+    def clear(self) -> None:
+        self.records.clear()
+        self._occurrences.clear()
+
+    def _before_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        context._slow_query_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._slow_query_start
+        if elapsed < self.threshold:
+            return
+
+        normalized = normalize_sql(statement)
+        occurrence = self._occurrences.get(normalized, 0) + 1
+        self._occurrences[normalized] = occurrence
+        record = {
+            "at": datetime.now(UTC).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "sql": normalized,
+            "parameters": parameters_shape(parameters, executemany),
+            "caller": query_caller.get(),
+            "occurrence": occurrence,
+            "explain": None,
+        }
+        if (
+            self.explain
+            and occurrence <= self.explain_limit
+            and conn.dialect.name == "postgresql"
+            and statement.lstrip().upper().startswith("SELECT")
+        ):
+            record["explain"] = self._explain(conn, statement, parameters)
+        self.records.append(record)
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            elapsed * 1000,
+            record["caller"],
+            normalized,
+        )
+
+    @staticmethod
+    def _explain(conn, statement, parameters) -> list[str] | None:
+        # A savepoint keeps a failing EXPLAIN from aborting the caller's
+        # transaction. ANALYZE re-runs the query, so only SELECTs get here.
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = [row[0] for row in cursor.fetchall()]
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                logger.warning("EXPLAIN of slow query failed: %s", e)
+                return None
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+            return plan
+        finally:
+            cursor.close()
+
+
+slow_query_log = SlowQueryLog.from_settings()
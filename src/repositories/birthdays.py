@@ -0,0 +1,239 @@
+import calendar
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import BirthdayDigest, Contact, month_day
+from src.services.tracing import trace_repository
+
+# Birthdays from today up to and including this many days ahead
+UPCOMING_DAYS = 7
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    """
+    The first birthday on or after ``today``. 29 February is celebrated on
+    28 February in common years.
+    """
+    for year in (today.year, today.year + 1):
+        day = birthday.day
+        if birthday.month == 2 and day == 29 and not calendar.isleap(year):
+            day = 28
+        candidate = date(year, birthday.month, day)
+        if candidate >= today:
+            return candidate
+
+
+def is_upcoming(
+    birthday: Optional[date], today: date, days: int = UPCOMING_DAYS
+) -> bool:
+    return birthday is not None and (
+        next_birthday(birthday, today) <= today + timedelta(days=days)
+    )
+
+
+def upcoming_filter(today: date, days: int = UPCOMING_DAYS):
+    """
+    SQL condition matching contacts whose birthday falls in the window.
+    """
+    days_ahead = set()
+    for offset in range(days + 1):
+        day = today + timedelta(days=offset)
+        days_ahead.add(month_day(day))
+        if month_day(day) == 228 and not calendar.isleap(day.year):
+            days_ahead.add(229)
+    return Contact.birth_md.in_(sorted(days_ahead))
+
+
+def calendar_filter(start: date, end: date):
+    """
+    SQL condition matching contacts whose birthday falls between two dates,
+    which are at most a year apart.
+    """
+    if (end - start).days >= 365:
+        return true()
+    first, last = month_day(start), month_day(end)
+    if last == 228 and not calendar.isleap(end.year):
+        last = 229
+    if first <= last:
+        return Contact.birth_md.between(first, last)
+    # The range wraps around the new year
+    return or_(Contact.birth_md >= first, Contact.birth_md <= last)
+
+
+@trace_repository
+class BirthdayRepository:
+    """
+    Repository for the precomputed upcoming-birthday digests.
+
+    Changes are not committed; the caller owns the transaction.
+    """
+
+    def __init__(self, session: AsyncSession):
+        """
+        Initialize the repository with a database session.
+
+        :param session: The database session.
+        :type session: AsyncSession
+        """
+        self.db = session
+
+    async def get_digest(self, user_id: int, day: date) -> Optional[List[dict]]:
+        """
+        Get a user's digest if it was computed for ``day``.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param day: The current date.
+        :type day: date
+        :return: The serialized contacts, or None if there is no fresh digest.
+        :rtype: Optional[List[dict]]
+        """
+        digest = await self.db.get(BirthdayDigest, user_id, populate_existing=True)
+        if digest is None or digest.day != day:
+            return None
+        return digest.contacts
+
+    async def get_versions(self, user_ids: List[int]) -> Dict[int, int]:
+        """
+        Get the digest versions of several users, to read before computing
+        their digests.
+
+        :param user_ids: The IDs of the users.
+        :type user_ids: List[int]
+        :return: The versions by user ID, 0 for users without a digest.
+        :rtype: Dict[int, int]
+        """
+        result = await self.db.execute(
+            select(BirthdayDigest.user_id, BirthdayDigest.version).where(
+                BirthdayDigest.user_id.in_(user_ids)
+            )
+        )
+        return {user_id: 0 for user_id in user_ids} | dict(result.all())
+
+    async def save_digests(
+        self, digests: Dict[int, List[dict]], day: date, versions: Dict[int, int]
+    ) -> None:
+        """
+        Insert or replace the digests of several users. A digest invalidated
+        since its version was read is not stored, as it may be stale.
+
+        :param digests: The serialized contacts by user ID.
+        :type digests: Dict[int, List[dict]]
+        :param day: The date the digests were computed for.
+        :type day: date
+        :param versions: The versions read before computing the digests.
+        :type versions: Dict[int, int]
+        """
+        if not digests:
+            return
+        insert = _INSERTS[self.db.bind.dialect.name]
+        stmt = insert(BirthdayDigest).values(
+            [
+                {
+                    "user_id": user_id,
+                    "day": day,
+                    "contacts": contacts,
+                    "version": versions.get(user_id, 0),
+                }
+                for user_id, contacts in digests.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BirthdayDigest.user_id],
+            set_={"day": stmt.excluded.day, "contacts": stmt.excluded.contacts},
+            where=BirthdayDigest.version == stmt.excluded.version,
+        )
+        await self.db.execute(stmt)
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Mark a user's digest stale, so the next read recomputes it, and
+        digests computed before this are not stored.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        """
+        insert = _INSERTS[self.db.bind.dialect.name]
+        stmt = insert(BirthdayDigest).values(
+            user_id=user_id, day=None, contacts=[], version=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BirthdayDigest.user_id],
+            set_={"day": None, "version": BirthdayDigest.version + 1},
+        )
+        await self.db.execute(stmt)
+
+    async def get_upcoming(
+        self, user_ids: List[int], today: date
+    ) -> Dict[int, List[Contact]]:
+        """
+        Get the contacts with upcoming birthdays of several users, each
+        user's list ordered by the next birthday.
+
+        :param user_ids: The IDs of the users.
+        :type user_ids: List[int]
+        :param today: The current date.
+        :type today: date
+        :return: The contacts by user ID, with an entry for every user.
+        :rtype: Dict[int, List[Contact]]
+        """
+        stmt = select(Contact).where(
+            Contact.user_id.in_(user_ids), upcoming_filter(today)
+        )
+        result = await self.db.execute(stmt)
+        upcoming = {user_id: [] for user_id in user_ids}
+        for contact in result.scalars():
+            upcoming[contact.user_id].append(contact)
+        for contacts in upcoming.values():
+            contacts.sort(key=lambda c: (next_birthday(c.birthday, today), c.id))
+        return upcoming
+
+    async def get_calendar(
+        self, user_id: int, start: date, end: date, names: int
+    ) -> List[tuple]:
+        """
+        Count a user's birthdays per calendar day between two dates, with the
+        first few names of each day, in one grouped query.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param start: The first date.
+        :type start: date
+        :param end: The last date, at most a year after ``start``.
+        :type end: date
+        :param names: The number of names to return per day.
+        :type names: int
+        :return: ``(birth_md, count, first_name, last_name)`` rows, ordered by
+            month and day, at most ``names`` per day.
+        :rtype: List[tuple]
+        """
+        md = Contact.birth_md
+        ranked = (
+            select(
+                md.label("md"),
+                func.count().over(partition_by=md).label("total"),
+                func.row_number()
+                .over(
+                    partition_by=md,
+                    order_by=(Contact.first_name, Contact.last_name, Contact.id),
+                )
+                .label("rank"),
+                Contact.first_name,
+                Contact.last_name,
+            )
+            .where(Contact.user_id == user_id, calendar_filter(start, end))
+            .subquery()
+        )
+        stmt = (
+            select(ranked.c.md, ranked.c.total, ranked.c.first_name, ranked.c.last_name)
+            .where(ranked.c.rank <= names)
+            .order_by(ranked.c.md, ranked.c.rank)
+        )
+        result = await self.db.execute(stmt)
+        return result.all()
@@ -1,26 +1,58 @@
-from datetime import date, timedelta
+from datetime import date, datetime
 from typing import List, Optional
 
-from sqlalchemy import select, and_, or_, extract
+from sqlalchemy import func, lambda_stmt, select, and_, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Contact, User
+from src.database.models import Contact, ContactSequence, ContactTombstone, User
+from src.repositories.birthdays import (
+    BirthdayRepository,
+    is_upcoming,
+    next_birthday,
+    upcoming_filter,
+)
 from src.schemas import ContactModel, ContactUpdate
+from src.services.tracing import trace_repository
 
 
+@trace_repository
 class ContactRepository:
     """
     Repository for managing contacts in the database.
     """
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
         """
         Initialize the repository with a database session.
 
         :param session: The database session.
         :type session: AsyncSession
+        :param autocommit: Commit after every change. When False, changes are
+            only flushed and the caller owns the transaction.
+        :type autocommit: bool
         """
         self.db = session
+        self.autocommit = autocommit
+
+    async def _save(self) -> None:
+        if self.autocommit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
+
+    async def _invalidate_birthdays(self, user_id: int, *birthdays) -> None:
+        # Only changes inside the window alter a user's upcoming birthdays
+        if any(is_upcoming(birthday, date.today()) for birthday in birthdays):
+            await BirthdayRepository(self.db).invalidate(user_id)
+
+    async def _next_sqlite_id(self) -> int | None:
+        # A registered SQLite shard numbers contacts within its range; see
+        # ContactSequence. Elsewhere SQLite picks the ID.
+        return await self.db.scalar(
+            update(ContactSequence)
+            .values(last_value=ContactSequence.last_value + 1)
+            .returning(ContactSequence.last_value)
+        )
 
     async def get_contacts(self, skip: int, limit: int, user: User) -> List[Contact]:
         """
@@ -35,8 +67,14 @@ class ContactRepository:
         :return: The list of contacts.
         :rtype: List[Contact]
         """
-        query = (
-            select(Contact).where(Contact.user_id == user.id).offset(skip).limit(limit)
+        user_id = user.id
+        # A lambda statement is built and its cache key derived once; later
+        # calls only extract the new parameter values
+        query = lambda_stmt(
+            lambda: select(Contact)
+            .where(Contact.user_id == user_id)
+            .offset(skip)
+            .limit(limit)
         )
         result = await self.db.execute(query)
         return result.scalars().all()
@@ -52,7 +90,12 @@ class ContactRepository:
         :return: The contact if found, otherwise None.
         :rtype: Contact | None
         """
-        stmt = select(Contact).filter_by(id=contact_id, user=user)
+        user_id = user.id
+        stmt = lambda_stmt(
+            lambda: select(Contact).where(
+                Contact.id == contact_id, Contact.user_id == user_id
+            )
+        )
         contact = await self.db.execute(stmt)
         return contact.scalar_one_or_none()
 
@@ -70,8 +113,11 @@ class ContactRepository:
 
         contact = Contact(**body.model_dump())
         contact.user_id = user.id
+        if self.db.bind.dialect.name == "sqlite":
+            contact.id = await self._next_sqlite_id()
         self.db.add(contact)
-        await self.db.commit()
+        await self._invalidate_birthdays(user.id, contact.birthday)
+        await self._save()
         await self.db.refresh(contact)
         return contact
 
@@ -89,7 +135,9 @@ class ContactRepository:
         contact = await self.get_contact_by_id(contact_id, user)
         if contact:
             await self.db.delete(contact)
-            await self.db.commit()
+            self.db.add(ContactTombstone(contact_id=contact.id, user_id=user.id))
+            await self._invalidate_birthdays(user.id, contact.birthday)
+            await self._save()
             return contact
 
     async def update_contact(
@@ -109,12 +157,86 @@ class ContactRepository:
         """
         contact = await self.get_contact_by_id(contact_id, user)
         if contact:
+            birthday = contact.birthday
             for key, value in body.model_dump(exclude_unset=True).items():
                 setattr(contact, key, value)
-            await self.db.commit()
+            await self._invalidate_birthdays(user.id, birthday, contact.birthday)
+            await self._save()
             await self.db.refresh(contact)
             return contact
 
+    async def get_changes(
+        self, user: User, since: tuple[datetime, int] | None, limit: int
+    ) -> List[Contact]:
+        """
+        Get the contacts created or modified after a cursor, oldest first.
+
+        :param user: The user to get the contacts for.
+        :type user: User
+        :param since: The ``(updated_at, id)`` of the last contact already
+            seen, or None for every contact.
+        :type since: tuple[datetime, int] | None
+        :param limit: The maximum number of contacts to return.
+        :type limit: int
+        :return: The list of contacts.
+        :rtype: List[Contact]
+        """
+        stmt = select(Contact).where(Contact.user_id == user.id)
+        if since is not None:
+            stmt = stmt.where(tuple_(Contact.updated_at, Contact.id) > tuple_(*since))
+        stmt = stmt.order_by(Contact.updated_at, Contact.id).limit(limit)
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
+
+    async def get_tombstones(
+        self, user: User, since: tuple[datetime, int] | None, limit: int
+    ) -> List[ContactTombstone]:
+        """
+        Get the contacts deleted after a cursor, oldest first.
+
+        :param user: The user to get the deletions for.
+        :type user: User
+        :param since: The ``(deleted_at, id)`` of the last tombstone already
+            seen, or None for every tombstone.
+        :type since: tuple[datetime, int] | None
+        :param limit: The maximum number of tombstones to return.
+        :type limit: int
+        :return: The list of tombstones.
+        :rtype: List[ContactTombstone]
+        """
+        stmt = select(ContactTombstone).where(ContactTombstone.user_id == user.id)
+        if since is not None:
+            stmt = stmt.where(
+                tuple_(ContactTombstone.deleted_at, ContactTombstone.id)
+                > tuple_(*since)
+            )
+        stmt = stmt.order_by(ContactTombstone.deleted_at, ContactTombstone.id).limit(
+            limit
+        )
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
+
+    async def get_watermark(self, user: User) -> List[Optional[str]]:
+        """
+        Get the times of the user's latest contact change and deletion,
+        which change whenever the user's contacts do.
+
+        :param user: The user to get the watermark for.
+        :type user: User
+        :return: The two times in ISO format, each None if there is none.
+        :rtype: List[Optional[str]]
+        """
+        stmt = select(
+            select(func.max(Contact.updated_at))
+            .where(Contact.user_id == user.id)
+            .scalar_subquery(),
+            select(func.max(ContactTombstone.deleted_at))
+            .where(ContactTombstone.user_id == user.id)
+            .scalar_subquery(),
+        )
+        result = await self.db.execute(stmt)
+        return [None if at is None else at.isoformat() for at in result.one()]
+
     async def search_contacts(
         self,
         first_name: Optional[str],
@@ -147,31 +269,48 @@ class ContactRepository:
         result = await self.db.execute(stmt)
         return result.scalars().all()
 
+    async def lookup_contacts(
+        self,
+        user: User,
+        phone_e164: Optional[str] = None,
+        email_normalized: Optional[str] = None,
+    ) -> List[Contact]:
+        """
+        Find a user's contacts by exact normalized phone or email, in one
+        index probe.
+
+        :param user: The user to search contacts for.
+        :type user: User
+        :param phone_e164: The phone number in E.164 format.
+        :type phone_e164: Optional[str]
+        :param email_normalized: The lower-cased, trimmed email.
+        :type email_normalized: Optional[str]
+        :return: The matching contacts.
+        :rtype: List[Contact]
+        """
+        stmt = select(Contact).where(Contact.user_id == user.id)
+        if phone_e164 is not None:
+            stmt = stmt.where(Contact.phone_e164 == phone_e164)
+        if email_normalized is not None:
+            stmt = stmt.where(Contact.email_normalized == email_normalized)
+        result = await self.db.execute(stmt.order_by(Contact.id))
+        return result.scalars().all()
+
     async def get_upcoming_birthdays(self, user: User) -> List[Contact]:
         """
         Retrieve contacts with upcoming birthdays within the next week for a specific user.
 
         :param user: The user to retrieve upcoming birthdays for.
         :type user: User
-        :return: A list of contacts with upcoming birthdays.
+        :return: A list of contacts with upcoming birthdays, soonest first.
         :rtype: List[Contact]
         """
         today = date.today()
-        next_week = today + timedelta(days=7)
         stmt = select(Contact).filter(
-            and_(
-                Contact.user_id == user.id,
-                or_(
-                    and_(
-                        extract("month", Contact.birthday) == today.month,
-                        extract("day", Contact.birthday) >= today.day,
-                    ),
-                    and_(
-                        extract("month", Contact.birthday) == next_week.month,
-                        extract("day", Contact.birthday) <= next_week.day,
-                    ),
-                ),
-            )
+            and_(Contact.user_id == user.id, upcoming_filter(today))
         )
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return sorted(
+            result.scalars().all(),
+            key=lambda contact: (next_birthday(contact.birthday, today), contact.id),
+        )
@@ -0,0 +1,187 @@
+from datetime import date
+from itertools import groupby
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Contact, ContactTombstone, DuplicateReport, utcnow
+from src.repositories.birthdays import BirthdayRepository, is_upcoming
+from src.services.tracing import trace_repository
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@trace_repository
+class DuplicateRepository:
+    """
+    Repository for finding and merging duplicate contacts.
+    """
+
+    def __init__(self, session: AsyncSession):
+        """
+        Initialize the repository with a database session.
+
+        :param session: The database session.
+        :type session: AsyncSession
+        """
+        self.db = session
+
+    async def get_groups(
+        self, user_id: int, columns: List, max_size: int
+    ) -> List[List[int]]:
+        """
+        Get the IDs of every group of two to ``max_size`` of a user's
+        contacts sharing the values of ``columns``. The groups are found in
+        an index starting with ``user_id`` and ``columns``, so only contacts
+        in a group are read.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param columns: Indexed contact columns, e.g. ``[Contact.phone_e164]``.
+        :type columns: List
+        :param max_size: The size of the largest group returned.
+        :type max_size: int
+        :return: The groups of contact IDs.
+        :rtype: List[List[int]]
+        """
+        shared = (
+            select(*columns)
+            .where(Contact.user_id == user_id, columns[0].is_not(None))
+            .group_by(*columns)
+            .having(func.count().between(2, max_size))
+        )
+        stmt = (
+            select(Contact.id, *columns)
+            .where(Contact.user_id == user_id, tuple_(*columns).in_(shared))
+            .order_by(*columns, Contact.id)
+        )
+        result = await self.db.execute(stmt)
+        return [
+            [row[0] for row in rows]
+            for _, rows in groupby(result.all(), key=lambda row: tuple(row[1:]))
+        ]
+
+    async def get_report(self, user_id: int) -> Optional[DuplicateReport]:
+        """
+        Get the result of a user's last duplicate scan.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The report, or None if the user was never scanned.
+        :rtype: Optional[DuplicateReport]
+        """
+        return await self.db.get(DuplicateReport, user_id)
+
+    async def save_report(self, user_id: int, clusters: List[List[int]]) -> None:
+        """
+        Insert or replace a user's duplicate report.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param clusters: The clusters of contact IDs.
+        :type clusters: List[List[int]]
+        """
+        upsert = _INSERTS[self.db.bind.dialect.name]
+        stmt = upsert(DuplicateReport).values(
+            user_id=user_id, computed_at=utcnow(), clusters=clusters
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DuplicateReport.user_id],
+            set_={
+                "computed_at": stmt.excluded.computed_at,
+                "clusters": stmt.excluded.clusters,
+            },
+        )
+        await self.db.execute(stmt)
+
+    async def get_contacts(self, user_id: int, ids: List[int]) -> List[Contact]:
+        """
+        Get several of a user's contacts by ID. Missing IDs are skipped.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param ids: The contact IDs.
+        :type ids: List[int]
+        :return: The contacts found.
+        :rtype: List[Contact]
+        """
+        if not ids:
+            return []
+        result = await self.db.execute(
+            select(Contact).where(Contact.user_id == user_id, Contact.id.in_(ids))
+        )
+        return result.scalars().all()
+
+    async def merge(self, user_id: int, merges: Dict[int, List[int]]) -> Optional[int]:
+        """
+        Merge duplicates into the contact kept from each cluster, with a fixed
+        number of statements however many contacts are merged. Every statement
+        filters on the user, so a partitioned table is read in one partition.
+        A kept contact without a description takes the first one found among
+        its duplicates; the duplicates are deleted and leave tombstones for
+        delta sync.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param merges: The IDs of the duplicates by the ID of the kept contact.
+        :type merges: Dict[int, List[int]]
+        :return: The number of contacts removed, or None if any contact does
+            not belong to the user.
+        :rtype: Optional[int]
+        """
+        removed = [contact_id for ids in merges.values() for contact_id in ids]
+        rows = (
+            await self.db.execute(
+                select(Contact.id, Contact.description, Contact.birthday).where(
+                    Contact.user_id == user_id,
+                    Contact.id.in_([*merges, *removed]),
+                )
+            )
+        ).all()
+        if len(rows) != len(merges) + len(removed):
+            return None
+        contacts = {row.id: row for row in rows}
+
+        descriptions = []
+        for kept, ids in merges.items():
+            if contacts[kept].description is None:
+                description = next(
+                    (
+                        contacts[i].description
+                        for i in ids
+                        if contacts[i].description is not None
+                    ),
+                    None,
+                )
+                if description is not None:
+                    descriptions.append(
+                        {
+                            "id": kept,
+                            "user_id": user_id,
+                            "description": description,
+                            "updated_at": utcnow(),
+                        }
+                    )
+        if descriptions:
+            await self.db.execute(update(Contact), descriptions)
+
+        await self.db.execute(
+            insert(ContactTombstone).from_select(
+                ["contact_id", "user_id", "deleted_at"],
+                select(Contact.id, Contact.user_id, literal(utcnow())).where(
+                    Contact.user_id == user_id, Contact.id.in_(removed)
+                ),
+            )
+        )
+        await self.db.execute(
+            delete(Contact)
+            .where(Contact.user_id == user_id, Contact.id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+        # Digests list the descriptions of kept contacts as well
+        changed = [*removed, *(row["id"] for row in descriptions)]
+        if any(is_upcoming(contacts[i].birthday, date.today()) for i in changed):
+            await BirthdayRepository(self.db).invalidate(user_id)
+        return len(removed)
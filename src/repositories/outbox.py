@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox, OutboxStatus
+from src.services.tracing import trace_repository
+
+
+@trace_repository
+class OutboxRepository:
+    """
+    Repository for the outbox of emails waiting to be delivered.
+    """
+
+    def __init__(self, session: AsyncSession):
+        """
+        Initialize the repository with a database session.
+
+        :param session: The database session.
+        :type session: AsyncSession
+        """
+        self.db = session
+
+    def add(self, kind: str, recipient: str, username: str, host: str) -> EmailOutbox:
+        """
+        Add an email to the outbox without committing, so it is stored in the
+        same transaction as the change that triggered it.
+
+        :param kind: The email kind, e.g. ``verify_email``.
+        :param recipient: The recipient address.
+        :param username: The username used in the template.
+        :param host: The base URL used for links in the template.
+        :return: The new outbox entry.
+        """
+        message = EmailOutbox(
+            kind=kind, recipient=recipient, username=username, host=host
+        )
+        self.db.add(message)
+        return message
+
+    async def claim_due(
+        self, limit: int, now: datetime, lease_until: datetime
+    ) -> List[EmailOutbox]:
+        """
+        Claim pending emails whose next attempt is due, by moving their next
+        attempt to ``lease_until``. Once committed, other dispatchers skip
+        them while they are being sent, and pick them up again if the
+        dispatcher dies before recording the result. Rows locked by another
+        dispatcher are skipped, so several workers can run at once.
+
+        :param limit: The maximum number of emails to claim.
+        :param now: The current time.
+        :param lease_until: When the emails are due again if not recorded.
+        :return: The claimed emails, oldest first.
+        """
+        stmt = (
+            select(EmailOutbox)
+            .where(
+                EmailOutbox.status == OutboxStatus.PENDING,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        messages = (await self.db.execute(stmt)).scalars().all()
+        if messages:
+            await self.db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_([m.id for m in messages]))
+                .values(next_attempt_at=lease_until)
+            )
+        return messages
+
+    async def mark_sent(self, ids: List[int], now: datetime) -> None:
+        """
+        Mark emails as delivered.
+
+        :param ids: The outbox entry IDs.
+        :param now: The delivery time.
+        """
+        if ids:
+            await self.db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids))
+                .values(status=OutboxStatus.SENT, sent_at=now, last_error=None)
+            )
+
+    async def mark_failed(
+        self, message_id: int, error: str, retry_at: datetime | None
+    ) -> None:
+        """
+        Record a failed delivery attempt.
+
+        :param message_id: The outbox entry ID.
+        :param error: The error description.
+        :param retry_at: When to try again, or None to give up.
+        """
+        values = {
+            "attempts": EmailOutbox.attempts + 1,
+            "last_error": error[:500],
+        }
+        if retry_at is None:
+            values["status"] = OutboxStatus.FAILED
+        else:
+            values["next_attempt_at"] = retry_at
+        await self.db.execute(
+            update(EmailOutbox).where(EmailOutbox.id == message_id).values(**values)
+        )
@@ -0,0 +1,321 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, insert, literal, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import (
+    BirthdayDigest,
+    Contact,
+    ContactSequence,
+    ContactTombstone,
+    DuplicateReport,
+    Shard,
+    User,
+    UserShard,
+    utcnow,
+)
+from src.services.tracing import trace_repository
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Tables holding a user's contact data on the user's shard
+SHARDED_MODELS = [Contact, ContactTombstone, BirthdayDigest, DuplicateReport]
+
+
+@trace_repository
+class ShardRepository:
+    """
+    Repository for the shard directory, on the global database, and for
+    copying a user's contact data between shards.
+    """
+
+    def __init__(self, session: AsyncSession):
+        """
+        Initialize the repository with a database session.
+
+        :param session: The database session.
+        :type session: AsyncSession
+        """
+        self.db = session
+
+    async def get_placement(self, user_id: int) -> Optional[UserShard]:
+        """
+        Get the directory entry of a user.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :return: The entry, or None if the user is on no shard yet.
+        :rtype: Optional[UserShard]
+        """
+        return await self.db.get(UserShard, user_id, populate_existing=True)
+
+    async def assign(self, user_id: int, shard: str) -> UserShard:
+        """
+        Place a user on a shard, unless another request placed them first.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param shard: The name of the shard.
+        :type shard: str
+        :return: The user's directory entry.
+        :rtype: UserShard
+        """
+        upsert = _INSERTS[self.db.bind.dialect.name]
+        await self.db.execute(
+            upsert(UserShard)
+            .values(user_id=user_id, shard=shard, updated_at=utcnow())
+            .on_conflict_do_nothing(index_elements=[UserShard.user_id])
+        )
+        return await self.get_placement(user_id)
+
+    async def assign_unplaced(self, shard: str) -> int:
+        """
+        Place every user not yet on a shard on ``shard``.
+
+        :param shard: The name of the shard.
+        :type shard: str
+        :return: The number of users placed.
+        :rtype: int
+        """
+        result = await self.db.execute(
+            insert(UserShard).from_select(
+                ["user_id", "shard", "updated_at"],
+                select(User.id, literal(shard), literal(utcnow())).where(
+                    ~exists().where(UserShard.user_id == User.id)
+                ),
+            )
+        )
+        return result.rowcount
+
+    async def count_unplaced(self) -> int:
+        """
+        Count the users not yet on a shard.
+
+        :return: The number of users.
+        :rtype: int
+        """
+        return await self.db.scalar(
+            select(func.count())
+            .select_from(User)
+            .where(~exists().where(UserShard.user_id == User.id))
+        )
+
+    async def get_id_ranges(self) -> Dict[str, int]:
+        """
+        Get the first contact ID of every registered shard.
+
+        :return: The first IDs by shard name.
+        :rtype: Dict[str, int]
+        """
+        result = await self.db.execute(select(Shard.name, Shard.id_start))
+        return dict(result.all())
+
+    async def add_id_range(self, name: str, id_start: int) -> None:
+        """
+        Register a shard, whose contacts are numbered from ``id_start``.
+
+        :param name: The name of the shard.
+        :type name: str
+        :param id_start: The first contact ID of the shard.
+        :type id_start: int
+        """
+        self.db.add(Shard(name=name, id_start=id_start))
+        await self.db.flush()
+
+    async def get_last_sequence_id(self) -> int:
+        """
+        Get the last contact ID taken from this shard's ID sequence. Contacts
+        copied from other shards keep their IDs and take none. A SQLite shard
+        not yet registered numbers contacts after its highest ID.
+
+        :return: The ID, or 0 if none was taken.
+        :rtype: int
+        """
+        if self.db.bind.dialect.name == "sqlite":
+            last = await self.db.scalar(select(ContactSequence.last_value))
+            if last is None:
+                last = await self.db.scalar(select(func.max(Contact.id)))
+            return last or 0
+        sequence = (
+            await self.db.execute(
+                text("SELECT last_value, is_called FROM contacts_id_seq")
+            )
+        ).one()
+        return sequence.last_value if sequence.is_called else 0
+
+    async def reserve_ids(self, start: int) -> None:
+        """
+        Start this shard's contact IDs at ``start``, unless already past it.
+
+        :param start: The first contact ID of the shard.
+        :type start: int
+        """
+        if self.db.bind.dialect.name == "postgresql":
+            await self.db.execute(
+                text(
+                    "SELECT setval('contacts_id_seq', GREATEST("
+                    "(SELECT last_value FROM contacts_id_seq), :start))"
+                ),
+                {"start": start},
+            )
+            return
+        last = max(await self.get_last_sequence_id(), start - 1)
+        stmt = sqlite.insert(ContactSequence).values(id=1, last_value=last)
+        await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ContactSequence.id],
+                set_={"last_value": stmt.excluded.last_value},
+            )
+        )
+
+    async def set_moving(self, user_id: int, target: Optional[str]) -> bool:
+        """
+        Start moving a user to ``target``, or cancel the move when None.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param target: The name of the target shard, or None.
+        :type target: Optional[str]
+        :return: False if the user is unplaced or already moving.
+        :rtype: bool
+        """
+        stmt = update(UserShard).where(UserShard.user_id == user_id)
+        if target is not None:
+            stmt = stmt.where(UserShard.moving_to.is_(None))
+        result = await self.db.execute(
+            stmt.values(moving_to=target, updated_at=utcnow())
+        )
+        return result.rowcount == 1
+
+    async def finish_move(self, user_id: int, shard: str) -> None:
+        """
+        Point a user at the shard their data was moved to.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param shard: The name of the shard.
+        :type shard: str
+        """
+        await self.db.execute(
+            update(UserShard)
+            .where(UserShard.user_id == user_id)
+            .values(shard=shard, moving_to=None, updated_at=utcnow())
+        )
+
+    async def add_user(self, user_id: int) -> None:
+        """
+        Add a placeholder row for a user to a shard, which its tables'
+        foreign keys point to. Does nothing where the user exists.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        """
+        upsert = _INSERTS[self.db.bind.dialect.name]
+        await self.db.execute(
+            upsert(User)
+            .values(id=user_id)
+            .on_conflict_do_nothing(index_elements=[User.id])
+        )
+
+    async def put_contacts(self, rows: List[dict]) -> List[int]:
+        """
+        Insert or overwrite contacts with their IDs. A contact whose ID is
+        taken by another user's contact is skipped.
+
+        :param rows: The contacts, as column values.
+        :type rows: List[dict]
+        :return: The IDs of the contacts written.
+        :rtype: List[int]
+        """
+        if not rows:
+            return []
+        dialect = self.db.bind.dialect.name
+        stmt = _INSERTS[dialect](Contact)
+        # A partitioned table's primary key is (id, user_id)
+        target = (
+            {"constraint": "contacts_pkey"}
+            if dialect == "postgresql"
+            else {"index_elements": [Contact.id]}
+        )
+        stmt = stmt.on_conflict_do_update(
+            **target,
+            set_={
+                column.name: stmt.excluded[column.name]
+                for column in Contact.__table__.columns
+                if not column.primary_key
+            },
+            where=Contact.user_id == stmt.excluded.user_id,
+        ).returning(Contact.id)
+        return (await self.db.scalars(stmt, rows)).all()
+
+    async def put_tombstones(self, user_id: int, rows: List[dict]) -> None:
+        """
+        Delete contacts and record their tombstones. Tombstones already
+        recorded are skipped.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param rows: The tombstones, as ``contact_id`` and ``deleted_at``.
+        :type rows: List[dict]
+        """
+        if not rows:
+            return
+        ids = [row["contact_id"] for row in rows]
+        await self.db.execute(
+            delete(Contact)
+            .where(Contact.user_id == user_id, Contact.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        recorded = set(
+            (
+                await self.db.execute(
+                    select(
+                        ContactTombstone.contact_id, ContactTombstone.deleted_at
+                    ).where(
+                        ContactTombstone.user_id == user_id,
+                        ContactTombstone.contact_id.in_(ids),
+                    )
+                )
+            ).all()
+        )
+        rows = [
+            {"user_id": user_id, **row}
+            for row in rows
+            if (row["contact_id"], row["deleted_at"]) not in recorded
+        ]
+        if rows:
+            await self.db.execute(insert(ContactTombstone), rows)
+
+    async def put_report(self, report: DuplicateReport) -> None:
+        """
+        Insert or overwrite a user's duplicate report.
+
+        :param report: A report read from another shard.
+        :type report: DuplicateReport
+        """
+        await self.db.merge(
+            DuplicateReport(
+                user_id=report.user_id,
+                computed_at=report.computed_at,
+                clusters=report.clusters,
+            )
+        )
+
+    async def remove_user_data(self, user_id: int, drop_user: bool) -> None:
+        """
+        Delete a user's contact data from a shard.
+
+        :param user_id: The ID of the user.
+        :type user_id: int
+        :param drop_user: Whether to delete the user's placeholder row too.
+        :type drop_user: bool
+        """
+        for model in SHARDED_MODELS:
+            await self.db.execute(
+                delete(model)
+                .where(model.user_id == user_id)
+                .execution_options(synchronize_session=False)
+            )
+        if drop_user:
+            await self.db.execute(delete(User).where(User.id == user_id))
@@ -1,10 +1,16 @@
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import UserCreate
+from src.services.tracing import trace_repository
 
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
+
+@trace_repository
 class UserRepository:
     """
     Repository for performing CRUD operations on User model.
@@ -25,7 +31,9 @@ class UserRepository:
         :param user_id: ID of the user to retrieve.
         :return: User object if found, else None.
         """
-        stmt = select(User).filter_by(id=user_id)
+        # Lambda statements of the lookups run on every request are cached
+        # with their cache key, so a call only extracts the parameter value
+        stmt = lambda_stmt(lambda: select(User).where(User.id == user_id))
         user = await self.db.execute(stmt)
         return user.scalar_one_or_none()
 
@@ -36,7 +44,7 @@ class UserRepository:
         :param username: Username of the user to retrieve.
         :return: User object if found, else None.
         """
-        stmt = select(User).filter_by(username=username)
+        stmt = lambda_stmt(lambda: select(User).where(User.username == username))
         user = await self.db.execute(stmt)
         return user.scalar_one_or_none()
 
@@ -47,7 +55,7 @@ class UserRepository:
         :param email: Email of the user to retrieve.
         :return: User object if found, else None.
         """
-        stmt = select(User).filter_by(email=email)
+        stmt = lambda_stmt(lambda: select(User).where(User.email == email))
         user = await self.db.execute(stmt)
         return user.scalar_one_or_none()
 
@@ -69,57 +77,110 @@ class UserRepository:
         await self.db.refresh(user)
         return user
 
-    async def confirmed_email(self, email: str) -> None:
+    async def create_user_if_absent(
+        self, body: UserCreate, avatar: str = None
+    ) -> User | None:
+        """
+        Create a new user with a single ``INSERT ... ON CONFLICT DO NOTHING
+        RETURNING`` statement. The change is not committed.
+
+        :param body: UserCreate schema object with an already hashed password.
+        :param avatar: Optional avatar URL for the user.
+        :return: The created User object, or None if the email or username
+            is already taken.
+        """
+        insert = _INSERTS[self.db.get_bind().dialect.name]
+        stmt = (
+            insert(User)
+            .values(
+                username=body.username,
+                email=body.email,
+                hashed_password=body.password,
+                avatar=avatar,
+            )
+            .on_conflict_do_nothing()
+            .returning(User)
+        )
+        result = await self.db.scalars(stmt)
+        return result.one_or_none()
+
+    async def get_conflicting_field(self, email: str, username: str) -> str | None:
+        """
+        Find out why a user could not be created.
+
+        :param email: The email of the new user.
+        :param username: The username of the new user.
+        :return: ``"email"`` or ``"username"``, whichever is taken (email
+            first), or None if neither is.
+        """
+        stmt = select(User.email).where(
+            or_(User.email == email, User.username == username)
+        )
+        emails = (await self.db.scalars(stmt)).all()
+        if not emails:
+            return None
+        return "email" if email in emails else "username"
+
+    async def _update_by_email(self, email: str, *criteria, **values) -> User | None:
+        """
+        Update a user with a single ``UPDATE ... RETURNING`` statement and
+        commit.
+
+        :param email: Email of the user to update.
+        :param criteria: Extra conditions the user must match.
+        :param values: Column values to set.
+        :return: The updated User object, or None if no user matched.
+        """
+        stmt = (
+            update(User)
+            .where(User.email == email, *criteria)
+            .values(**values)
+            .returning(User)
+        )
+        result = await self.db.scalars(stmt)
+        user = result.one_or_none()
+        await self.db.commit()
+        return user
+
+    async def confirmed_email(self, email: str) -> User | None:
         """
         Confirm a user's email.
 
         :param email: Email of the user to confirm.
+        :return: The updated User object, or None if the user does not exist
+            or was already confirmed.
         """
-        user = await self.get_user_by_email(email)
-        if user:
-            user.confirmed = True
-            await self.db.commit()
+        return await self._update_by_email(
+            email, User.confirmed.is_not(True), confirmed=True
+        )
 
-    async def update_avatar_url(self, email: str, url: str) -> User:
+    async def update_avatar_url(self, email: str, url: str) -> User | None:
         """
         Update a user's avatar URL.
 
         :param email: Email of the user to update.
         :param url: New avatar URL.
-        :return: The updated User object.
+        :return: The updated User object, or None if not found.
         """
-        user = await self.get_user_by_email(email)
-        if user:
-            user.avatar = url
-            await self.db.commit()
-            await self.db.refresh(user)
-            return user
+        return await self._update_by_email(email, avatar=url)
 
-    async def reset_password(self, email: str) -> User:
+    async def reset_password(self, email: str) -> User | None:
         """
         Reset a user's password.
 
         :param email: Email of the user to reset password.
-        :return: The updated User object with password reset.
+        :return: The updated User object with password reset, or None if not
+            found.
         """
-        user = await self.get_user_by_email(email)
-        if user:
-            user.hashed_password = None
-            await self.db.commit()
-            await self.db.refresh(user)
-            return user
+        return await self._update_by_email(email, hashed_password=None)
 
-    async def update_password(self, email: str, password: str) -> User:
+    async def update_password(self, email: str, password: str) -> User | None:
         """
         Update a user's password.
 
         :param email: Email of the user to update password.
         :param password: New password.
-        :return: The updated User object with new password.
-        """
-        user = await self.get_user_by_email(email)
-        if user:
-            user.hashed_password = password
-            await self.db.commit()
-            await self.db.refresh(user)
-            return user
+        :return: The updated User object with new password, or None if not
+            found.
+        """
+        return await self._update_by_email(email, hashed_password=password)
@@ -1,5 +1,5 @@
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 
 from src.database.models import UserRole
@@ -20,6 +20,21 @@ class ContactResponse(ContactModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Зміни контактів з моменту попередньої синхронізації
+class ContactChanges(BaseModel):
+    changed: list[ContactResponse]
+    deleted: list[int]
+    next_token: str
+    has_more: bool
+
+
+# Кількість днів народження на день календаря
+class BirthdayCalendarDay(BaseModel):
+    date: date
+    count: int
+    names: list[str]
+
+
 class ContactUpdate(BaseModel):
     first_name: Optional[str] = Field(None, max_length=50)
     last_name: Optional[str] = Field(None, max_length=50)
@@ -74,3 +89,65 @@ class Token(BaseModel):
 
 class RequestEmail(BaseModel):
     email: EmailStr
+
+
+# Відповідь на завантаження аватара, який обробляється у фоні
+class AvatarUploadResponse(BaseModel):
+    job_id: Optional[str]
+    avatar: str
+
+
+# Статус фонового завдання
+class JobResponse(BaseModel):
+    id: str
+    name: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    result: Any = None
+    created_at: datetime
+    updated_at: datetime
+
+
+# Операція пакетного запиту до контактів
+class BatchOperation(BaseModel):
+    op: Literal["read", "create", "update", "delete"]
+    id: Optional[int] = None
+    body: Optional[dict[str, Any]] = None
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(min_length=1)
+    atomic: bool = True
+
+
+class BatchResult(BaseModel):
+    status: int
+    data: Optional[ContactResponse] = None
+    detail: Any = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: list[BatchResult]
+
+
+# Групи контактів, схожих на дублікати
+class DuplicateReportResponse(BaseModel):
+    computed_at: datetime
+    total: int
+    clusters: list[list[ContactResponse]]
+
+
+class DuplicateScanResponse(BaseModel):
+    job_id: Optional[str]
+
+
+# Кластери для об'єднання: перший контакт кожного кластера залишається
+class DuplicateMerge(BaseModel):
+    clusters: list[list[int]] = Field(min_length=1)
+
+
+class DuplicateMergeResponse(BaseModel):
+    kept: list[int]
+    removed: int
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, UTC
 from typing import Optional
 
@@ -11,11 +13,18 @@ import redis.asyncio as redis
 
 from src.database.db import get_db
 from src.conf.config import settings
+from src.services.metrics import HASH_DURATION, HASH_QUEUE_DEPTH, REDIS_LATENCY
+from src.services.tracing import span, traced
 from src.services.users import UserService
 
 
 class Hash:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    # bcrypt releases the GIL, so a small thread pool keeps hashing off the
+    # event loop without blocking other requests
+    executor = ThreadPoolExecutor(
+        max_workers=settings.HASH_WORKERS, thread_name_prefix="bcrypt"
+    )
 
     def verify_password(self, plain_password, hashed_password):
         return self.pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +32,25 @@ class Hash:
     def get_password_hash(self, password: str):
         return self.pwd_context.hash(password)
 
+    async def averify_password(self, plain_password, hashed_password):
+        return await self._run(self.verify_password, plain_password, hashed_password)
+
+    async def aget_password_hash(self, password: str):
+        return await self._run(self.get_password_hash, password)
+
+    async def _run(self, func, *args):
+        HASH_QUEUE_DEPTH.inc()
+
+        def job():
+            HASH_QUEUE_DEPTH.dec()
+            with HASH_DURATION.time():
+                return func(*args)
+
+        with span("bcrypt"):
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, job
+            )
+
 
 # Connecting to Redis
 redis_client = redis.from_url(settings.REDIS_URL)
@@ -44,10 +72,13 @@ async def create_access_token(data: dict, expires_delta: Optional[int] = None):
     return encoded_jwt
 
 
+@traced("auth.get_current_user")
 async def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ):
-    if await redis_client.exists(f"bl:{token}"):
+    with span("redis.exists"), REDIS_LATENCY.labels("exists").time():
+        revoked = await redis_client.exists(f"bl:{token}")
+    if revoked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked"
         )
@@ -60,9 +91,10 @@ async def get_current_user(
 
     try:
         # Decode JWT
-        payload = jwt.decode(
-            token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
-        )
+        with span("jwt.decode"):
+            payload = jwt.decode(
+                token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
+            )
         username = payload["sub"]
         if username is None:
             raise credentials_exception
@@ -0,0 +1,264 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+from src.conf.config import settings
+from src.services.metrics import cache_hit, cache_miss
+from src.services.tracing import span
+from src.services.upload_file import get_executor, resize_variants
+
+# Variant keys written by AvatarService, e.g. avatars/<digest>/md.webp
+_STORED_VARIANT = re.compile(r"/avatars/(?P<digest>[0-9a-f]+)/(?P<size>\w+)\.webp$")
+
+
+class AvatarCache:
+    """
+    Content-addressed directory of generated avatar variants, capped at
+    ``max_bytes`` with least-recently-used eviction.
+
+    Each variant is generated once: concurrent requests for a missing
+    variant wait on the same per-key lock, and files are written under a
+    temporary name and renamed, so a reader never sees a partial file.
+
+    Every worker process shares the directory, so the files themselves are
+    the index: a hit touches its file, and eviction removes the files touched
+    longest ago. Other processes write files too, so the directory is
+    rescanned for its actual size whenever this process has written
+    ``rescan_fraction`` of ``max_bytes`` since the last scan, and the first
+    scan happens on the first miss rather than at startup. Files touched in
+    the last ``min_age`` seconds are never removed, so a file is not deleted
+    between a hit and the response opening it; until they age, the
+    directory can grow past ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        min_age: float = 60.0,
+        rescan_fraction: float = 0.1,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.rescan_bytes = max_bytes * rescan_fraction
+        self.size = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._scan_lock = asyncio.Lock()
+        # Bytes written since the last scan; the directory is not scanned yet
+        self._unscanned = self.rescan_bytes
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "AvatarCache":
+        return cls(config.AVATAR_CACHE_DIR, config.AVATAR_CACHE_MAX_BYTES)
+
+    @staticmethod
+    def key(digest: str, size: int) -> str:
+        # From the source's content digest, not its URL, which can serve a
+        # new image
+        return hashlib.sha256(f"{digest}|{size}".encode()).hexdigest()[:32]
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.webp"
+
+    async def _touch(self, key: str) -> bool:
+        """
+        Mark a variant as used, if its file exists; another process may have
+        evicted it.
+        """
+        try:
+            await asyncio.to_thread(self._set_used, self.path(key))
+        except FileNotFoundError:
+            if self._entries.pop(key, None) is not None:
+                self.size = sum(self._entries.values())
+            return False
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return True
+
+    @staticmethod
+    def _set_used(path: Path) -> None:
+        # File systems stamp modifications with a coarse clock; an explicit
+        # time keeps the use order of files touched in quick succession
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self._set_used(Path(tmp))
+        os.replace(tmp, path)
+
+    def _scan_and_evict(self) -> OrderedDict[str, int]:
+        """
+        Scan the directory, as other processes add, touch and remove files
+        too, and remove the files touched longest ago while it is over
+        ``max_bytes``.
+
+        :return: The sizes of the remaining files, oldest first.
+        """
+        files = []
+        for entry in self.directory.glob("*/*.webp"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, entry.stem, stat.st_size))
+        files.sort()
+        size = sum(file_size for _, _, file_size in files)
+        cutoff = time.time() - self.min_age
+        entries = OrderedDict()
+        for mtime, key, file_size in files:
+            if size > self.max_bytes and mtime <= cutoff:
+                self.path(key).unlink(missing_ok=True)
+                size -= file_size
+            else:
+                entries[key] = file_size
+        return entries
+
+    async def _evict(self) -> None:
+        if self._scan_lock.locked():
+            # Another request is scanning already
+            return
+        async with self._scan_lock:
+            self._unscanned = 0
+            self._entries = await asyncio.to_thread(self._scan_and_evict)
+            self.size = sum(self._entries.values())
+
+    async def get_or_create(
+        self, key: str, produce: Callable[[], Awaitable[bytes]]
+    ) -> Path:
+        """
+        Return the path of a cached variant, producing it first if needed.
+
+        :param key: The cache key.
+        :param produce: Coroutine function returning the variant bytes.
+        :return: The file path.
+        """
+        if await self._touch(key):
+            cache_hit("avatar_variant")
+            return self.path(key)
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            try:
+                if not await self._touch(key):
+                    cache_miss("avatar_variant")
+                    data = await produce()
+                    await asyncio.to_thread(self._write, key, data)
+                    self._entries[key] = len(data)
+                    self.size += len(data)
+                    self._unscanned += len(data)
+                    if (
+                        self.size > self.max_bytes
+                        or self._unscanned >= self.rescan_bytes
+                    ):
+                        await self._evict()
+            finally:
+                # Requests already waiting hold the lock; later ones find
+                # the file
+                self._locks.pop(key, None)
+        return self.path(key)
+
+
+class SourceDigests:
+    """
+    Content digests of avatar source images, which variant keys and ETags
+    derive from, so a URL whose image changes gets new variants. Avatars
+    stored by :class:`AvatarService` carry their digest in the URL. Other
+    sources, such as Gravatar, are fetched and hashed, at most once per
+    ``ttl`` seconds per process.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._digests: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "SourceDigests":
+        return cls(config.AVATAR_SOURCE_TTL_SECONDS)
+
+    async def resolve(self, url: str) -> tuple[str, bytes | None]:
+        """
+        :param url: The source URL.
+        :return: The content digest, and the image if it was fetched for it.
+        """
+        match = _STORED_VARIANT.search(url)
+        if match is not None:
+            return match["digest"], None
+        now = time.monotonic()
+        cached = self._digests.get(url)
+        if cached is not None and cached[1] > now:
+            return cached[0], None
+        data = await fetch_source(url)
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        self._digests[url] = (digest, now + self.ttl)
+        self._digests.move_to_end(url)
+        while len(self._digests) > self.max_entries:
+            self._digests.popitem(last=False)
+        return digest, data
+
+
+def source_url(avatar: str, sizes: dict[str, int]) -> str:
+    """
+    For avatars stored by :class:`AvatarService`, point at the largest stored
+    variant, so smaller variants are never generated from an upscaled image.
+    """
+    match = _STORED_VARIANT.search(avatar)
+    if match is None:
+        return avatar
+    largest = max(sizes, key=sizes.get)
+    return f"{avatar[: match.start('size')]}{largest}.webp"
+
+
+async def fetch_source(url: str, config=settings) -> bytes:
+    """
+    Read an avatar from the local media directory or over HTTP.
+    """
+    prefix = config.AVATAR_LOCAL_URL.rstrip("/") + "/"
+    if url.startswith(prefix):
+        root = Path(config.AVATAR_LOCAL_DIR).resolve()
+        path = (root / url[len(prefix) :]).resolve()
+        if not path.is_relative_to(root):
+            raise FileNotFoundError(url)
+        return await asyncio.to_thread(path.read_bytes)
+
+    with span("avatar.fetch"):
+        async with httpx.AsyncClient(
+            timeout=config.AVATAR_FETCH_TIMEOUT_SECONDS, follow_redirects=True
+        ) as client:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+                chunks, size = [], 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > config.AVATAR_MAX_BYTES:
+                        raise ValueError(f"avatar at {url} is too large")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+
+
+async def render_variant(url: str, size: int, data: bytes | None = None) -> bytes:
+    if data is None:
+        data = await fetch_source(url)
+    with span("avatar.resize"):
+        variants = await asyncio.get_running_loop().run_in_executor(
+            get_executor(), resize_variants, data, {"variant": size}
+        )
+    return variants["variant"]
+
+
+avatar_cache = AvatarCache.from_settings()
+source_digests = SourceDigests.from_settings()
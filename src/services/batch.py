@@ -0,0 +1,114 @@
+import logging
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import User
+from src.schemas import BatchOperation, ContactModel, ContactResponse, ContactUpdate
+from src.services.contacts import ContactService
+
+logger = logging.getLogger(__name__)
+
+
+class BatchService:
+    """
+    Run many contact operations for one user on a single session.
+
+    With ``atomic`` the operations share one transaction: the first failure
+    rolls everything back and the remaining operations are skipped.
+    Otherwise each change runs in its own savepoint, so a failure only
+    undoes that operation, database errors included, and everything else is
+    committed once at the end.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.contact_service = ContactService(db, autocommit=False)
+
+    async def _execute(self, operation: BatchOperation, user: User) -> dict:
+        if operation.op == "create":
+            body = ContactModel.model_validate(operation.body or {})
+            contact = await self.contact_service.create_contact(body, user)
+            code = status.HTTP_201_CREATED
+        else:
+            if operation.id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Не вказано id контакту",
+                )
+            if operation.op == "read":
+                contact = await self.contact_service.get_contact(operation.id, user)
+            elif operation.op == "update":
+                body = ContactUpdate.model_validate(operation.body or {})
+                contact = await self.contact_service.update_contact(
+                    operation.id, body, user
+                )
+            else:
+                contact = await self.contact_service.remove_contact(operation.id, user)
+            code = status.HTTP_200_OK
+        if contact is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
+            )
+        # Serialized right away, as a rollback expires the instance
+        return {"status": code, "data": ContactResponse.model_validate(contact)}
+
+    async def _run_one(self, operation: BatchOperation, user: User, atomic: bool):
+        try:
+            if atomic or operation.op == "read":
+                return await self._execute(operation, user), True
+            async with self.db.begin_nested():
+                return await self._execute(operation, user), True
+        except HTTPException as e:
+            return {"status": e.status_code, "detail": e.detail}, False
+        except ValidationError as e:
+            return {
+                "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                "detail": e.errors(include_url=False, include_context=False),
+            }, False
+        except (IntegrityError, DataError):
+            # The savepoint, or in atomic mode the whole batch, is rolled back
+            return {
+                "status": status.HTTP_400_BAD_REQUEST,
+                "detail": "Помилка цілісності даних.",
+            }, False
+        except SQLAlchemyError:
+            logger.exception("Batch operation %s failed", operation.op)
+            return {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "detail": "Помилка бази даних",
+            }, False
+
+    async def run(
+        self, operations: list[BatchOperation], user: User, atomic: bool = True
+    ) -> dict:
+        """
+        Execute the operations in order.
+
+        :param operations: The operations.
+        :param user: The user owning the contacts.
+        :param atomic: All or nothing, rather than independent operations.
+        :return: Whether the changes were committed, and a result per operation.
+        """
+        results, failed = [], False
+        for operation in operations:
+            if failed:
+                results.append(
+                    {
+                        "status": status.HTTP_424_FAILED_DEPENDENCY,
+                        "detail": "Операцію не виконано",
+                    }
+                )
+                continue
+            result, ok = await self._run_one(operation, user, atomic)
+            results.append(result)
+            failed = atomic and not ok
+
+        if failed:
+            await self.db.rollback()
+        else:
+            await self.db.commit()
+            await self.contact_service.publish_pending()
+        return {"committed": not failed, "results": results}
@@ -0,0 +1,64 @@
+import logging
+from datetime import date
+
+from sqlalchemy import select
+
+from src.conf.config import settings
+from src.database.db import shard_map
+from src.database.models import Contact, User
+from src.repositories.birthdays import BirthdayRepository
+from src.schemas import ContactResponse
+from src.services.jobs import task
+
+logger = logging.getLogger(__name__)
+
+
+def serialize(contacts: list[Contact]) -> list[dict]:
+    return [
+        ContactResponse.model_validate(contact).model_dump(mode="json")
+        for contact in contacts
+    ]
+
+
+async def refresh_digests(db, today: date, batch_size: int) -> int:
+    """
+    Recompute the upcoming-birthday digest of every user, ``batch_size``
+    users per query and commit.
+
+    :return: The number of users refreshed.
+    """
+    repository = BirthdayRepository(db)
+    refreshed, last_id = 0, 0
+    while True:
+        user_ids = (
+            await db.scalars(
+                select(User.id)
+                .where(User.id > last_id)
+                .order_by(User.id)
+                .limit(batch_size)
+            )
+        ).all()
+        if not user_ids:
+            return refreshed
+        versions = await repository.get_versions(user_ids)
+        upcoming = await repository.get_upcoming(user_ids, today)
+        await repository.save_digests(
+            {user_id: serialize(contacts) for user_id, contacts in upcoming.items()},
+            today,
+            versions,
+        )
+        await db.commit()
+        refreshed += len(user_ids)
+        last_id = user_ids[-1]
+
+
+@task("birthdays.refresh")
+async def refresh_birthdays(payload: dict) -> dict:
+    today = date.fromisoformat(payload["day"]) if payload.get("day") else date.today()
+    refreshed = 0
+    # Each shard lists the users whose contacts it holds
+    for shard in shard_map.names:
+        async with shard_map.session(shard) as db:
+            refreshed += await refresh_digests(db, today, settings.BIRTHDAYS_BATCH_SIZE)
+    logger.info("Refreshed %d birthday digests for %s", refreshed, today)
+    return {"users": refreshed, "day": today.isoformat()}
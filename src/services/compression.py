@@ -0,0 +1,191 @@
+import asyncio
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+from src.conf.config import settings
+
+
+class GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        # flush() emits everything so far, so streamed chunks are not held back
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def parse_accept_encoding(value: str) -> dict[str, float]:
+    """
+    Parse an ``Accept-Encoding`` header into ``{coding: q}``.
+    """
+    codings = {}
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(number)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            codings[coding.strip().lower()] = q
+    return codings
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip, whichever the
+    client prefers (brotli on a tie).
+
+    Only responses of an allowed content type and at least ``minimum_size``
+    bytes are compressed; streamed responses are compressed chunk by chunk.
+    Bodies or chunks of ``offload_size`` bytes or more are compressed in a
+    thread, so large exports do not stall the event loop. Both compressors
+    release the GIL while they work.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        content_types=("application/json",),
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        offload_size: int = 64 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+        self.offload_size = offload_size
+        self.codecs = {
+            "br": lambda: BrotliStream(brotli_quality),
+            "gzip": lambda: GzipStream(gzip_level),
+        }
+
+    @classmethod
+    def options_from_settings(cls, config=settings) -> dict:
+        return {
+            "minimum_size": config.COMPRESSION_MIN_SIZE,
+            "content_types": config.COMPRESSION_TYPES,
+            "gzip_level": config.COMPRESSION_GZIP_LEVEL,
+            "brotli_quality": config.COMPRESSION_BROTLI_QUALITY,
+            "offload_size": config.COMPRESSION_OFFLOAD_SIZE,
+        }
+
+    def choose_encoding(self, accept_encoding: str) -> str | None:
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for coding in self.codecs:
+            q = accepted.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    async def run(self, func, data: bytes) -> bytes:
+        if len(data) >= self.offload_size:
+            return await asyncio.to_thread(func, data)
+        return func(data)
+
+
+class _CompressingResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start = None
+        self.stream = None
+        self.passthrough = False
+
+    def _eligible(self, headers: MutableHeaders) -> bool:
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        return (
+            self.start["status"] not in (204, 206, 304)
+            and content_type in self.middleware.content_types
+            and "content-encoding" not in headers
+        )
+
+    def _mark_compressed(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+    async def send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            return
+        if self.passthrough or kind != "http.response.body":
+            if self.start is not None:
+                await self._send(self.start)
+                self.start = None
+            self.passthrough = self.passthrough or self.stream is None
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            # Later chunks of a streamed response
+            data = await self.middleware.run(self.stream.compress, body)
+            if not more_body:
+                data += self.stream.finish()
+            await self._send({"type": kind, "body": data, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        if not self._eligible(headers) or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            self.passthrough = True
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        self.stream = self.middleware.codecs[self.encoding]()
+        self._mark_compressed(headers)
+        if not more_body:
+            stream = self.stream
+
+            def compress_all(data: bytes) -> bytes:
+                return stream.compress(data) + stream.finish()
+
+            data = await self.middleware.run(compress_all, body)
+            headers["Content-Length"] = str(len(data))
+            await self._send(self.start)
+            await self._send({"type": kind, "body": data, "more_body": False})
+            return
+
+        del headers["Content-Length"]
+        await self._send(self.start)
+        data = await self.middleware.run(self.stream.compress, body)
+        await self._send({"type": kind, "body": data, "more_body": True})
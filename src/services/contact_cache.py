@@ -0,0 +1,94 @@
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.metrics import cache_hit, cache_miss
+
+logger = logging.getLogger(__name__)
+
+
+class ContactCache:
+    """
+    Values derived from a user's contacts, cached in Redis until the user's
+    contacts change.
+
+    Every key includes the user's generation, a counter bumped on each
+    change, so one INCR invalidates all of the user's entries and a value
+    computed before a change is never stored under the new generation. Old
+    entries expire after ``ttl`` seconds. Redis errors are logged and the
+    value is computed instead.
+
+    A bump can fail and leave the generation unchanged, so entries can also
+    be stored with a watermark read from the database, and are only used
+    while it is unchanged.
+    """
+
+    def __init__(self, redis_client, prefix: str = "contacts", ttl: int = 86400):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "ContactCache":
+        client = redis.from_url(
+            config.CACHE_REDIS_URL or config.REDIS_URL, decode_responses=True
+        )
+        return cls(client, ttl=config.CACHE_TTL_SECONDS)
+
+    def _generation_key(self, user_id: int) -> str:
+        return f"{self.prefix}:gen:{user_id}"
+
+    async def bump(self, user_id: int) -> None:
+        try:
+            await self.redis.incr(self._generation_key(user_id))
+        except (RedisError, OSError) as e:
+            logger.warning("Contact cache not invalidated for %s: %s", user_id, e)
+
+    async def get_or_compute(
+        self,
+        user_id: int,
+        name: str,
+        compute: Callable[[], Awaitable[Any]],
+        watermark: Callable[[], Awaitable[Any]] | None = None,
+    ) -> Any:
+        """
+        Return a cached JSON-serializable value, computing it on a miss.
+
+        :param user_id: The user the value belongs to.
+        :param name: Identifies the value among the user's entries.
+        :param compute: Coroutine function returning the value.
+        :param watermark: Coroutine function returning a JSON-serializable
+            value that changes whenever the user's contacts do. Read before
+            computing, so a change made meanwhile is not missed.
+        """
+        try:
+            generation = await self.redis.get(self._generation_key(user_id)) or "0"
+            key = f"{self.prefix}:{user_id}:{generation}:{name}"
+            cached = await self.redis.get(key)
+        except (RedisError, OSError) as e:
+            logger.warning("Contact cache unavailable: %s", e)
+            return await compute()
+        mark = await watermark() if watermark is not None else None
+        if cached is not None:
+            entry = json.loads(cached)
+            # Entries stored before watermarks were kept lack the envelope
+            if isinstance(entry, dict) and entry.get("watermark") == mark:
+                cache_hit("contacts")
+                return entry["value"]
+
+        cache_miss("contacts")
+        value = await compute()
+        try:
+            await self.redis.set(
+                key, json.dumps({"watermark": mark, "value": value}), ex=self.ttl
+            )
+        except (RedisError, OSError) as e:
+            logger.warning("Contact cache not updated: %s", e)
+        return value
+
+
+contact_cache = ContactCache.from_settings()
@@ -1,10 +1,28 @@
+import base64
+import binascii
+import calendar
+import json
+from datetime import date, datetime, timedelta
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 
+from src.conf.config import settings
+from src.repositories.birthdays import BirthdayRepository
 from src.repositories.contacts import ContactRepository
 from src.schemas import ContactModel, ContactUpdate
-from src.database.models import User
+from src.database.models import (
+    User,
+    month_day,
+    normalize_email,
+    normalize_phone,
+    utcnow,
+)
+from src.services.birthdays import serialize
+from src.services.contact_cache import contact_cache
+from src.services.events import event_hub
+from src.services.metrics import cache_hit, cache_miss
 
 
 def _handle_integrity_error(e: IntegrityError):
@@ -20,16 +38,107 @@ def _handle_integrity_error(e: IntegrityError):
         )
 
 
+def encode_sync_token(cursors: dict) -> str:
+    """
+    Pack the ``changed`` and ``deleted`` cursors into an opaque token.
+    """
+    data = {
+        name: None if cursor is None else [cursor[0].isoformat(), cursor[1]]
+        for name, cursor in cursors.items()
+    }
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_sync_token(token: str) -> dict:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {
+            name: (
+                None
+                if data[name] is None
+                else (datetime.fromisoformat(data[name][0]), int(data[name][1]))
+            )
+            for name in ("changed", "deleted")
+        }
+    except (binascii.Error, ValueError, TypeError, KeyError, IndexError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Недійсний токен синхронізації",
+        )
+
+
+def _advance(cursor, rows, column: str, more: bool, horizon):
+    if rows:
+        cursor = (getattr(rows[-1], column), rows[-1].id)
+    if not more and cursor is not None:
+        # Transactions still in flight may commit rows stamped before the
+        # newest row seen, so the next sync repeats the last few seconds
+        cursor = min(cursor, horizon)
+    return cursor
+
+
+def _calendar_days(rows, start: date, end: date, names: int) -> list[dict]:
+    by_md = {}
+    for md, total, first_name, last_name in rows:
+        entry = by_md.setdefault(md, {"count": total, "names": []})
+        entry["names"].append(f"{first_name} {last_name}")
+
+    days = []
+    day = start
+    while day <= end:
+        entries = [by_md.get(month_day(day))]
+        # 29 February birthdays fall on 28 February in common years
+        if month_day(day) == 228 and not calendar.isleap(day.year):
+            entries.append(by_md.get(229))
+        entries = [entry for entry in entries if entry]
+        if entries:
+            days.append(
+                {
+                    "date": day.isoformat(),
+                    "count": sum(entry["count"] for entry in entries),
+                    "names": [n for entry in entries for n in entry["names"]][:names],
+                }
+            )
+        day += timedelta(days=1)
+    return days
+
+
 class ContactService:
-    def __init__(self, db: AsyncSession):
-        self.contact_repository = ContactRepository(db)
+    def __init__(self, db: AsyncSession, autocommit: bool = True):
+        self.contact_repository = ContactRepository(db, autocommit)
+        self.pending_events: list[tuple[int, dict]] = []
+
+    async def _rollback(self):
+        # Without autocommit the caller owns the transaction and rolls back
+        if self.contact_repository.autocommit:
+            await self.contact_repository.db.rollback()
+
+    async def _notify(self, kind: str, contact, user: User):
+        event = {"type": f"contact.{kind}", "id": contact.id}
+        if kind != "deleted":
+            event["updated_at"] = contact.updated_at.isoformat()
+        if self.contact_repository.autocommit:
+            await event_hub.publish(user.id, event)
+            await contact_cache.bump(user.id)
+        else:
+            # Published by the caller once the transaction is committed
+            self.pending_events.append((user.id, event))
+
+    async def publish_pending(self):
+        events, self.pending_events = self.pending_events, []
+        for user_id, event in events:
+            await event_hub.publish(user_id, event)
+        for user_id in {user_id for user_id, _ in events}:
+            await contact_cache.bump(user_id)
 
     async def create_contact(self, body: ContactModel, user: User):
         try:
-            return await self.contact_repository.create_contact(body, user)
+            contact = await self.contact_repository.create_contact(body, user)
         except IntegrityError as e:
-            await self.contact_repository.db.rollback()
+            await self._rollback()
             _handle_integrity_error(e)
+        await self._notify("created", contact, user)
+        return contact
 
     async def get_contacts(self, skip: int, limit: int, user: User):
         return await self.contact_repository.get_contacts(skip, limit, user)
@@ -39,13 +148,66 @@ class ContactService:
 
     async def update_contact(self, contact_id: int, body: ContactUpdate, user: User):
         try:
-            return await self.contact_repository.update_contact(contact_id, body, user)
+            contact = await self.contact_repository.update_contact(
+                contact_id, body, user
+            )
         except IntegrityError as e:
-            await self.contact_repository.db.rollback()
+            await self._rollback()
             _handle_integrity_error(e)
+        if contact is not None:
+            await self._notify("updated", contact, user)
+        return contact
 
     async def remove_contact(self, contact_id: int, user: User):
-        return await self.contact_repository.remove_contact(contact_id, user)
+        contact = await self.contact_repository.remove_contact(contact_id, user)
+        if contact is not None:
+            await self._notify("deleted", contact, user)
+        return contact
+
+    async def get_changes(self, since: str | None, limit: int, user: User) -> dict:
+        """
+        Contacts created, modified or deleted since a sync token. Without a
+        token every contact is returned. Pages are followed with
+        ``next_token`` while ``has_more`` is set; clients apply ``deleted``
+        before ``changed``.
+        """
+        horizon = (
+            utcnow() - timedelta(seconds=settings.SYNC_WINDOW_SECONDS),
+            0,
+        )
+        if since is None:
+            cursors = {"changed": None, "deleted": horizon}
+        else:
+            cursors = decode_sync_token(since)
+
+        contacts = await self.contact_repository.get_changes(
+            user, cursors["changed"], limit + 1
+        )
+        tombstones = (
+            []
+            if since is None
+            else await self.contact_repository.get_tombstones(
+                user, cursors["deleted"], limit + 1
+            )
+        )
+        more_changed = len(contacts) > limit
+        more_deleted = len(tombstones) > limit
+        contacts, tombstones = contacts[:limit], tombstones[:limit]
+
+        next_cursors = {
+            "changed": _advance(
+                cursors["changed"], contacts, "updated_at", more_changed, horizon
+            ),
+            "deleted": _advance(
+                cursors["deleted"], tombstones, "deleted_at", more_deleted, horizon
+            ),
+        }
+        return {
+            "changed": contacts,
+            "deleted": [tombstone.contact_id for tombstone in tombstones],
+            "next_token": encode_sync_token(next_cursors),
+            "has_more": more_changed or more_deleted,
+        }
 
     async def search_contacts(
         self,
@@ -63,10 +225,79 @@ class ContactService:
             first_name, last_name, email, user
         )
 
+    async def lookup_contacts(
+        self, phone: str | None = None, email: str | None = None, user: User = None
+    ):
+        """
+        Contacts with exactly this phone number or email, however either was
+        written.
+        """
+        if (phone is None) == (email is None):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Вкажіть телефон або email.",
+            )
+        if phone is not None:
+            phone_e164 = normalize_phone(phone)
+            if phone_e164 is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Некоректний номер телефону.",
+                )
+            return await self.contact_repository.lookup_contacts(
+                user, phone_e164=phone_e164
+            )
+        email_normalized = normalize_email(email)
+        if email_normalized is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Вкажіть телефон або email.",
+            )
+        return await self.contact_repository.lookup_contacts(
+            user, email_normalized=email_normalized
+        )
+
     async def get_upcoming_birthdays(self, user: User):
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Помилка авторизації.",
             )
-        return await self.contact_repository.get_upcoming_birthdays(user)
+        today = date.today()
+        birthday_repository = BirthdayRepository(self.contact_repository.db)
+        digest = await birthday_repository.get_digest(user.id, today)
+        if digest is not None:
+            cache_hit("birthday_digest")
+            return digest
+
+        cache_miss("birthday_digest")
+        versions = await birthday_repository.get_versions([user.id])
+        contacts = serialize(await self.contact_repository.get_upcoming_birthdays(user))
+        await birthday_repository.save_digests({user.id: contacts}, today, versions)
+        await self.contact_repository.db.commit()
+        return contacts
+
+    async def get_birthday_calendar(self, start: date, end: date, user: User):
+        """
+        Birthdays per day between two dates, at most a year apart. Cached
+        until the user's contacts change, checked against the latest change
+        in the database too.
+        """
+        if end < start or (end - start).days > 366:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некоректний діапазон дат: не більше одного року.",
+            )
+
+        async def compute():
+            rows = await BirthdayRepository(self.contact_repository.db).get_calendar(
+                user.id, start, end, settings.BIRTHDAYS_CALENDAR_NAMES
+            )
+            return _calendar_days(rows, start, end, settings.BIRTHDAYS_CALENDAR_NAMES)
+
+        return await contact_cache.get_or_compute(
+            user.id,
+            f"calendar:{start.isoformat()}:{end.isoformat()}",
+            compute,
+            watermark=lambda: self.contact_repository.get_watermark(user),
+        )
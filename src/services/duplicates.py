@@ -0,0 +1,177 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.models import Contact, User
+from src.repositories.duplicates import DuplicateRepository
+from src.services.contact_cache import contact_cache
+from src.services.events import RESYNC, event_hub
+from src.services.jobs import task
+from src.services.shards import contact_session
+
+logger = logging.getLogger(__name__)
+
+# Keeps references to scans running in this process
+_background: set[asyncio.Task] = set()
+
+# Blocking keys: contacts are only compared when they share one of these
+BLOCKING_KEYS = [
+    [Contact.phone_e164],
+    [Contact.email_normalized],
+    [Contact.name_key, Contact.birthday],
+]
+
+
+class DisjointSet:
+    """
+    Union-find over contact IDs, with path halving. The smallest ID of a
+    cluster is its root.
+    """
+
+    def __init__(self):
+        self.parent: dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        parent.setdefault(item, item)
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, items: list[int]) -> None:
+        roots = {self.find(item) for item in items}
+        root = min(roots)
+        for other in roots:
+            self.parent[other] = root
+
+    def clusters(self) -> list[list[int]]:
+        groups: dict[int, list[int]] = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+
+async def find_clusters(
+    repository: DuplicateRepository, user_id: int, max_block: int
+) -> list[list[int]]:
+    """
+    Group a user's contacts that share a normalized phone, a normalized
+    email, or a phonetic name key and birthday.
+
+    Only contacts sharing a blocking key are ever compared, so the cost grows
+    with the number of contacts rather than its square. Blocks are grouped
+    by the database from the indexes on those keys, so only contacts with a
+    possible duplicate are read. Blocks of more than ``max_block`` contacts
+    are ignored.
+    """
+    clusters = DisjointSet()
+    for columns in BLOCKING_KEYS:
+        for ids in await repository.get_groups(user_id, columns, max_block):
+            clusters.union(ids)
+    return clusters.clusters()
+
+
+class DuplicateService:
+    def __init__(self, db: AsyncSession):
+        self.repository = DuplicateRepository(db)
+
+    async def scan(self, user_id: int) -> list[list[int]]:
+        clusters = await find_clusters(
+            self.repository, user_id, settings.DUPLICATES_MAX_BLOCK
+        )
+        await self.repository.save_report(user_id, clusters)
+        await self.repository.db.commit()
+        return clusters
+
+    async def get_report(self, skip: int, limit: int, user: User) -> dict:
+        report = await self.repository.get_report(user.id)
+        if report is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Пошук дублікатів ще не виконано",
+            )
+        page = report.clusters[skip : skip + limit]
+        contacts = {
+            contact.id: contact
+            for contact in await self.repository.get_contacts(
+                user.id, [contact_id for cluster in page for contact_id in cluster]
+            )
+        }
+        # Contacts deleted since the scan drop out of their cluster
+        clusters = [
+            [contacts[contact_id] for contact_id in cluster if contact_id in contacts]
+            for cluster in page
+        ]
+        return {
+            "computed_at": report.computed_at,
+            "total": len(report.clusters),
+            "clusters": [cluster for cluster in clusters if len(cluster) > 1],
+        }
+
+    async def merge(self, clusters: list[list[int]], user: User) -> dict:
+        """
+        Merge each cluster into its first contact. Either every cluster is
+        merged or none is.
+        """
+        ids = [contact_id for cluster in clusters for contact_id in cluster]
+        if len(ids) > settings.DUPLICATES_MERGE_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Не більше {settings.DUPLICATES_MERGE_MAX} контактів за раз",
+            )
+        if len(set(ids)) != len(ids) or any(len(cluster) < 2 for cluster in clusters):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некоректні кластери для об'єднання",
+            )
+
+        merges = {cluster[0]: cluster[1:] for cluster in clusters}
+        removed = await self.repository.merge(user.id, merges)
+        if removed is None:
+            await self.repository.db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Контакт не знайдено"
+            )
+        report = await self.repository.get_report(user.id)
+        if report is not None:
+            gone = {contact_id for cluster in clusters for contact_id in cluster[1:]}
+            remaining = [
+                [contact_id for contact_id in cluster if contact_id not in gone]
+                for cluster in report.clusters
+            ]
+            await self.repository.save_report(
+                user.id, [cluster for cluster in remaining if len(cluster) > 1]
+            )
+        await self.repository.db.commit()
+
+        # Many contacts change at once, so clients catch up through delta sync
+        await event_hub.publish(user.id, RESYNC)
+        await contact_cache.bump(user.id)
+        return {"kept": list(merges), "removed": removed}
+
+
+@task("contacts.duplicates")
+async def scan_duplicates(payload: dict) -> dict:
+    async with contact_session(payload["user_id"]) as db:
+        clusters = await DuplicateService(db).scan(payload["user_id"])
+    return {"clusters": len(clusters), "contacts": sum(map(len, clusters))}
+
+
+def scan_duplicates_in_background(payload: dict) -> None:
+    """
+    Scan in this process, for when the job queue is unavailable.
+    """
+
+    async def run():
+        try:
+            await scan_duplicates(payload)
+        except Exception:
+            logger.exception("Duplicate scan failed for user %s", payload["user_id"])
+
+    job = asyncio.create_task(run())
+    _background.add(job)
+    job.add_done_callback(_background.discard)
@@ -1,62 +1,266 @@
+import asyncio
+import contextlib
+import logging
+import random
+from datetime import timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
-from pydantic import EmailStr
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from redis.exceptions import RedisError
 
-from src.services.auth import create_email_token
 from src.conf.config import settings
+from src.database.db import sessionmanager
+from src.database.models import utcnow
+from src.repositories.outbox import OutboxRepository
+from src.services.auth import create_email_token
+from src.services.jobs import job_queue, task
+from src.services.metrics import EMAIL_SEND_DURATION, EMAILS_FAILED, EMAILS_SENT
+from src.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# kind -> (subject, template)
+EMAIL_KINDS = {
+    "verify_email": ("Confirm your email", "verify_email.html"),
+    "reset_password": ("Password Reset Request", "reset_password.html"),
+}
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS=settings.MAIL_STARTTLS,
-    MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=settings.USE_CREDENTIALS,
-    VALIDATE_CERTS=settings.VALIDATE_CERTS,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
+# Compiled templates are cached by the environment
+templates = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "templates"),
+    autoescape=select_autoescape(["html"]),
 )
 
 
-async def send_email(email: EmailStr, username: str, host: str):
+def queue_email(db: AsyncSession, kind: str, email: str, username: str, host) -> None:
+    """
+    Put an email into the outbox. It is committed together with the caller's
+    transaction and delivered by :class:`OutboxDispatcher`.
+
+    :param db: The request's database session.
+    :param kind: One of :data:`EMAIL_KINDS`.
+    :param email: The recipient address.
+    :param username: The recipient's username.
+    :param host: The base URL for links in the email.
+    """
+    if kind not in EMAIL_KINDS:
+        raise ValueError(f"Unknown email kind: {kind!r}")
+    OutboxRepository(db).add(kind, email, username, str(host))
+
+
+async def request_delivery() -> None:
+    """
+    Ask a job worker to deliver the outbox right away. Call it after the
+    transaction holding the queued email is committed. If the job queue is
+    unavailable the email is still sent on the dispatcher's next poll.
+    """
     try:
-        token_verification = create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
+        await job_queue.enqueue("email.deliver")
+    except (RedisError, OSError) as e:
+        logger.warning("Could not queue email delivery: %s", e)
+
+
+def render_email(kind: str, email: str, username: str, host: str) -> EmailMessage:
+    subject, template_name = EMAIL_KINDS[kind]
+    body = templates.get_template(template_name).render(
+        host=host,
+        username=username,
+        token=create_email_token({"sub": email}),
+    )
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = email
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
+    return message
+
+
+class SMTPPool:
+    """
+    Pool of connected and authenticated SMTP connections.
+    """
+
+    def __init__(self, size: int, config=settings):
+        self.config = config
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: list[aiosmtplib.SMTP] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            timeout=self.config.MAIL_TIMEOUT_SECONDS,
         )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        return smtp
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="verify_email.html")
-    except ConnectionErrors as err:
-        print(err)
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        async with self._semaphore:
+            smtp = self._idle.pop() if self._idle else None
+            if smtp is None or not smtp.is_connected:
+                smtp = await self._connect()
+            try:
+                yield smtp
+            except Exception:
+                smtp.close()
+                raise
+            self._idle.append(smtp)
 
+    async def send(self, message: EmailMessage) -> None:
+        """
+        Send a message, reconnecting once if the server dropped an idle
+        connection.
+        """
+        for attempt in range(2):
+            try:
+                async with self.connection() as smtp:
+                    await smtp.send_message(message)
+                return
+            except aiosmtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
 
-async def send_email_reset_password(email: EmailStr, username: str, host: str):
-    try:
-        token_verification = create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Password Reset Request",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
+    async def close(self) -> None:
+        while self._idle:
+            smtp = self._idle.pop()
+            with contextlib.suppress(aiosmtplib.SMTPException):
+                await smtp.quit()
+
+
+class OutboxDispatcher:
+    """
+    Deliver pending outbox emails in batches over an :class:`SMTPPool`,
+    retrying failures with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        pool: SMTPPool,
+        batch_size: int = 50,
+        max_attempts: int = 8,
+        retry_base: float = 30.0,
+        poll_interval: float = 2.0,
+        lease: float = 600.0,
+    ):
+        self.session_maker = session_maker
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.poll_interval = poll_interval
+        self.lease = lease
+
+    @classmethod
+    def from_settings(cls, session_maker: async_sessionmaker, config=settings):
+        return cls(
+            session_maker,
+            SMTPPool(config.MAIL_POOL_SIZE, config),
+            batch_size=config.MAIL_BATCH_SIZE,
+            max_attempts=config.MAIL_MAX_ATTEMPTS,
+            retry_base=config.MAIL_RETRY_BASE_SECONDS,
+            poll_interval=config.MAIL_POLL_INTERVAL_SECONDS,
+            lease=config.MAIL_LEASE_SECONDS,
         )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password.html")
-    except ConnectionErrors as err:
-        print(err)
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.retry_base * 2**attempts, 3600)
+        return delay * random.uniform(0.9, 1.1)
+
+    async def _send(self, kind: str, email: str, username: str, host: str):
+        message = render_email(kind, email, username, host)
+        with span("email.send"), EMAIL_SEND_DURATION.time():
+            await self.pool.send(message)
+
+    async def dispatch_once(self) -> int:
+        """
+        Deliver one batch of due emails. The batch is claimed in one short
+        transaction and the results recorded in another, so no rows stay
+        locked while the messages are sent.
+
+        :return: The number of emails attempted.
+        """
+        async with self.session_maker() as session:
+            now = utcnow()
+            messages = await OutboxRepository(session).claim_due(
+                self.batch_size, now, now + timedelta(seconds=self.lease)
+            )
+            await session.commit()
+        if not messages:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._send(m.kind, m.recipient, m.username, m.host) for m in messages),
+            return_exceptions=True,
+        )
+
+        async with self.session_maker() as session:
+            repository = OutboxRepository(session)
+            now = utcnow()
+            sent = []
+            for message, result in zip(messages, results):
+                if not isinstance(result, Exception):
+                    sent.append(message.id)
+                    EMAILS_SENT.labels(message.kind).inc()
+                    continue
+                attempts = message.attempts + 1
+                retry = attempts < self.max_attempts
+                retry_at = (
+                    now + timedelta(seconds=self.backoff(attempts)) if retry else None
+                )
+                EMAILS_FAILED.labels(message.kind, str(retry).lower()).inc()
+                logger.warning(
+                    "Email %s to %s failed (attempt %s): %s",
+                    message.id,
+                    message.recipient,
+                    attempts,
+                    result,
+                )
+                await repository.mark_failed(message.id, repr(result), retry_at)
+            await repository.mark_sent(sent, now)
+            await session.commit()
+        return len(messages)
+
+    async def run_forever(self) -> None:
+        try:
+            while True:
+                try:
+                    processed = await self.dispatch_once()
+                except Exception:
+                    logger.exception("Outbox dispatch failed")
+                    processed = 0
+                if processed < self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            await self.pool.close()
+
+
+_dispatcher: OutboxDispatcher | None = None
+
+
+def get_dispatcher() -> OutboxDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = OutboxDispatcher.from_settings(sessionmanager._session_maker)
+    return _dispatcher
+
+
+@task("email.deliver")
+async def deliver_outbox(payload: dict) -> int:
+    return await get_dispatcher().dispatch_once()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(get_dispatcher().run_forever())
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.metrics import CONTACT_EVENTS, EVENT_SUBSCRIPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of the backlog to a consumer that fell behind, or after events
+# may have been lost; the client catches up through /api/contacts/changes
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """
+    Events waiting to be sent to one connection.
+    """
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(queue_size)
+
+    def put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+            CONTACT_EVENTS.labels("delivered").inc()
+        except asyncio.QueueFull:
+            # Never block the shared reader on a slow consumer
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            CONTACT_EVENTS.labels("dropped").inc()
+
+
+class EventHub:
+    """
+    Publishes contact change events to a Redis channel per user and fans
+    them out to the connections of this process.
+
+    The process holds a single pub/sub connection, subscribed to the
+    channels of the users connected here, and one reader task dispatches
+    every message to the local queues. Each queue holds at most
+    ``queue_size`` events; when it is full the backlog is replaced with
+    :data:`RESYNC`.
+    """
+
+    def __init__(self, redis_client, prefix: str, queue_size: int = 100):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self._local: dict[int, set[Subscription]] = {}
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "EventHub":
+        client = redis.from_url(
+            config.EVENTS_REDIS_URL or config.REDIS_URL, decode_responses=True
+        )
+        return cls(client, config.EVENTS_CHANNEL_PREFIX, config.EVENTS_QUEUE_SIZE)
+
+    def channel(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def publish(self, user_id: int, event: dict) -> None:
+        """
+        Publish an event to every connection of a user. Failures are logged
+        and ignored: clients catch up through delta sync.
+        """
+        try:
+            await self.redis.publish(self.channel(user_id), json.dumps(event))
+            CONTACT_EVENTS.labels("published").inc()
+        except (RedisError, OSError) as e:
+            CONTACT_EVENTS.labels("failed").inc()
+            logger.warning("Contact event not published: %s", e)
+
+    async def subscribe(self, user_id: int) -> Subscription:
+        """
+        Start receiving a user's events. Raises RedisError when Redis is
+        unavailable.
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        async with self._lock:
+            subscriptions = self._local.setdefault(user_id, set())
+            subscriptions.add(subscription)
+            if len(subscriptions) == 1:
+                try:
+                    if self._pubsub is None:
+                        self._pubsub = self.redis.pubsub()
+                    await self._pubsub.subscribe(self.channel(user_id))
+                except (RedisError, OSError):
+                    del self._local[user_id]
+                    raise
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read())
+        EVENT_SUBSCRIPTIONS.inc()
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._local.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        EVENT_SUBSCRIPTIONS.dec()
+        async with self._lock:
+            if (
+                subscriptions
+                or self._local.get(subscription.user_id) is not subscriptions
+            ):
+                return
+            del self._local[subscription.user_id]
+            try:
+                await self._pubsub.unsubscribe(self.channel(subscription.user_id))
+            except (RedisError, OSError) as e:
+                logger.warning("Contact events unsubscribe failed: %s", e)
+
+    def dispatch(self, channel: str, data: str) -> None:
+        try:
+            user_id = int(channel.rsplit(":", 1)[1])
+            event = json.loads(data)
+        except (IndexError, ValueError):
+            logger.warning("Malformed contact event on %s", channel)
+            return
+        for subscription in self._local.get(user_id, ()):
+            subscription.put(event)
+
+    def _broadcast(self, event: dict) -> None:
+        for subscriptions in self._local.values():
+            for subscription in subscriptions:
+                subscription.put(event)
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except (RedisError, OSError) as e:
+                # The connection resubscribes when it reconnects, but
+                # anything published meanwhile is lost
+                logger.warning("Contact event subscription failed: %s", e)
+                self._broadcast(RESYNC)
+                await asyncio.sleep(1.0)
+                continue
+            if message is not None and message["type"] == "message":
+                self.dispatch(message["channel"], message["data"])
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+async def sse_stream(
+    hub: EventHub, subscription: Subscription, heartbeat: float
+) -> AsyncIterator[str]:
+    """
+    Format a subscription as Server-Sent Events, with a comment every
+    ``heartbeat`` seconds so proxies keep idle connections open.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        await hub.unsubscribe(subscription)
+
+
+event_hub = EventHub.from_settings()
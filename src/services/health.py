@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, UTC
+from typing import Awaitable, Callable
+
+import aiosmtplib
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import settings
+from src.database.db import sessionmanager, shard_map
+from src.services.auth import redis_client
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+DEGRADED = "degraded"
+DOWN = "down"
+
+Check = Callable[[], Awaitable[dict | None]]
+
+
+def pool_stats(engine: AsyncEngine) -> dict | None:
+    """
+    Connection pool usage of an engine, or None for pools without a size
+    limit (e.g. the StaticPool used in tests).
+    """
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "size") or not hasattr(pool, "checkedout"):
+        return None
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "checked_out": checked_out,
+        "capacity": capacity,
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+    }
+
+
+def database_check(engine: AsyncEngine) -> Check:
+    async def check():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return {"pool": pool_stats(engine)}
+
+    return check
+
+
+def redis_check(client) -> Check:
+    async def check():
+        await client.ping()
+
+    return check
+
+
+def smtp_check(config=settings) -> Check:
+    async def check():
+        smtp = aiosmtplib.SMTP(
+            hostname=config.MAIL_SERVER,
+            port=config.MAIL_PORT,
+            use_tls=config.MAIL_SSL_TLS,
+            start_tls=config.MAIL_STARTTLS,
+            validate_certs=config.VALIDATE_CERTS,
+            timeout=config.HEALTH_TIMEOUT_SECONDS,
+        )
+        await smtp.connect()
+        await smtp.quit()
+
+    return check
+
+
+class HealthProber:
+    """
+    Probe dependencies in the background and keep the latest results, so
+    liveness and readiness requests are answered without any I/O.
+
+    Each check runs every ``interval`` seconds, or its own interval given in
+    ``intervals``, with a ``timeout``. A check is degraded when it is slower
+    than ``slow_ms`` or its pool saturation reaches ``saturation``. The
+    service is ready while every ``critical`` check is up and results are
+    fresh.
+    """
+
+    def __init__(
+        self,
+        checks: dict[str, Check],
+        critical: list[str],
+        interval: float = 5.0,
+        intervals: dict[str, float] | None = None,
+        timeout: float = 2.0,
+        slow_ms: float = 100.0,
+        saturation: float = 0.9,
+    ):
+        self.checks = checks
+        self.critical = critical
+        self.interval = interval
+        self.intervals = intervals or {}
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self.saturation = saturation
+        self.results: dict[str, dict] = {}
+        self.loop_lag_ms = 0.0
+        self.started_at = time.monotonic()
+        self._checked_at: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, checks: dict[str, Check], config=settings):
+        return cls(
+            checks,
+            critical=config.HEALTH_CRITICAL,
+            interval=config.HEALTH_INTERVAL_SECONDS,
+            intervals={"smtp": config.HEALTH_SMTP_INTERVAL_SECONDS},
+            timeout=config.HEALTH_TIMEOUT_SECONDS,
+            slow_ms=config.HEALTH_SLOW_MS,
+            saturation=config.HEALTH_POOL_SATURATION,
+        )
+
+    async def _run_check(self, name: str, check: Check) -> None:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(check(), self.timeout) or {}
+            error = None
+        except Exception as e:
+            details, error = {}, repr(e)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        if error:
+            status = DOWN
+        elif latency_ms > self.slow_ms or (
+            (details.get("pool") or {}).get("saturation", 0) >= self.saturation
+        ):
+            status = DEGRADED
+        else:
+            status = OK
+        if status != self.results.get(name, {}).get("status", OK):
+            logger.warning("Health check %s is %s: %s", name, status, error)
+        self.results[name] = {
+            "status": status,
+            "latency_ms": round(latency_ms, 3),
+            "checked_at": datetime.now(UTC).isoformat(),
+            "error": error,
+            **details,
+        }
+        self._checked_at[name] = time.monotonic()
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        Run every check whose interval has elapsed, concurrently.
+        """
+        now = time.monotonic()
+        due = [
+            self._run_check(name, check)
+            for name, check in self.checks.items()
+            if force
+            or now - self._checked_at.get(name, -1e9)
+            >= self.intervals.get(name, self.interval)
+        ]
+        await asyncio.gather(*due)
+
+    async def run_forever(self) -> None:
+        while True:
+            await self.refresh()
+            # A late wake-up means something is blocking the event loop
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.loop_lag_ms = round(max(time.perf_counter() - expected, 0) * 1000, 3)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _stale(self, name: str) -> bool:
+        checked_at = self._checked_at.get(name)
+        max_age = 3 * max(self.intervals.get(name, self.interval), self.timeout)
+        return checked_at is None or time.monotonic() - checked_at > max_age
+
+    def liveness(self) -> dict:
+        return {
+            "status": OK,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "loop_lag_ms": self.loop_lag_ms,
+        }
+
+    def readiness(self) -> tuple[bool, dict]:
+        """
+        :return: Whether the service is ready, and the latest results.
+        """
+        checks = {}
+        for name in self.checks:
+            result = dict(self.results.get(name) or {"status": DOWN})
+            if self._stale(name):
+                result["status"] = DOWN
+                result["error"] = result.get("error") or "no recent result"
+            result["critical"] = name in self.critical
+            checks[name] = result
+
+        ready = all(
+            checks[name]["status"] != DOWN for name in self.critical if name in checks
+        )
+        statuses = {result["status"] for result in checks.values()}
+        if not ready:
+            status = DOWN
+        elif statuses - {OK}:
+            status = DEGRADED
+        else:
+            status = OK
+        return ready, {
+            "status": status,
+            "loop_lag_ms": self.loop_lag_ms,
+            "checks": checks,
+        }
+
+
+prober = HealthProber.from_settings(
+    {
+        "database": database_check(sessionmanager._engine),
+        # Not critical by default: a shard that is down only affects its users
+        **{
+            f"shard:{name}": database_check(shard_map.shards[name]._engine)
+            for name in shard_map.names
+            if not shard_map.is_global(name)
+        },
+        "redis": redis_check(redis_client),
+        "smtp": smtp_check(),
+    }
+)
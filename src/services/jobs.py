@@ -0,0 +1,407 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError, ResponseError
+
+from src.conf.config import settings
+from src.services.metrics import JOB_DURATION, JOBS_PROCESSED
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+DEAD = "dead"
+
+Handler = Callable[[dict], Awaitable[Any]]
+
+# name -> handler, filled by the @task decorator
+tasks: dict[str, Handler] = {}
+
+# Modules that register job handlers; the worker imports them on start
+TASK_MODULES = [
+    "src.services.email",
+    "src.services.upload_file",
+    "src.services.birthdays",
+    "src.services.duplicates",
+]
+
+# Atomically move delayed retries that are due back onto the stream
+PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    local job = cjson.decode(member)
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*',
+        'id', job.id, 'name', job.name, 'payload', job.payload)
+end
+return #due
+"""
+
+
+def task(name: str):
+    """
+    Register a coroutine as the handler of a job name. The handler receives
+    the job payload and may return a JSON-serializable result, which is kept
+    with the job status.
+    """
+
+    def decorator(func: Handler) -> Handler:
+        tasks[name] = func
+        return func
+
+    return decorator
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat()
+
+
+class JobQueue:
+    """
+    Job queue on a Redis stream read by a consumer group. Each job also has a
+    status hash (``job:<id>``) that expires ``result_ttl`` seconds after its
+    last update. Failed jobs wait in a sorted set until their retry is due and
+    end up in the ``<stream>:dead`` stream after ``max_attempts``.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        stream: str = "jobs",
+        group: str = "workers",
+        max_attempts: int = 5,
+        retry_base: float = 5.0,
+        result_ttl: int = 86400,
+        maxlen: int = 100_000,
+    ):
+        self.redis = redis_client
+        self.stream = stream
+        self.group = group
+        self.delayed = f"{stream}:delayed"
+        self.dead = f"{stream}:dead"
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.result_ttl = result_ttl
+        self.maxlen = maxlen
+        self._promote = redis_client.register_script(PROMOTE_SCRIPT)
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "JobQueue":
+        client = redis.from_url(
+            config.JOBS_REDIS_URL or config.REDIS_URL, decode_responses=True
+        )
+        return cls(
+            client,
+            stream=config.JOBS_STREAM,
+            group=config.JOBS_GROUP,
+            max_attempts=config.JOBS_MAX_ATTEMPTS,
+            retry_base=config.JOBS_RETRY_BASE_SECONDS,
+            result_ttl=config.JOBS_RESULT_TTL_SECONDS,
+            maxlen=config.JOBS_STREAM_MAXLEN,
+        )
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    def _update(self, pipe, job_id: str, **fields) -> None:
+        pipe.hset(self._key(job_id), mapping={**fields, "updated_at": _now()})
+        pipe.expire(self._key(job_id), self.result_ttl)
+
+    async def enqueue(
+        self, name: str, payload: dict | None = None, user_id: int | None = None
+    ) -> str:
+        """
+        Add a job to the queue.
+
+        :param name: The registered job name.
+        :param payload: JSON-serializable arguments for the handler.
+        :param user_id: The user allowed to look up the job status.
+        :return: The job ID.
+        """
+        job_id = uuid.uuid4().hex
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._update(
+                pipe,
+                job_id,
+                name=name,
+                status=QUEUED,
+                attempts=0,
+                user_id="" if user_id is None else user_id,
+                created_at=_now(),
+            )
+            pipe.xadd(
+                self.stream,
+                {"id": job_id, "name": name, "payload": json.dumps(payload or {})},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+            await pipe.execute()
+        return job_id
+
+    async def enqueue_once(
+        self, name: str, key: str, payload: dict | None = None, ttl: int = 172800
+    ) -> str | None:
+        """
+        Add a job unless one with the same name and key was already added in
+        the last ``ttl`` seconds, by any process.
+
+        :return: The job ID, or None if the job was already added.
+        """
+        if not await self.redis.set(
+            f"{self.stream}:once:{name}:{key}", 1, nx=True, ex=ttl
+        ):
+            return None
+        return await self.enqueue(name, payload)
+
+    async def status(self, job_id: str) -> dict | None:
+        """
+        Get the status of a job.
+
+        :param job_id: The job ID.
+        :return: The job status, or None if it is unknown or has expired.
+        """
+        job = await self.redis.hgetall(self._key(job_id))
+        if not job:
+            return None
+        job["id"] = job_id
+        job["attempts"] = int(job["attempts"])
+        job["user_id"] = int(job["user_id"]) if job["user_id"] else None
+        job["result"] = json.loads(job["result"]) if "result" in job else None
+        job["error"] = job.get("error") or None
+        return job
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(
+                self.stream, self.group, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, count: int, block_ms: int) -> list:
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block_ms
+        )
+        return response[0][1] if response else []
+
+    async def claim_stale(self, consumer: str, min_idle: float) -> list:
+        """
+        Take over jobs that another worker read but never acknowledged, e.g.
+        because it crashed while running them.
+        """
+        response = await self.redis.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=int(min_idle * 1000),
+            start_id="0-0",
+            count=100,
+        )
+        return [(message_id, fields) for message_id, fields in response[1] if fields]
+
+    async def promote_due(self, limit: int = 100) -> int:
+        """
+        Move delayed retries whose time has come back onto the stream.
+
+        :return: The number of jobs moved.
+        """
+        return await self._promote(
+            keys=[self.delayed, self.stream],
+            args=[time.time(), limit, self.maxlen],
+        )
+
+    async def start(self, job_id: str) -> int:
+        """
+        Mark a job as running.
+
+        :return: The attempt number, starting at 1.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(self._key(job_id), "attempts", 1)
+            self._update(pipe, job_id, status=RUNNING)
+            attempts, *_ = await pipe.execute()
+        return attempts
+
+    async def complete(self, message_id: str, job_id: str, result: Any) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            self._update(
+                pipe, job_id, status=SUCCEEDED, result=json.dumps(result), error=""
+            )
+            pipe.xack(self.stream, self.group, message_id)
+            await pipe.execute()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.retry_base * 2 ** (attempts - 1), 3600)
+        return delay * random.uniform(0.9, 1.1)
+
+    async def fail(
+        self, message_id: str, fields: dict, attempts: int, error: str
+    ) -> bool:
+        """
+        Schedule a failed job for another attempt, or dead-letter it once it
+        has used up ``max_attempts``.
+
+        :return: True if the job will be retried.
+        """
+        retry = attempts < self.max_attempts and fields["name"] in tasks
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if retry:
+                pipe.zadd(
+                    self.delayed,
+                    {json.dumps(fields): time.time() + self.backoff(attempts)},
+                )
+                self._update(pipe, fields["id"], status=RETRYING, error=error)
+            else:
+                pipe.xadd(
+                    self.dead,
+                    {**fields, "error": error, "attempts": attempts},
+                    maxlen=self.maxlen,
+                    approximate=True,
+                )
+                self._update(pipe, fields["id"], status=DEAD, error=error)
+            pipe.xack(self.stream, self.group, message_id)
+            await pipe.execute()
+        return retry
+
+
+class Worker:
+    """
+    Run jobs from a :class:`JobQueue` with at most ``concurrency`` jobs in
+    flight. A job is acknowledged only after it succeeds, is scheduled for a
+    retry or is dead-lettered, so jobs of a crashed worker are picked up by
+    another one after ``claim_idle`` seconds. ``claim_idle`` must be longer
+    than ``timeout``, or slow jobs would run twice.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        concurrency: int = 10,
+        timeout: float = 300.0,
+        claim_idle: float = 600.0,
+        consumer: str | None = None,
+        block_ms: int = 1000,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.claim_idle = claim_idle
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.block_ms = block_ms
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    @classmethod
+    def from_settings(cls, queue: JobQueue, config=settings) -> "Worker":
+        return cls(
+            queue,
+            concurrency=config.JOBS_CONCURRENCY,
+            timeout=config.JOBS_TIMEOUT_SECONDS,
+            claim_idle=config.JOBS_CLAIM_IDLE_SECONDS,
+        )
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _spawn(self, message_id: str, fields: dict) -> None:
+        job = asyncio.create_task(self.process(message_id, fields))
+        self._running.add(job)
+        job.add_done_callback(self._running.discard)
+
+    async def process(self, message_id: str, fields: dict) -> None:
+        try:
+            await self._process(message_id, fields)
+        except (RedisError, OSError) as e:
+            # Not acknowledged, so it is claimed again after claim_idle
+            logger.warning("Job %s left for another attempt: %s", fields["id"], e)
+
+    async def _process(self, message_id: str, fields: dict) -> None:
+        name = fields["name"]
+        attempts = await self.queue.start(fields["id"])
+        handler = tasks.get(name)
+        try:
+            if handler is None:
+                raise LookupError(f"Unknown job {name!r}")
+            with JOB_DURATION.labels(name).time():
+                result = await asyncio.wait_for(
+                    handler(json.loads(fields["payload"])), self.timeout
+                )
+        except Exception as e:
+            logger.exception(
+                "Job %s (%s) failed, attempt %s", fields["id"], name, attempts
+            )
+            retry = await self.queue.fail(message_id, fields, attempts, repr(e))
+            JOBS_PROCESSED.labels(name, "retry" if retry else "dead").inc()
+        else:
+            await self.queue.complete(message_id, fields["id"], result)
+            JOBS_PROCESSED.labels(name, "succeeded").inc()
+
+    async def poll(self, claim: bool = False) -> int:
+        """
+        Start as many jobs as there are free slots.
+
+        :param claim: Also take over stale jobs of other workers.
+        :return: The number of jobs started.
+        """
+        await self.queue.promote_due()
+        messages = []
+        if claim:
+            messages += await self.queue.claim_stale(self.consumer, self.claim_idle)
+        free = self.concurrency - len(self._running) - len(messages)
+        if free > 0:
+            messages += await self.queue.read(self.consumer, free, self.block_ms)
+        for message_id, fields in messages:
+            self._spawn(message_id, fields)
+        return len(messages)
+
+    async def run(self) -> None:
+        await self.queue.ensure_group()
+        last_claim = 0.0
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            claim = time.monotonic() - last_claim >= self.claim_idle / 2
+            try:
+                await self.poll(claim)
+            except (RedisError, OSError) as e:
+                logger.warning("Job queue unavailable: %s", e)
+                await asyncio.sleep(1)
+                continue
+            if claim:
+                last_claim = time.monotonic()
+        if self._running:
+            await asyncio.wait(self._running)
+
+
+async def run_daily(queue: JobQueue, name: str, hour: int, poll: float = 60.0):
+    """
+    Enqueue a job once a day, at or after ``hour`` local time. Every worker
+    may run this; :meth:`JobQueue.enqueue_once` keeps it to one job a day.
+    """
+    while True:
+        now = datetime.now()
+        if now.hour >= hour:
+            day = now.date().isoformat()
+            try:
+                if await queue.enqueue_once(name, day, {"day": day}):
+                    logger.info("Scheduled %s for %s", name, day)
+            except (RedisError, OSError) as e:
+                logger.warning("Could not schedule %s: %s", name, e)
+        await asyncio.sleep(poll)
+
+
+job_queue = JobQueue.from_settings()
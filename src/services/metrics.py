@@ -0,0 +1,338 @@
+import glob
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from itertools import accumulate
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# When PROMETHEUS_MULTIPROC_DIR is set, prometheus_client keeps every value in
+# a per-process mmap file and /metrics aggregates all the files, so each
+# worker of a multi-worker deployment is included in every scrape.
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command latency.",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+HASH_QUEUE_DEPTH = Gauge(
+    "bcrypt_pool_queue_depth",
+    "Password hashing jobs waiting for a bcrypt pool thread.",
+    multiprocess_mode="livesum",
+)
+HASH_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying a password.",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1, 2),
+)
+EMAILS_SENT = Counter(
+    "emails_sent_total",
+    "Emails delivered from the outbox, by kind.",
+    ["kind"],
+)
+EMAILS_FAILED = Counter(
+    "emails_failed_total",
+    "Failed email delivery attempts, by kind and whether they will be retried.",
+    ["kind", "retry"],
+)
+EMAIL_SEND_DURATION = Histogram(
+    "email_send_duration_seconds",
+    "Time to hand one message to the SMTP server.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+JOBS_PROCESSED = Counter(
+    "jobs_processed_total",
+    "Background jobs run by a worker, by job name and outcome.",
+    ["name", "outcome"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Time spent running one background job.",
+    ["name"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+EVENT_SUBSCRIPTIONS = Gauge(
+    "contact_event_subscriptions",
+    "Open contact event streams.",
+    multiprocess_mode="livesum",
+)
+CONTACT_EVENTS = Counter(
+    "contact_events_total",
+    "Contact change events, by outcome (published, failed, delivered, dropped).",
+    ["outcome"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+
+
+class RequestDurationCollector:
+    """
+    Exposes ``http_request_duration_seconds`` from the bucket counts that
+    MetricsMiddleware aggregates itself, so no locked ``Histogram.observe``
+    call is made per request.
+
+    With PROMETHEUS_MULTIPROC_DIR set, every process writes its totals to a
+    JSON file in that directory on flush, and a scrape adds up all the files.
+    Files of exited workers are kept, as prometheus_client keeps theirs.
+    """
+
+    name = "http_request_duration_seconds"
+    documentation = "HTTP request duration by route template and status."
+    labels = ["method", "route", "status"]
+
+    def __init__(self, buckets):
+        self.bounds = tuple(float(bound) for bound in buckets) + (math.inf,)
+        # (method, route, status) -> [bucket counts, sum of durations]
+        self.totals = {}
+
+    def add(self, pending: dict) -> None:
+        """
+        Add aggregated observations to the totals.
+
+        :param pending: Bucket counts and duration sums by label values.
+        """
+        for key, (counts, total) in pending.items():
+            totals = self.totals.get(key)
+            if totals is None:
+                totals = self.totals[key] = [[0] * len(self.bounds), 0.0]
+            totals[0] = [a + b for a, b in zip(totals[0], counts)]
+            totals[1] += total
+
+    def write(self, directory: str) -> None:
+        path = os.path.join(directory, f"http_requests_{os.getpid()}.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump([[*key, *totals] for key, totals in self.totals.items()], f)
+        os.replace(f"{path}.tmp", path)
+
+    def read(self, directory: str) -> dict:
+        totals = RequestDurationCollector(self.bounds[:-1])
+        for path in glob.glob(os.path.join(directory, "http_requests_*.json")):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            totals.add(
+                {
+                    (method, route, status): (counts, total)
+                    for method, route, status, counts, total in rows
+                }
+            )
+        return totals.totals
+
+    def describe(self):
+        yield HistogramMetricFamily(self.name, self.documentation, labels=self.labels)
+
+    def collect(self):
+        directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+        totals = self.read(directory) if directory else self.totals
+        family = HistogramMetricFamily(
+            self.name, self.documentation, labels=self.labels
+        )
+        for (method, route, status), (counts, total) in sorted(totals.items()):
+            family.add_metric(
+                [method, route, str(status)],
+                [
+                    (floatToGoString(bound), count)
+                    for bound, count in zip(self.bounds, accumulate(counts))
+                ],
+                total,
+            )
+        yield family
+
+
+class LocalCounter:
+    """
+    A counter child incremented without taking its lock, for hot paths on
+    the event loop. Increments are added to the child on flush.
+    """
+
+    instances: list["LocalCounter"] = []
+
+    def __init__(self, child):
+        self.child = child
+        self.value = 0
+        LocalCounter.instances.append(self)
+
+    def inc(self) -> None:
+        self.value += 1
+
+    def flush(self) -> None:
+        value, self.value = self.value, 0
+        if value:
+            self.child.inc(value)
+
+
+REQUEST_DURATION = RequestDurationCollector(
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REGISTRY.register(REQUEST_DURATION)
+
+
+def cache_hit(cache: str) -> None:
+    CACHE_REQUESTS.labels(cache, "hit").inc()
+
+
+def cache_miss(cache: str) -> None:
+    CACHE_REQUESTS.labels(cache, "miss").inc()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Track connection pool usage of an engine.
+
+    :param engine: The engine to instrument.
+    """
+    pool = engine.sync_engine.pool
+    event.listen(pool, "checkout", lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(pool, "checkin", lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+
+def flush() -> None:
+    """
+    Move the observations aggregated in this process into the metrics.
+    """
+    for middleware in MetricsMiddleware.instances:
+        middleware.flush()
+    for counter in LocalCounter.instances:
+        counter.flush()
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        REQUEST_DURATION.write(directory)
+
+
+def mark_process_dead(pid: int | None = None) -> None:
+    """
+    Remove the live gauge files of an exited worker, so ``livesum`` gauges
+    such as in-flight requests stop counting it. Called by each worker as it
+    shuts down, with its own pid, and at startup for the files of workers
+    that died without shutting down.
+
+    :param pid: The worker's pid; by default, every pid no longer running.
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return
+    if pid is not None:
+        multiprocess.mark_process_dead(pid, directory)
+        return
+    pids = {
+        int(path.rsplit("_", 1)[1].removesuffix(".db"))
+        for path in glob.glob(os.path.join(directory, "gauge_live*_*.db"))
+    }
+    for dead in pids:
+        try:
+            os.kill(dead, 0)
+        except ProcessLookupError:
+            multiprocess.mark_process_dead(dead, directory)
+        except PermissionError:
+            pass
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    :return: The payload and its content type.
+    """
+    flush()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(REQUEST_DURATION)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request duration and in-flight requests.
+
+    The in-flight gauge is updated around every request, so scrapes see the
+    current concurrency. Durations are aggregated in plain per-process counters (the event loop
+    is single-threaded, so no locks are needed) and flushed into
+    RequestDurationCollector at most once per ``flush_interval`` seconds and
+    on every scrape. This keeps the per-request cost well below a microsecond,
+    compared to several microseconds for locked ``Histogram.observe`` calls.
+    """
+
+    instances: list["MetricsMiddleware"] = []
+
+    def __init__(self, app, flush_interval: float = 1.0):
+        self.app = app
+        self.flush_interval = flush_interval
+        self._bounds = REQUEST_DURATION.bounds
+        self._pending = {}
+        self._last_flush = time.perf_counter()
+        MetricsMiddleware.instances.append(self)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            REQUESTS_IN_FLIGHT.dec()
+            self.record(scope, status, end - start)
+            if end - self._last_flush >= self.flush_interval:
+                flush()
+
+    def record(self, scope, status: int, elapsed: float) -> None:
+        route = scope.get("route")
+        key = (scope["method"], route.path if route else "unmatched", status)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = [[0] * len(self._bounds), 0.0]
+        pending[0][bisect_left(self._bounds, elapsed)] += 1
+        pending[1] += elapsed
+
+    def flush(self) -> None:
+        """
+        Move the aggregated observations into the request duration totals.
+        """
+        self._last_flush = time.perf_counter()
+        pending, self._pending = self._pending, {}
+        REQUEST_DURATION.add(pending)
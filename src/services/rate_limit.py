@@ -0,0 +1,259 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import redis.asyncio as redis
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from starlette.routing import compile_path
+
+from src.conf.config import settings
+from src.services.metrics import (
+    CACHE_REQUESTS,
+    REDIS_LATENCY,
+    LocalCounter,
+    cache_miss,
+)
+from src.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Served from a lease on most requests, so counted without a lock
+LEASE_HITS = LocalCounter(CACHE_REQUESTS.labels("rate_limit_lease", "hit"))
+
+_PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# GCRA (generic cell rate algorithm) that can grant several tokens at once.
+# The bucket state is a single "theoretical arrival time" per key, so the
+# memory used in Redis is bounded by the number of active clients and every
+# key expires as soon as its bucket is full again.
+#
+# KEYS[1] - bucket key
+# ARGV[1] - emission interval in ms (period / amount)
+# ARGV[2] - burst window in ms (period)
+# ARGV[3] - number of tokens requested
+# Returns {granted, retry_after_ms}.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+  tat = now
+end
+local available = math.floor((now + window - tat) / interval)
+local granted = math.min(requested, available)
+if granted <= 0 then
+  return {0, math.ceil(tat + interval - window - now)}
+end
+tat = tat + granted * interval
+redis.call('SET', KEYS[1], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+return {granted, 0}
+"""
+
+
+class Rate(NamedTuple):
+    amount: int
+    period: int
+
+    @property
+    def interval_ms(self) -> float:
+        return self.period * 1000 / self.amount
+
+    @property
+    def window_ms(self) -> int:
+        return self.period * 1000
+
+
+def parse_rate(value: str) -> Rate:
+    """
+    Parse a rate limit string such as ``"10/minute"`` or ``"5/second"``.
+
+    :param value: The rate limit string.
+    :return: The parsed rate.
+    :raises ValueError: If the string is not a valid rate.
+    """
+    amount, _, period = value.strip().partition("/")
+    period = period.strip().lower().rstrip("s")
+    if period not in _PERIODS or not amount.strip().isdigit() or int(amount) <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return Rate(int(amount), _PERIODS[period])
+
+
+class RateLimiter:
+    """
+    Redis-backed rate limiter shared by every worker process.
+
+    Tokens are taken from Redis in small leases and spent locally, so most
+    requests do not need a Redis round trip. A lease is never held longer than
+    ``lease_ttl`` seconds and is at most a tenth of the limit, so limits below
+    20 requests per period are enforced exactly. When Redis is unavailable the
+    limiter fails open.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        default: str,
+        routes: dict[str, str] | None = None,
+        users: dict[str, str] | None = None,
+        lease_size: int = 20,
+        lease_ttl: float = 1.0,
+        prefix: str = "rl",
+        max_leases: int = 10000,
+    ):
+        self.redis = redis_client
+        self.default = parse_rate(default)
+        self.routes = [
+            (compile_path(path)[0], path, parse_rate(rate))
+            for path, rate in (routes or {}).items()
+        ]
+        self.users = {
+            username: parse_rate(rate) for username, rate in (users or {}).items()
+        }
+        self.lease_size = lease_size
+        self.lease_ttl = lease_ttl
+        self.prefix = prefix
+        self.max_leases = max_leases
+        self._leases: OrderedDict[str, list] = OrderedDict()
+        self._script = redis_client.register_script(GCRA_SCRIPT)
+        self._redis_down_until = 0.0
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "RateLimiter":
+        return cls(
+            redis.from_url(config.RATE_LIMIT_REDIS_URL or config.REDIS_URL),
+            default=config.RATE_LIMIT_DEFAULT,
+            routes=config.RATE_LIMIT_ROUTES,
+            users=config.RATE_LIMIT_USERS,
+            lease_size=config.RATE_LIMIT_LEASE_SIZE,
+            lease_ttl=config.RATE_LIMIT_LEASE_TTL_SECONDS,
+        )
+
+    def lease_size_for(self, rate: Rate) -> int:
+        return max(1, min(self.lease_size, rate.amount // 10))
+
+    async def hit(self, key: str, rate: Rate) -> float:
+        """
+        Consume one token from the bucket identified by ``key``.
+
+        :param key: The bucket key.
+        :param rate: The rate limit of the bucket.
+        :return: 0 if the request is allowed, otherwise seconds until retry.
+        """
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        if lease is not None and lease[0] > 0 and lease[1] > now:
+            lease[0] -= 1
+            LEASE_HITS.inc()
+            return 0.0
+        cache_miss("rate_limit_lease")
+        if now < self._redis_down_until:
+            return 0.0
+
+        try:
+            with span("redis.rate_limit"), REDIS_LATENCY.labels("rate_limit").time():
+                granted, retry_after_ms = await self._script(
+                    keys=[key],
+                    args=[rate.interval_ms, rate.window_ms, self.lease_size_for(rate)],
+                )
+        except Exception as e:
+            logger.warning("Rate limiter storage unavailable: %s", e)
+            self._redis_down_until = now + 1.0
+            return 0.0
+
+        if int(granted) <= 0:
+            return max(int(retry_after_ms), 1) / 1000
+        if int(granted) > 1:
+            self._store_lease(key, int(granted) - 1, now + self.lease_ttl)
+        return 0.0
+
+    def _store_lease(self, key: str, tokens: int, expires_at: float) -> None:
+        self._leases[key] = [tokens, expires_at]
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_leases:
+            self._leases.popitem(last=False)
+
+    def identify(self, scope) -> tuple[str, str | None]:
+        """
+        Identify the client of a request: the JWT subject if a valid bearer
+        token is present, otherwise the remote address.
+
+        :return: The identity and the username, if authenticated.
+        """
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        payload = jwt.decode(
+                            token,
+                            settings.JWT_SECRET,
+                            algorithms=[settings.JWT_ALGORITHM],
+                        )
+                        username = payload["sub"]
+                        return f"user:{username}", username
+                    except (JWTError, KeyError):
+                        pass
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}", None
+
+    async def check(self, scope) -> float:
+        """
+        Apply the route limit and the per-client limit to a request.
+
+        :return: 0 if the request is allowed, otherwise seconds until retry.
+        """
+        identity, username = self.identify(scope)
+        path = scope["path"]
+        for regex, template, rate in self.routes:
+            if regex.match(path):
+                retry_after = await self.hit(
+                    f"{self.prefix}:{identity}:{template}", rate
+                )
+                if retry_after:
+                    return retry_after
+                break
+        rate = self.users.get(username, self.default)
+        return await self.hit(f"{self.prefix}:{identity}:*", rate)
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying a :class:`RateLimiter` to every HTTP request
+    except those to the ``exempt`` paths, such as health probes.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, exempt=()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self.limiter.check(scope)
+        if retry_after:
+            response = JSONResponse(
+                status_code=429,
+                content={"error": "Перевищено ліміт запитів. Спробуйте пізніше."},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+limiter = RateLimiter.from_settings()
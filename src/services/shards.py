@@ -0,0 +1,370 @@
+"""
+Routing of users' contact data to shards, and the tooling to run them::
+
+    python -m src.services.shards migrate
+    python -m src.services.shards place main
+    python -m src.services.shards move 42 eu-2
+
+``migrate`` brings every shard's schema up to date and records a range of
+contact IDs for each new shard in the global database, which stays the
+shard's however ``SHARDS`` is later reordered. It then places every user not
+yet on a shard on the shard sharing the global database, where data from
+before sharding lives, or on ``--existing``. Until it has run, users are not
+placed on shards by themselves, so run it once the app is deployed with
+``SHARDS``. ``place`` records every user not yet on a shard on the given
+one. ``move`` copies a user's contacts to another shard while the user keeps
+using them.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import math
+import os
+import subprocess
+from datetime import timedelta
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.db import ShardMap, get_db, shard_map
+from src.database.models import Contact, User, UserShard
+from src.repositories.contacts import ContactRepository
+from src.repositories.duplicates import DuplicateRepository
+from src.repositories.shards import ShardRepository
+from src.services.auth import get_current_user
+from src.services.contact_cache import contact_cache
+from src.services.events import RESYNC, event_hub
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ShardMoveError(Exception):
+    pass
+
+
+class UnregisteredShardError(Exception):
+    pass
+
+
+class UserMovingError(Exception):
+    pass
+
+
+async def resolve_shard(
+    db: AsyncSession, user_id: int, shards: ShardMap | None = None
+) -> UserShard:
+    """
+    The directory entry of a user, placing the user on a shard first if
+    needed.
+
+    :raises UnregisteredShardError: If the user would be placed on a shard
+        ``migrate`` has not registered. Until it has, users from before
+        sharding may still be unplaced, with their data on the global database.
+    """
+    shards = shards or shard_map
+    repository = ShardRepository(db)
+    placement = await repository.get_placement(user_id)
+    if placement is None:
+        shard = shards.place(user_id)
+        if shard not in await repository.get_id_ranges():
+            raise UnregisteredShardError(f"Shard {shard!r} is not migrated")
+        async with shards.session(shard) as session:
+            await ShardRepository(session).add_user(user_id)
+            await session.commit()
+        placement = await repository.assign(user_id, shard)
+        await db.commit()
+    return placement
+
+
+async def get_contact_db(
+    request: Request,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    A session on the database holding the current user's contacts. Writes
+    are refused while the user is being moved to another shard.
+    """
+    if not shard_map.sharded:
+        yield db
+        return
+    try:
+        placement = await resolve_shard(db, user.id)
+    except UnregisteredShardError:
+        logger.exception("Cannot place user %s on a shard", user.id)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сховище контактів ще не налаштоване, спробуйте пізніше",
+        )
+    if placement.moving_to is not None and request.method not in SAFE_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Контакти переносяться, спробуйте пізніше",
+            headers={"Retry-After": str(math.ceil(settings.SHARD_MOVE_GRACE_SECONDS))},
+        )
+    async with shard_map.session(placement.shard) as session:
+        yield session
+
+
+@contextlib.asynccontextmanager
+async def contact_session(user_id: int):
+    """
+    A session on the database holding a user's contacts, for background jobs.
+
+    :raises UserMovingError: If the user is being moved to another shard,
+        where changes made on the old one would be lost. The job queue
+        retries the job after a delay.
+    """
+    if not shard_map.sharded:
+        async with shard_map.global_manager.session() as db:
+            yield db
+        return
+    async with shard_map.global_manager.session() as db:
+        placement = await resolve_shard(db, user_id)
+    if placement.moving_to is not None:
+        raise UserMovingError(
+            f"User {user_id} is being moved to shard {placement.moving_to!r}"
+        )
+    async with shard_map.session(placement.shard) as session:
+        yield session
+
+
+def contact_row(contact: Contact) -> dict:
+    return {
+        column.key: getattr(contact, column.key) for column in Contact.__table__.columns
+    }
+
+
+async def copy_changes(
+    source: AsyncSession,
+    target: AsyncSession,
+    user: User,
+    cursors: dict,
+    batch_size: int,
+) -> int:
+    """
+    Copy a user's contacts changed, and tombstones recorded, after
+    ``cursors`` from one shard to another, as delta sync would. The cursors
+    are advanced in place.
+
+    :return: The number of contacts and tombstones copied.
+    """
+    contacts, shard = ContactRepository(source), ShardRepository(target)
+    copied = 0
+    while changed := await contacts.get_changes(user, cursors["changed"], batch_size):
+        rows = [contact_row(contact) for contact in changed]
+        written = await shard.put_contacts(rows)
+        if len(written) != len(rows):
+            taken = sorted({row["id"] for row in rows} - set(written))
+            raise ShardMoveError(f"Contact IDs taken on the target shard: {taken}")
+        await target.commit()
+        cursors["changed"] = (changed[-1].updated_at, changed[-1].id)
+        copied += len(rows)
+        source.expunge_all()
+    while deleted := await contacts.get_tombstones(
+        user, cursors["deleted"], batch_size
+    ):
+        await shard.put_tombstones(
+            user.id,
+            [
+                {"contact_id": tombstone.contact_id, "deleted_at": tombstone.deleted_at}
+                for tombstone in deleted
+            ],
+        )
+        await target.commit()
+        cursors["deleted"] = (deleted[-1].deleted_at, deleted[-1].id)
+        copied += len(deleted)
+        source.expunge_all()
+    return copied
+
+
+async def move_user(
+    user_id: int,
+    target: str,
+    shards: ShardMap | None = None,
+    batch_size: int | None = None,
+    grace_seconds: float | None = None,
+) -> dict:
+    """
+    Move a user's contact data to another shard while the user keeps using
+    it. Contacts are copied and caught up while writes go on; then writes
+    are refused for ``grace_seconds``, the last changes are copied, and the
+    directory points at the target. The source copy is deleted last.
+    """
+    shards = shards or shard_map
+    batch_size = batch_size or settings.SHARD_MOVE_BATCH_SIZE
+    if grace_seconds is None:
+        grace_seconds = settings.SHARD_MOVE_GRACE_SECONDS
+    if target not in shards.shards:
+        raise ShardMoveError(f"Unknown shard {target!r}")
+
+    user = User(id=user_id)
+    async with shards.global_manager.session() as db:
+        directory = ShardRepository(db)
+        source = (await resolve_shard(db, user_id, shards)).shard
+        if source == target:
+            return {"user_id": user_id, "from": source, "to": target, "copied": 0}
+
+        async with shards.session(source) as src, shards.session(target) as dst:
+            await ShardRepository(dst).add_user(user_id)
+            await dst.commit()
+            cursors = {"changed": None, "deleted": None}
+            copied = await copy_changes(src, dst, user, cursors, batch_size)
+            copied += await copy_changes(src, dst, user, cursors, batch_size)
+
+            if not await directory.set_moving(user_id, target):
+                raise ShardMoveError(f"User {user_id} is already being moved")
+            await db.commit()
+            try:
+                # Requests that passed the write check before it was set
+                await asyncio.sleep(grace_seconds)
+                # Writes committed late can carry an earlier timestamp
+                window = timedelta(seconds=settings.SYNC_WINDOW_SECONDS)
+                cursors = {
+                    name: None if cursor is None else (cursor[0] - window, 0)
+                    for name, cursor in cursors.items()
+                }
+                copied += await copy_changes(src, dst, user, cursors, batch_size)
+                report = await DuplicateRepository(src).get_report(user_id)
+                if report is not None:
+                    await ShardRepository(dst).put_report(report)
+                    await dst.commit()
+                await directory.finish_move(user_id, target)
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                await directory.set_moving(user_id, None)
+                await db.commit()
+                raise
+
+            await ShardRepository(src).remove_user_data(
+                user_id, drop_user=not shards.is_global(source)
+            )
+            await src.commit()
+
+    # Tombstones get new IDs on the target, so clients sync afresh
+    await event_hub.publish(user_id, RESYNC)
+    await contact_cache.bump(user_id)
+    logger.info("Moved user %s from %s to %s", user_id, source, target)
+    return {"user_id": user_id, "from": source, "to": target, "copied": copied}
+
+
+async def place_unplaced(shard: str) -> int:
+    if shard not in shard_map.shards:
+        raise ShardMoveError(f"Unknown shard {shard!r}")
+    async with shard_map.global_manager.session() as db:
+        placed = await ShardRepository(db).assign_unplaced(shard)
+        await db.commit()
+    return placed
+
+
+async def register_shards(existing: str | None = None) -> dict[str, int]:
+    """
+    Record a range of contact IDs for every shard without one and start
+    each shard's IDs in its range. A shard whose sequence has
+    numbered contacts already keeps the range they are in. Then place every
+    unplaced user on ``existing``, by default the shard sharing the global
+    database.
+
+    :return: The first contact ID of every shard, by name.
+    """
+    span = settings.SHARD_ID_SPAN
+    if existing is None:
+        existing = next(
+            (name for name in shard_map.names if shard_map.is_global(name)), None
+        )
+    elif existing not in shard_map.shards:
+        raise ShardMoveError(f"Unknown shard {existing!r}")
+    async with shard_map.global_manager.session() as db:
+        repository = ShardRepository(db)
+        ranges = await repository.get_id_ranges()
+        last_ids = {}
+        for name in shard_map.names:
+            if name not in ranges:
+                async with shard_map.session(name) as session:
+                    shard = ShardRepository(session)
+                    last_ids[name] = await shard.get_last_sequence_id()
+        # Shards whose IDs are in use first, then the shard with the data from
+        # before sharding, which gets the first free range
+        for name in sorted(
+            last_ids, key=lambda name: (not last_ids[name], name != existing)
+        ):
+            taken = {start // span for start in ranges.values()}
+            if last_ids[name]:
+                index = last_ids[name] // span
+                if index in taken:
+                    raise ShardMoveError(
+                        f"Contact IDs of shard {name!r} are in another shard's range"
+                    )
+            else:
+                index = next(i for i in range(len(taken) + 1) if i not in taken)
+            ranges[name] = max(index * span, 1)
+            await repository.add_id_range(name, ranges[name])
+
+        unplaced = await repository.count_unplaced()
+        if unplaced and existing is None:
+            raise ShardMoveError(
+                f"{unplaced} users are on no shard; pass the shard holding"
+                " their data as --existing"
+            )
+        if unplaced:
+            await repository.assign_unplaced(existing)
+        await db.commit()
+
+    for name in shard_map.names:
+        async with shard_map.session(name) as session:
+            await ShardRepository(session).reserve_ids(ranges[name])
+            await session.commit()
+    return ranges
+
+
+def migrate(existing: str | None = None) -> None:
+    for name, url in settings.SHARDS.items():
+        print(f"Migrating shard {name}")
+        subprocess.run(
+            ["alembic", "upgrade", "head"],
+            env={**os.environ, "DB_URL": url},
+            check=True,
+        )
+    for name, start in asyncio.run(register_shards(existing)).items():
+        print(f"Contact IDs of shard {name} start at {start}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = commands.add_parser("migrate", help="migrate every shard")
+    migrate_parser.add_argument(
+        "--existing", help="the shard holding the data of unplaced users"
+    )
+    place = commands.add_parser("place", help="place unplaced users on a shard")
+    place.add_argument("shard")
+    move = commands.add_parser("move", help="move a user to another shard")
+    move.add_argument("user_id", type=int)
+    move.add_argument("shard")
+    args = parser.parse_args()
+
+    if not shard_map.sharded:
+        parser.error("no shards configured; set SHARDS")
+    if args.command == "migrate":
+        migrate(args.existing)
+    elif args.command == "place":
+        placed = asyncio.run(place_unplaced(args.shard))
+        print(f"Placed {placed} users on {args.shard}")
+    else:
+        result = asyncio.run(move_user(args.user_id, args.shard))
+        print(
+            f"Moved user {result['user_id']} from {result['from']} to"
+            f" {result['to']} ({result['copied']} rows copied)"
+        )
+
+
+if __name__ == "__main__":
+    main()
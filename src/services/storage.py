@@ -0,0 +1,143 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import boto3
+import cloudinary
+import cloudinary.uploader
+
+from src.conf.config import settings
+from src.services.tracing import span
+
+
+class Storage:
+    """
+    Where processed files are kept. Keys are relative paths such as
+    ``avatars/<hash>/md.webp``; ``url`` is known before the file is saved.
+    """
+
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    async def save(self, key: str, data: bytes, content_type: str) -> None:
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """
+    Files in a local directory, served by the app under ``base_url``.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "LocalStorage":
+        return cls(config.AVATAR_LOCAL_DIR, config.AVATAR_LOCAL_URL)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file and renamed, so readers never see a
+        # partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    async def save(self, key: str, data: bytes, content_type: str) -> None:
+        with span("storage.local.save"):
+            await asyncio.to_thread(self._write, key, data)
+
+
+class S3Storage(Storage):
+    """
+    An S3 bucket, or any S3-compatible service such as MinIO.
+    """
+
+    def __init__(self, bucket: str, public_url: str, client=None):
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/")
+        self.client = client
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "S3Storage":
+        client = boto3.client(
+            "s3",
+            endpoint_url=config.S3_ENDPOINT_URL,
+            region_name=config.S3_REGION,
+        )
+        public_url = config.S3_PUBLIC_URL or (
+            f"{config.S3_ENDPOINT_URL or 'https://s3.amazonaws.com'}/{config.S3_BUCKET}"
+        )
+        return cls(config.S3_BUCKET, public_url, client)
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    async def save(self, key: str, data: bytes, content_type: str) -> None:
+        with span("storage.s3.save"):
+            await asyncio.to_thread(
+                self.client.put_object,
+                Bucket=self.bucket,
+                Key=key,
+                Body=data,
+                ContentType=content_type,
+                CacheControl="public, max-age=31536000, immutable",
+            )
+
+
+class CloudinaryStorage(Storage):
+    def __init__(self, cloud_name, api_key, api_secret):
+        cloudinary.config(
+            cloud_name=cloud_name,
+            api_key=api_key,
+            api_secret=api_secret,
+            secure=True,
+        )
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "CloudinaryStorage":
+        return cls(
+            config.CLOUDINARY_NAME,
+            config.CLOUDINARY_API_KEY,
+            config.CLOUDINARY_API_SECRET,
+        )
+
+    @staticmethod
+    def _public_id(key: str) -> str:
+        return f"RestApp/{os.path.splitext(key)[0]}"
+
+    def url(self, key: str) -> str:
+        return cloudinary.CloudinaryImage(self._public_id(key)).build_url(
+            format=os.path.splitext(key)[1].lstrip(".")
+        )
+
+    async def save(self, key: str, data: bytes, content_type: str) -> None:
+        # Variants are already resized, so Cloudinary only stores them
+        with span("cloudinary.upload"):
+            await asyncio.to_thread(
+                cloudinary.uploader.upload,
+                data,
+                public_id=self._public_id(key),
+                overwrite=True,
+            )
+
+
+storages = {
+    "local": LocalStorage,
+    "s3": S3Storage,
+    "cloudinary": CloudinaryStorage,
+}
+
+
+def get_storage(name: str, config=settings) -> Storage:
+    try:
+        return storages[name].from_settings(config)
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {name!r}") from None
@@ -0,0 +1,294 @@
+import contextlib
+import functools
+import inspect
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+from src.conf.config import settings
+from src.database.slow_query import query_caller
+
+
+class Trace:
+    """
+    Spans recorded while serving one sampled request.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": (time.perf_counter() - self.start) * 1000,
+            "spans": self.spans,
+        }
+
+    def server_timing(self) -> str:
+        """
+        Render the spans recorded so far as a ``Server-Timing`` header value.
+
+        Durations of spans with the same name are summed. Time not covered by
+        top-level spans (routing, validation, serialization) is reported as
+        ``other``.
+        """
+        total = (time.perf_counter() - self.start) * 1000
+        durations = {}
+        covered = 0.0
+        for span in self.spans:
+            durations[span["name"]] = (
+                durations.get(span["name"], 0.0) + span["duration_ms"]
+            )
+            if span["parent"] is None:
+                covered += span["duration_ms"]
+        metrics = [f"{name};dur={dur:.2f}" for name, dur in durations.items()]
+        metrics.append(f"other;dur={max(total - covered, 0.0):.2f}")
+        metrics.append(f"total;dur={total:.2f}")
+        return ", ".join(metrics)
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+
+
+def current_span_name() -> str | None:
+    """
+    Return the name of the innermost open span, if the request is sampled.
+    """
+    return _current_span.get()
+
+
+def current_operation() -> str | None:
+    """
+    Return the repository method currently running, sampled or not.
+    """
+    return query_caller.get()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Record a span around a block of code. Does nothing outside of a sampled
+    request.
+
+    :param name: The span name, e.g. ``redis.exists``.
+    :param attributes: Extra attributes stored with the span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        trace.spans.append(
+            {
+                "name": name,
+                "parent": parent,
+                "start_ms": (start - trace.start) * 1000,
+                "duration_ms": (end - start) * 1000,
+                **attributes,
+            }
+        )
+
+
+def traced(name: str):
+    """
+    Decorator recording a span around every call of a function.
+
+    :param name: The span name.
+    """
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _repository_method(name: str, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = query_caller.set(name)
+        try:
+            if _current_trace.get() is None:
+                return await func(*args, **kwargs)
+            with span(name):
+                return await func(*args, **kwargs)
+        finally:
+            query_caller.reset(token)
+
+    return wrapper
+
+
+def trace_repository(cls):
+    """
+    Class decorator recording a ``db.<Class>.<method>`` span around every
+    public coroutine method of a repository. The method name is also kept in
+    :func:`current_operation`, the slow query log's caller.
+    """
+    for attr, value in list(vars(cls).items()):
+        if not attr.startswith("_") and inspect.iscoroutinefunction(value):
+            name = f"db.{cls.__name__}.{attr}"
+            setattr(cls, attr, _repository_method(name, value))
+    return cls
+
+
+class Exporter:
+    """
+    Base class of trace exporters. Subclasses receive every finished trace.
+    """
+
+    def export(self, trace: dict) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Write out any traces still buffered. Called on shutdown.
+        """
+
+
+class StdoutExporter(Exporter):
+    def export(self, trace: dict) -> None:
+        sys.stdout.write(json.dumps(trace) + "\n")
+
+
+class FileExporter(Exporter):
+    """
+    Append traces to a file, one JSON document per line.
+
+    Traces are queued and written by a background thread, in batches of
+    those finished within ``flush_interval`` seconds, so request handling
+    never waits on the file.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def export(self, trace: dict) -> None:
+        self._queue.put(trace)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closing.is_set():
+                    self._thread = threading.Thread(
+                        target=self._run, name="trace-exporter", daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Let more traces finish, unless shutting down
+            self._closing.wait(self.flush_interval)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            traces = [trace for trace in batch if trace is not None]
+            if traces:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(trace) + "\n" for trace in traces)
+            if len(traces) < len(batch):
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            self._closing.set()
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+exporters = {
+    "stdout": lambda: StdoutExporter(),
+    "file": lambda: FileExporter(settings.TRACING_FILE),
+}
+
+
+def get_exporter(name: str) -> Exporter | None:
+    """
+    Build the exporter registered under ``name``.
+
+    :param name: The exporter name, or ``none`` to only emit Server-Timing.
+    :return: The exporter, or None.
+    """
+    if name == "none":
+        return None
+    if name not in exporters:
+        raise ValueError(f"Unknown trace exporter: {name!r}")
+    return exporters[name]()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware sampling requests for tracing. Sampled requests get a
+    ``Server-Timing`` header and are handed to the exporter when finished.
+    """
+
+    def __init__(self, app, sample_rate: float, exporter: Exporter | None = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = _current_trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            if self.exporter is not None:
+                route = scope.get("route")
+                if route is not None:
+                    trace.name = f"{scope['method']} {route.path}"
+                self.exporter.export(trace.to_dict())
@@ -1,24 +1,257 @@
-import cloudinary
-import cloudinary.uploader
-
-
-class UploadFileService:
-    def __init__(self, cloud_name, api_key, api_secret):
-        self.cloud_name = cloud_name
-        self.api_key = api_key
-        self.api_secret = api_secret
-        cloudinary.config(
-            cloud_name=self.cloud_name,
-            api_key=self.api_key,
-            api_secret=self.api_secret,
-            secure=True,
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from PIL import Image, ImageOps
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import settings
+from src.database.db import sessionmanager
+from src.services.jobs import task
+from src.services.storage import Storage, get_storage
+from src.services.tracing import span
+from src.services.users import UserService
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around an upload
+MULTIPART_OVERHEAD = 64 * 1024
+TOO_LARGE = "Файл завеликий"
+
+_executor: ProcessPoolExecutor | None = None
+# Keeps references to finalizations running in this process
+_background: set[asyncio.Task] = set()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    # Created on first use, so importing the module never starts processes
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.AVATAR_WORKERS)
+    return _executor
+
+
+async def read_upload(file: UploadFile, limit: int) -> bytes:
+    """
+    Read an uploaded file in chunks, refusing it as soon as it is larger than
+    ``limit`` bytes.
+    """
+    chunks, size = [], 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=TOO_LARGE,
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of upload routes. Starlette
+    receives and spools a whole multipart body before the endpoint runs, so
+    :func:`read_upload` alone cannot keep a large body from being received.
+    A request whose Content-Length is over the limit is refused unread; one
+    without it is refused as soon as the bytes received pass the limit.
+
+    :param limits: The body size limit in bytes by path.
+    """
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if not value.isdigit() or int(value) > limit:
+                    response = JSONResponse(
+                        {"detail": TOO_LARGE},
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    )
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing, and answered as such
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=TOO_LARGE,
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def check_image(data: bytes, max_pixels: int) -> None:
+    """
+    Make sure the data is an image of a supported format. Only the header is
+    parsed, so this is cheap enough to run on the event loop.
+    """
+    try:
+        with Image.open(BytesIO(data)) as image:
+            if image.format not in IMAGE_FORMATS:
+                raise ValueError(f"unsupported format {image.format}")
+            if image.width * image.height > max_pixels:
+                raise ValueError("image is too large")
+    # Pillow refuses images far over its own pixel limit when opening them
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл не є підтримуваним зображенням",
+        ) from e
+
+
+def resize_variants(data: bytes, sizes: dict[str, int]) -> dict[str, bytes]:
+    """
+    Crop an image to squares of the given sizes and encode them as WebP.
+    Runs in a worker process.
+    """
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        variants = {}
+        for name, size in sizes.items():
+            variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, "WEBP", quality=85)
+            variants[name] = buffer.getvalue()
+        return variants
+
+
+class AvatarService:
+    """
+    Avatar pipeline: uploads are staged on disk and finalized later, either
+    by a job worker or in the background, by resizing them to every size in
+    ``sizes`` and saving the variants to a :class:`Storage`. Keys are derived
+    from the image hash, so the final URL is known as soon as it is staged.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        sizes: dict[str, int],
+        default_size: str,
+        staging_dir: str,
+    ):
+        self.storage = storage
+        self.sizes = sizes
+        self.default_size = default_size
+        self.staging_dir = Path(staging_dir)
+
+    @classmethod
+    def from_settings(cls, config=settings) -> "AvatarService":
+        return cls(
+            get_storage(config.AVATAR_STORAGE, config),
+            config.AVATAR_SIZES,
+            config.AVATAR_DEFAULT_SIZE,
+            config.AVATAR_STAGING_DIR,
         )
 
     @staticmethod
-    def upload_file(file, username) -> str:
-        public_id = f"RestApp/{username}"
-        r = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-        src_url = cloudinary.CloudinaryImage(public_id).build_url(
-            width=250, height=250, crop="fill", version=r.get("version")
+    def key(digest: str, size: str) -> str:
+        return f"avatars/{digest}/{size}.webp"
+
+    def url(self, digest: str, size: str | None = None) -> str:
+        return self.storage.url(self.key(digest, size or self.default_size))
+
+    def _write_staged(self, name: str, data: bytes) -> None:
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        (self.staging_dir / name).write_bytes(data)
+
+    async def stage(self, data: bytes) -> dict:
+        """
+        Store an upload until it is finalized.
+
+        :param data: The image.
+        :return: The ``staged`` file name and the image ``digest``.
+        """
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        staged = uuid.uuid4().hex
+        await asyncio.to_thread(self._write_staged, staged, data)
+        return {"staged": staged, "digest": digest}
+
+    async def finalize(
+        self, db: AsyncSession, email: str, staged: str, digest: str
+    ) -> str:
+        """
+        Resize a staged upload, save the variants and set the user's avatar.
+
+        :param db: The database session.
+        :param email: The user's email.
+        :param staged: The staged file name.
+        :param digest: The image digest.
+        :return: The new avatar URL.
+        """
+        path = self.staging_dir / staged
+        data = await asyncio.to_thread(path.read_bytes)
+        with span("avatar.resize"):
+            variants = await asyncio.get_running_loop().run_in_executor(
+                get_executor(), resize_variants, data, self.sizes
+            )
+        await asyncio.gather(
+            *(
+                self.storage.save(self.key(digest, size), variant, "image/webp")
+                for size, variant in variants.items()
+            )
+        )
+        avatar_url = self.url(digest)
+        await UserService(db).update_avatar_url(email, avatar_url)
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+        return avatar_url
+
+
+avatar_service = AvatarService.from_settings()
+
+
+@task("avatar.process")
+async def process_avatar(payload: dict) -> dict:
+    """
+    Payload: the user's ``email`` and the ``staged`` and ``digest`` values
+    returned by :meth:`AvatarService.stage`.
+    """
+    async with sessionmanager.session() as db:
+        avatar_url = await avatar_service.finalize(
+            db, payload["email"], payload["staged"], payload["digest"]
         )
-        return src_url
+    return {"avatar": avatar_url}
+
+
+def process_avatar_in_background(payload: dict) -> None:
+    """
+    Finalize an avatar in this process, for when the job queue is unavailable.
+    """
+
+    async def run():
+        try:
+            await process_avatar(payload)
+        except Exception:
+            logger.exception("Avatar processing failed for %s", payload["email"])
+
+    job = asyncio.create_task(run())
+    _background.add(job)
+    job.add_done_callback(_background.discard)
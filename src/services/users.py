@@ -9,16 +9,29 @@ class UserService:
     def __init__(self, db: AsyncSession):
         self.repository = UserRepository(db)
 
-    async def create_user(self, body: UserCreate, avatar: str = None):
+    @staticmethod
+    def _gravatar(email: str) -> str | None:
         avatar = None
         try:
-            g = Gravatar(body.email)
+            g = Gravatar(email)
             avatar = g.get_image()
         except Exception as e:
             print(e)
+        return avatar
+
+    async def create_user(self, body: UserCreate, avatar: str = None):
+        avatar = self._gravatar(body.email)
 
         return await self.repository.create_user(body, avatar)
 
+    async def create_user_if_absent(self, body: UserCreate):
+        return await self.repository.create_user_if_absent(
+            body, self._gravatar(body.email)
+        )
+
+    async def get_conflicting_field(self, email: str, username: str):
+        return await self.repository.get_conflicting_field(email, username)
+
     async def get_user_by_id(self, user_id: int):
         return await self.repository.get_user_by_id(user_id)
 
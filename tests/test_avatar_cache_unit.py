@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from src.services.avatar_cache import AvatarCache, SourceDigests, source_url
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_produce_once(tmp_path):
+    cache = AvatarCache(str(tmp_path), max_bytes=1024)
+    calls = 0
+
+    async def produce():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"variant"
+
+    paths = await asyncio.gather(
+        *(cache.get_or_create("ab12", produce) for _ in range(10))
+    )
+
+    assert calls == 1
+    assert set(paths) == {tmp_path / "ab" / "ab12.webp"}
+    assert paths[0].read_bytes() == b"variant"
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_is_evicted(tmp_path):
+    cache = AvatarCache(str(tmp_path), max_bytes=20, min_age=0)
+
+    async def produce():
+        return b"x" * 8
+
+    first = await cache.get_or_create("aa01", produce)
+    second = await cache.get_or_create("bb02", produce)
+    await cache.get_or_create("aa01", produce)
+    third = await cache.get_or_create("cc03", produce)
+
+    assert first.exists() and third.exists()
+    assert not second.exists()
+    assert cache.size == 16
+
+
+@pytest.mark.asyncio
+async def test_existing_files_are_reused(tmp_path):
+    async def produce():
+        return b"variant"
+
+    await AvatarCache(str(tmp_path), 1024).get_or_create("ab12", produce)
+    cache = AvatarCache(str(tmp_path), 1024)
+
+    async def fail():
+        raise AssertionError("should not be produced again")
+
+    assert (await cache.get_or_create("ab12", fail)).exists()
+    # The directory is scanned on the first miss
+    await cache.get_or_create("cd34", produce)
+    assert cache.size == 2 * len(b"variant")
+
+
+@pytest.mark.asyncio
+async def test_cap_holds_across_processes(tmp_path):
+    # Two workers sharing the directory, each writing the whole cap
+    caches = [AvatarCache(str(tmp_path), max_bytes=40, min_age=0) for _ in range(2)]
+
+    async def produce():
+        return b"x" * 8
+
+    for i in range(10):
+        await caches[i % 2].get_or_create(f"{i:04x}", produce)
+
+    files = list(tmp_path.glob("*/*.webp"))
+    assert sum(f.stat().st_size for f in files) <= 40
+
+
+@pytest.mark.asyncio
+async def test_recently_used_files_are_kept(tmp_path):
+    cache = AvatarCache(str(tmp_path), max_bytes=10)
+
+    async def produce():
+        return b"x" * 8
+
+    first = await cache.get_or_create("aa01", produce)
+    second = await cache.get_or_create("bb02", produce)
+
+    # Either may be about to be served
+    assert first.exists() and second.exists()
+
+
+@pytest.mark.asyncio
+async def test_files_evicted_by_another_process_are_produced_again(tmp_path):
+    cache = AvatarCache(str(tmp_path), 1024)
+    other = AvatarCache(str(tmp_path), 1024)
+    calls = 0
+
+    async def produce():
+        nonlocal calls
+        calls += 1
+        return b"variant"
+
+    path = await cache.get_or_create("ab12", produce)
+    assert await other.get_or_create("ab12", produce) == path
+    path.unlink()
+
+    assert (await cache.get_or_create("ab12", produce)).exists()
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_source_digests_follow_content(monkeypatch):
+    images = iter([b"first", b"first", b"second"])
+
+    async def fetch(url):
+        return next(images)
+
+    monkeypatch.setattr("src.services.avatar_cache.fetch_source", fetch)
+    digests = SourceDigests(ttl=0)
+
+    first, data = await digests.resolve("https://gravatar.com/avatar/x")
+    assert data == b"first"
+    assert (await digests.resolve("https://gravatar.com/avatar/x"))[0] == first
+    assert (await digests.resolve("https://gravatar.com/avatar/x"))[0] != first
+    # Stored avatars are content-addressed already
+    assert await digests.resolve("/media/avatars/abc123/lg.webp") == ("abc123", None)
+
+
+def test_source_url_uses_largest_stored_variant():
+    sizes = {"sm": 64, "md": 250, "lg": 512}
+
+    assert source_url("/media/avatars/abc123/md.webp", sizes) == (
+        "/media/avatars/abc123/lg.webp"
+    )
+    assert source_url("https://gravatar.com/avatar/x", sizes) == (
+        "https://gravatar.com/avatar/x"
+    )
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.database.models import Base, Contact, User
+from src.repositories.birthdays import BirthdayRepository, is_upcoming, next_birthday
+from src.services.birthdays import refresh_digests
+from src.services.contacts import _calendar_days
+
+TODAY = date(2025, 2, 25)
+
+
+def test_next_birthday():
+    assert next_birthday(date(1990, 3, 1), TODAY) == date(2025, 3, 1)
+    assert next_birthday(date(1990, 2, 24), TODAY) == date(2026, 2, 24)
+    # 29 February falls on 28 February in common years
+    assert next_birthday(date(2000, 2, 29), TODAY) == date(2025, 2, 28)
+    assert next_birthday(date(2000, 2, 29), date(2027, 3, 1)) == date(2028, 2, 29)
+
+
+def test_is_upcoming():
+    assert is_upcoming(TODAY.replace(year=1990), TODAY)
+    assert is_upcoming(date(1990, 3, 4), TODAY)
+    assert not is_upcoming(date(1990, 3, 5), TODAY)
+    assert not is_upcoming(None, TODAY)
+    # The window crosses the end of the year
+    assert is_upcoming(date(1990, 1, 2), date(2025, 12, 28))
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(User),
+            [
+                {"id": i, "username": f"u{i}", "email": f"u{i}@example.com"}
+                for i in (1, 2, 3)
+            ],
+        )
+        await conn.execute(
+            insert(Contact),
+            [
+                {
+                    "first_name": name,
+                    "last_name": "Test",
+                    "email": f"{name}@example.com",
+                    "phone": "380501234567",
+                    "birthday": birthday,
+                    "user_id": user_id,
+                }
+                for name, birthday, user_id in (
+                    ("march", date(1990, 3, 2), 1),
+                    ("leap", date(2000, 2, 29), 1),
+                    ("later", date(1990, 6, 1), 1),
+                    ("other", date(1995, 2, 26), 2),
+                    ("another", date(1980, 3, 2), 1),
+                )
+            ],
+        )
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_refresh_digests(session_maker):
+    async with session_maker() as session:
+        assert await refresh_digests(session, TODAY, batch_size=2) == 3
+
+    async with session_maker() as session:
+        repository = BirthdayRepository(session)
+        digest = await repository.get_digest(1, TODAY)
+        assert [contact["first_name"] for contact in digest] == [
+            "leap",
+            "march",
+            "another",
+        ]
+        assert [c["first_name"] for c in await repository.get_digest(2, TODAY)] == [
+            "other"
+        ]
+        assert await repository.get_digest(3, TODAY) == []
+        # A digest from another day is stale
+        assert await repository.get_digest(1, TODAY + timedelta(days=1)) is None
+
+        await repository.invalidate(1)
+        assert await repository.get_digest(1, TODAY) is None
+
+
+@pytest.mark.asyncio
+async def test_digest_invalidated_while_computed_is_not_stored(session_maker):
+    async with session_maker() as session:
+        repository = BirthdayRepository(session)
+        await repository.save_digests({1: [], 3: []}, TODAY, {1: 0, 3: 0})
+        versions = await repository.get_versions([1, 2, 3])
+        assert versions == {1: 0, 2: 0, 3: 0}
+
+        # Contacts change after the digests were computed
+        await repository.invalidate(1)
+        await repository.invalidate(2)
+        await repository.save_digests(
+            {1: [{"id": 1}], 2: [{"id": 2}], 3: [{"id": 3}]}, TODAY, versions
+        )
+        assert await repository.get_digest(1, TODAY) is None
+        assert await repository.get_digest(2, TODAY) is None
+        assert await repository.get_digest(3, TODAY) == [{"id": 3}]
+
+        versions = await repository.get_versions([1, 2])
+        assert versions == {1: 1, 2: 1}
+        await repository.save_digests({1: [], 2: []}, TODAY, versions)
+        assert await repository.get_digest(1, TODAY) == []
+        assert await repository.get_digest(2, TODAY) == []
+
+
+@pytest.mark.asyncio
+async def test_birthday_calendar(session_maker):
+    async with session_maker() as session:
+        repository = BirthdayRepository(session)
+        rows = await repository.get_calendar(1, TODAY, date(2025, 3, 31), names=1)
+        # Counted per day, with at most one name each
+        assert rows == [
+            (229, 1, "leap", "Test"),
+            (302, 2, "another", "Test"),
+        ]
+        # A range wrapping around the new year
+        rows = await repository.get_calendar(
+            1, date(2025, 5, 1), date(2026, 3, 1), names=3
+        )
+        assert [row[0] for row in rows] == [229, 601]
+
+    days = _calendar_days(rows, date(2025, 5, 1), date(2026, 3, 1), names=3)
+    assert days == [
+        {"date": "2025-06-01", "count": 1, "names": ["later Test"]},
+        {"date": "2026-02-28", "count": 1, "names": ["leap Test"]},
+    ]
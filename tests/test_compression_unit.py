@@ -0,0 +1,103 @@
+import gzip
+
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.services.compression import CompressionMiddleware, parse_accept_encoding
+
+ROWS = [
+    {"id": i, "first_name": "Олена", "email": f"user{i}@example.com"}
+    for i in range(200)
+]
+
+
+async def large(request):
+    return JSONResponse(ROWS)
+
+
+async def small(request):
+    return JSONResponse({"id": 1})
+
+
+async def image(request):
+    return Response(b"\x00" * 4096, media_type="image/webp")
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(3):
+            yield b'{"chunk": %d}' % i * 200
+
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+@pytest.fixture
+def client():
+    app = Starlette(
+        routes=[
+            Route("/large", large),
+            Route("/small", small),
+            Route("/image", image),
+            Route("/stream", stream),
+        ]
+    )
+    app.add_middleware(CompressionMiddleware, minimum_size=500, offload_size=1000)
+    return TestClient(app)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, *;q=0") == {
+        "gzip": 1.0,
+        "br": 0.5,
+        "*": 0.0,
+    }
+
+
+def test_choose_encoding():
+    middleware = CompressionMiddleware(None)
+
+    assert middleware.choose_encoding("gzip, deflate, br") == "br"
+    assert middleware.choose_encoding("gzip;q=1, br;q=0.5") == "gzip"
+    assert middleware.choose_encoding("identity") is None
+    assert middleware.choose_encoding("*") == "br"
+    assert middleware.choose_encoding("br;q=0, gzip;q=0") is None
+
+
+@pytest.mark.parametrize(
+    "encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)]
+)
+def test_large_json_is_compressed(client, encoding, decompress):
+    with client.stream("GET", "/large", headers={"Accept-Encoding": encoding}) as r:
+        body = b"".join(r.iter_raw())
+
+    assert r.headers["content-encoding"] == encoding
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) == len(body)
+    assert decompress(body) == JSONResponse(ROWS).body
+
+
+def test_small_and_binary_responses_are_not_compressed(client):
+    for path in ("/small", "/image"):
+        response = client.get(path, headers={"Accept-Encoding": "br, gzip"})
+        assert "content-encoding" not in response.headers
+
+
+def test_streamed_response_is_compressed(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        body = b"".join(r.iter_raw())
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    assert gzip.decompress(body) == b"".join(
+        b'{"chunk": %d}' % i * 200 for i in range(3)
+    )
+
+
+def test_no_accept_encoding(client):
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == ROWS
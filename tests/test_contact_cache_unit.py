@@ -0,0 +1,60 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from src.services.contact_cache import ContactCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+
+
+@pytest.mark.asyncio
+async def test_cached_until_contacts_change():
+    cache = ContactCache(FakeRedis())
+    compute = AsyncMock(side_effect=[{"n": 1}, {"n": 2}])
+
+    assert await cache.get_or_compute(1, "calendar", compute) == {"n": 1}
+    assert await cache.get_or_compute(1, "calendar", compute) == {"n": 1}
+    assert compute.await_count == 1
+
+    await cache.bump(1)
+    assert await cache.get_or_compute(1, "calendar", compute) == {"n": 2}
+
+
+@pytest.mark.asyncio
+async def test_computes_without_redis():
+    redis_client = MagicMock()
+    redis_client.get = AsyncMock(side_effect=ConnectionError("down"))
+    redis_client.incr = AsyncMock(side_effect=ConnectionError("down"))
+    cache = ContactCache(redis_client)
+
+    assert await cache.get_or_compute(1, "calendar", AsyncMock(return_value=[])) == []
+    await cache.bump(1)
+
+
+@pytest.mark.asyncio
+async def test_watermark_catches_changes_without_bump():
+    redis_client = FakeRedis()
+    cache = ContactCache(redis_client)
+    compute = AsyncMock(side_effect=[{"n": 1}, {"n": 2}])
+    watermark = AsyncMock(return_value=["2025-01-01T00:00:00", None])
+
+    assert await cache.get_or_compute(1, "calendar", compute, watermark) == {"n": 1}
+    assert await cache.get_or_compute(1, "calendar", compute, watermark) == {"n": 1}
+
+    # A contact changed, but the generation could not be bumped
+    watermark.return_value = ["2025-01-02T00:00:00", None]
+    assert await cache.get_or_compute(1, "calendar", compute, watermark) == {"n": 2}
+    assert compute.await_count == 2
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import class_mapper
+
+from src.database.models import Contact
+from src.database.partitions import contact_partitions, partition_ddl, repartition
+
+
+def test_partition_ddl():
+    assert partition_ddl("contacts", 3) == [
+        "CREATE TABLE contacts_p0 PARTITION OF contacts"
+        " FOR VALUES WITH (MODULUS 3, REMAINDER 0)",
+        "CREATE TABLE contacts_p1 PARTITION OF contacts"
+        " FOR VALUES WITH (MODULUS 3, REMAINDER 1)",
+        "CREATE TABLE contacts_p2 PARTITION OF contacts"
+        " FOR VALUES WITH (MODULUS 3, REMAINDER 2)",
+    ]
+    assert partition_ddl("contacts", 0) == []
+
+
+def test_contacts_model_fits_either_layout():
+    # The table is declared unpartitioned; partitioning is a separate step
+    assert [column.name for column in Contact.__table__.primary_key] == ["id"]
+    assert Contact.__table__.dialect_options["postgresql"]["partition_by"] is None
+    assert not Contact.__table__.c.user_id.nullable
+    # ORM updates and deletes filter on the partition key
+    assert [column.name for column in class_mapper(Contact).primary_key] == [
+        "id",
+        "user_id",
+    ]
+
+
+def test_only_postgres_is_partitioned():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        assert contact_partitions(conn) == 0
+        with pytest.raises(ValueError):
+            repartition(conn, 4)
@@ -4,14 +4,17 @@ from src.repositories.contacts import ContactRepository
 
 from unittest.mock import AsyncMock, MagicMock
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import date
-from src.database.models import Contact, User
+from datetime import date, datetime
+from src.database.models import Contact, ContactTombstone, User, normalize_email, normalize_phone
 from src.schemas import ContactModel, ContactUpdate
 
 
 @pytest.fixture
 def mock_session():
     mock_session = AsyncMock(spec=AsyncSession)
+    # Statements built per dialect, such as upserts, need one
+    mock_session.bind = MagicMock()
+    mock_session.bind.dialect.name = "sqlite"
     return mock_session
 
 
@@ -98,12 +101,32 @@ async def test_update_contact(contacts_repository, mock_session, contact, user):
 @pytest.mark.asyncio
 async def test_remove_contact(contacts_repository, mock_session, contact, user):
     mock_session.commit = AsyncMock()
-    mock_session.scalar_one_or_none = AsyncMock(return_value=contact)
-    contacts_repository.db.session = mock_session
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = contact
+    mock_session.execute = AsyncMock(return_value=mock_result)
 
     await contacts_repository.remove_contact(contact.id, user)
 
     mock_session.commit.assert_called_once()
+    tombstone = mock_session.add.call_args.args[0]
+    assert isinstance(tombstone, ContactTombstone)
+    assert tombstone.user_id == user.id
+
+
+@pytest.mark.asyncio
+async def test_get_changes(contacts_repository, mock_session, contact, user):
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = [contact]
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    changes = await contacts_repository.get_changes(
+        user, (datetime(2025, 1, 1), 1), limit=10
+    )
+
+    assert changes == [contact]
+    stmt = str(mock_session.execute.call_args.args[0])
+    assert "contacts.updated_at, contacts.id) >" in stmt
+    assert "ORDER BY contacts.updated_at, contacts.id" in stmt
 
 
 @pytest.mark.asyncio
@@ -129,4 +152,35 @@ async def test_get_upcoming_birthdays(contacts_repository, mock_session, contact
     upcoming_birthdays = await contacts_repository.get_upcoming_birthdays(user)
 
     assert len(upcoming_birthdays) == 1
-    assert upcoming_birthdays[0].first_name == "test"
\ No newline at end of file
+    assert upcoming_birthdays[0].first_name == "test"
+
+def test_normalize_phone():
+    assert normalize_phone("+380 (50) 123-45-67") == "+380501234567"
+    assert normalize_phone("0501234567") == "+380501234567"
+    assert normalize_phone("00380501234567") == "+380501234567"
+    assert normalize_phone("380501234567") == "+380501234567"
+    assert normalize_phone("12") is None
+    assert normalize_phone("") is None
+
+
+def test_contact_keeps_normalized_columns(contact):
+    assert contact.phone_e164 == "+1234567890"
+    assert contact.email_normalized == "test@example.com"
+    contact.email = " Test@Example.COM "
+    contact.phone = "050 123 45 67"
+    assert contact.email_normalized == normalize_email(contact.email) == "test@example.com"
+    assert contact.phone_e164 == "+380501234567"
+
+
+@pytest.mark.asyncio
+async def test_lookup_contacts(contacts_repository, mock_session, contact, user):
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = [contact]
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    contacts = await contacts_repository.lookup_contacts(user, phone_e164="+1234567890")
+
+    assert contacts == [contact]
+    stmt = str(mock_session.execute.call_args.args[0])
+    assert "contacts.phone_e164 = " in stmt
+    assert "email_normalized =" not in stmt
@@ -0,0 +1,212 @@
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.conf.config import settings
+from src.database.models import Base, Contact, ContactTombstone, User, soundex
+from src.repositories.duplicates import DuplicateRepository
+from src.services.duplicates import (
+    DisjointSet,
+    DuplicateService,
+    find_clusters,
+)
+from src.services.events import RESYNC
+
+BIRTHDAY = date(1990, 5, 17)
+
+
+def test_soundex():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert soundex("Ashcraft") == "A261"
+    assert soundex("Pfister") == "P236"
+    # Cyrillic names are transliterated first
+    assert soundex("Олена") == soundex("Olena")
+    assert soundex("Шевченко") == soundex("Shevchenko")
+    assert soundex("123") == ""
+
+
+def test_contact_keeps_name_key():
+    contact = Contact(first_name="Олена", last_name="Шевченко")
+    assert contact.name_key == "S125O450"
+    contact.first_name = "Olena"
+    contact.last_name = "Shevchenko"
+    assert contact.name_key == "S125O450"
+    contact.first_name = "Taras"
+    assert contact.name_key == "S125T620"
+
+
+def test_disjoint_set():
+    clusters = DisjointSet()
+    clusters.union([5, 3])
+    clusters.union([7, 9])
+    clusters.union([9, 5])
+    clusters.union([11])
+    assert clusters.clusters() == [[3, 5, 7, 9]]
+    assert clusters.find(9) == 3
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(User),
+            [
+                {"id": i, "username": f"u{i}", "email": f"u{i}@example.com"}
+                for i in (1, 2)
+            ],
+        )
+        rows = [
+            # Same phone, written differently
+            (1, "Ivan", "Petrenko", "ivan@example.com", "+380 50 111 22 33", None),
+            (2, "John", "Smith", "john@example.com", "0501112233", "Work"),
+            # Same email, different case
+            (3, "Anna", "Koval", "Anna@Example.com", "0502223344", None),
+            (4, "Hanna", "Koval", " anna@example.com", "0503334455", None),
+            # Same name in two scripts and the same birthday
+            (5, "Олена", "Шевченко", "o1@example.com", "0504445566", None),
+            (6, "Olena", "Shevchenko", "o2@example.com", "0505556677", None),
+            # Unrelated
+            (7, "Taras", "Bondar", "taras@example.com", "0506667788", None),
+        ]
+        # A placeholder phone shared by too many contacts to mean anything
+        rows += [
+            (i, f"Name{i}", f"Other{i}", f"n{i}@example.com", "0500000000", None)
+            for i in range(8, 12)
+        ]
+        await conn.execute(
+            insert(Contact),
+            [
+                {
+                    "id": contact_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "email": email,
+                    "phone": phone,
+                    "birthday": BIRTHDAY if contact_id in (5, 6) else date(1980, 1, 1),
+                    "description": description,
+                    "user_id": 1,
+                }
+                for contact_id, first_name, last_name, email, phone, description in rows
+            ],
+        )
+        # Another user's contact is never matched
+        await conn.execute(
+            insert(Contact),
+            {
+                "id": 100,
+                "first_name": "Ivan",
+                "last_name": "Petrenko",
+                "email": "ivan@example.com",
+                "phone": "0501112233",
+                "birthday": date(1980, 1, 1),
+                "user_id": 2,
+            },
+        )
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_find_clusters(session_maker):
+    async with session_maker() as session:
+        repository = DuplicateRepository(session)
+        clusters = await find_clusters(repository, 1, max_block=3)
+    assert clusters == [[1, 2], [3, 4], [5, 6]]
+
+
+@pytest.mark.asyncio
+async def test_merge(session_maker):
+    async with session_maker() as session:
+        repository = DuplicateRepository(session)
+        await repository.save_report(1, [[1, 2], [3, 4], [5, 6]])
+
+        statements = []
+
+        def count(*args):
+            statements.append(1)
+
+        sync_engine = session.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", count)
+        try:
+            assert await repository.merge(1, {1: [2], 3: [4]}) == 2
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", count)
+        # Fixed statement count: read, update descriptions, tombstones, delete
+        assert len(statements) == 4
+        await session.commit()
+
+        kept = await session.get(Contact, (1, 1))
+        assert kept.description == "Work"
+        remaining = (await session.scalars(select(Contact.id))).all()
+        assert 2 not in remaining and 4 not in remaining
+        tombstones = (await session.scalars(select(ContactTombstone.contact_id))).all()
+        assert sorted(tombstones) == [2, 4]
+
+        # Contacts of other users are refused
+        assert await repository.merge(1, {5: [100]}) is None
+
+
+@pytest.mark.asyncio
+async def test_merge_invalidates_digest_of_kept_contact(session_maker):
+    async with session_maker() as session:
+        kept = await session.get(Contact, (1, 1))
+        kept.birthday = date.today()
+        await session.commit()
+
+        repository = DuplicateRepository(session)
+        with patch(
+            "src.repositories.duplicates.BirthdayRepository.invalidate",
+            new_callable=AsyncMock,
+        ) as invalidate:
+            # Only the kept contact's birthday is upcoming; it takes the
+            # description of the one removed
+            assert await repository.merge(1, {1: [2]}) == 1
+            invalidate.assert_awaited_once_with(1)
+
+            invalidate.reset_mock()
+            # Nothing upcoming changes
+            assert await repository.merge(1, {3: [4]}) == 1
+            invalidate.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_service_merge(session_maker):
+    user = User(id=1)
+    async with session_maker() as session:
+        service = DuplicateService(session)
+        with (
+            patch("src.services.duplicates.event_hub") as hub,
+            patch("src.services.duplicates.contact_cache") as cache,
+            patch.object(settings, "DUPLICATES_MAX_BLOCK", 3),
+        ):
+            hub.publish = AsyncMock()
+            cache.bump = AsyncMock()
+            await service.scan(1)
+
+            result = await service.merge([[5, 6]], user)
+            assert result == {"kept": [5], "removed": 1}
+            hub.publish.assert_awaited_once_with(1, RESYNC)
+            cache.bump.assert_awaited_once_with(1)
+
+            report = await service.get_report(0, 10, user)
+            assert report["total"] == 2
+            assert [[c.id for c in cluster] for cluster in report["clusters"]] == [
+                [1, 2],
+                [3, 4],
+            ]
+
+            for clusters, code in (
+                ([[1]], 400),
+                ([[1, 2], [2, 3]], 400),
+                ([[1, 100]], 404),
+            ):
+                with pytest.raises(HTTPException) as error:
+                    await service.merge(clusters, user)
+                assert error.value.status_code == code
@@ -0,0 +1,142 @@
+import socket
+
+import pytest
+import pytest_asyncio
+from aiosmtpd.controller import Controller
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.conf.config import Settings
+from src.database.models import Base, EmailOutbox, OutboxStatus
+from src.services.email import OutboxDispatcher, SMTPPool, queue_email
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def smtp_settings(port):
+    return Settings(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=port,
+        MAIL_SSL_TLS=False,
+        MAIL_STARTTLS=False,
+        USE_CREDENTIALS=False,
+        MAIL_TIMEOUT_SECONDS=5,
+    )
+
+
+@pytest_asyncio.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+async def queue(session_maker, count):
+    async with session_maker() as session:
+        for i in range(count):
+            queue_email(
+                session,
+                "verify_email",
+                f"user{i}@example.com",
+                f"user{i}",
+                "http://test/",
+            )
+        await session.commit()
+
+
+async def outbox(session_maker):
+    async with session_maker() as session:
+        result = await session.execute(select(EmailOutbox).order_by(EmailOutbox.id))
+        return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_delivers_batch(session_maker, smtp_server):
+    controller, handler = smtp_server
+    await queue(session_maker, 3)
+    config = smtp_settings(controller.port)
+    dispatcher = OutboxDispatcher(session_maker, SMTPPool(2, config), batch_size=10)
+
+    assert await dispatcher.dispatch_once() == 3
+    await dispatcher.pool.close()
+
+    assert sorted(m.rcpt_tos[0] for m in handler.messages) == [
+        "user0@example.com",
+        "user1@example.com",
+        "user2@example.com",
+    ]
+    assert b"api/auth/confirmed_email/" in handler.messages[0].content
+    assert all(m.status == OutboxStatus.SENT for m in await outbox(session_maker))
+    assert await dispatcher.dispatch_once() == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_retries_with_backoff(session_maker):
+    await queue(session_maker, 1)
+    config = smtp_settings(free_port())
+    dispatcher = OutboxDispatcher(session_maker, SMTPPool(1, config), max_attempts=2)
+
+    assert await dispatcher.dispatch_once() == 1
+    message = (await outbox(session_maker))[0]
+    assert message.status == OutboxStatus.PENDING
+    assert message.attempts == 1
+    assert message.next_attempt_at > message.created_at
+    assert await dispatcher.dispatch_once() == 0
+
+
+class ClaimCheckingPool:
+    """
+    Sends nothing, but while "sending" checks that the batch is already
+    committed as claimed, so another dispatcher skips it.
+    """
+
+    def __init__(self, session_maker):
+        self.session_maker = session_maker
+        self.sent = []
+        self.others = []
+
+    async def send(self, message):
+        other = OutboxDispatcher(self.session_maker, pool=None)
+        self.others.append(await other.dispatch_once())
+        self.sent.append(message["To"])
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_dispatch_sends_outside_the_claim(session_maker):
+    await queue(session_maker, 2)
+    pool = ClaimCheckingPool(session_maker)
+    dispatcher = OutboxDispatcher(session_maker, pool, lease=60)
+
+    assert await dispatcher.dispatch_once() == 2
+    assert sorted(pool.sent) == ["user0@example.com", "user1@example.com"]
+    assert pool.others == [0, 0]
+    messages = await outbox(session_maker)
+    assert all(m.status == OutboxStatus.SENT for m in messages)
+    assert all(m.sent_at is not None and m.sent_at.tzinfo is None for m in messages)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from src.database.models import Contact, User
+from src.services.contacts import ContactService
+from src.services.events import RESYNC, EventHub, Subscription, sse_stream
+
+
+async def no_message(**kwargs):
+    await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def pubsub():
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.get_message = no_message
+    pubsub.aclose = AsyncMock()
+    return pubsub
+
+
+@pytest.fixture
+def hub(pubsub):
+    client = MagicMock()
+    client.pubsub.return_value = pubsub
+    client.publish = AsyncMock()
+    return EventHub(client, "events", queue_size=2)
+
+
+def test_full_queue_is_replaced_with_resync():
+    subscription = Subscription(1, queue_size=2)
+    for i in range(3):
+        subscription.put({"type": "contact.updated", "id": i})
+
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() == RESYNC
+
+
+@pytest.mark.asyncio
+async def test_one_channel_per_user(hub, pubsub):
+    first = await hub.subscribe(1)
+    second = await hub.subscribe(1)
+    other = await hub.subscribe(2)
+
+    assert [call.args for call in pubsub.subscribe.await_args_list] == [
+        ("events:1",),
+        ("events:2",),
+    ]
+
+    hub.dispatch("events:1", json.dumps({"type": "contact.created", "id": 5}))
+    assert (
+        first.queue.get_nowait()
+        == second.queue.get_nowait()
+        == {
+            "type": "contact.created",
+            "id": 5,
+        }
+    )
+    assert other.queue.empty()
+
+    await hub.unsubscribe(first)
+    pubsub.unsubscribe.assert_not_awaited()
+    await hub.unsubscribe(second)
+    pubsub.unsubscribe.assert_awaited_once_with("events:1")
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_subscribe_fails_without_redis(hub, pubsub):
+    pubsub.subscribe.side_effect = ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        await hub.subscribe(1)
+    assert hub._local == {}
+
+
+@pytest.mark.asyncio
+async def test_reader_dispatches_messages(hub, pubsub):
+    messages = [
+        {
+            "type": "message",
+            "channel": "events:1",
+            "data": '{"type": "contact.deleted"}',
+        }
+    ]
+
+    async def get_message(**kwargs):
+        if messages:
+            return messages.pop()
+        await no_message()
+
+    pubsub.get_message = get_message
+    subscription = await hub.subscribe(1)
+
+    event = await asyncio.wait_for(subscription.queue.get(), 1)
+    assert event == {"type": "contact.deleted"}
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_fails_open(hub):
+    hub.redis.publish.side_effect = ConnectionError("down")
+
+    await hub.publish(1, {"type": "contact.created", "id": 1})
+
+
+@pytest.mark.asyncio
+async def test_sse_stream(hub):
+    subscription = await hub.subscribe(1)
+    subscription.put({"type": "contact.updated", "id": 3})
+    stream = sse_stream(hub, subscription, heartbeat=0.01)
+
+    assert await anext(stream) == "retry: 5000\n\n"
+    assert await anext(stream) == (
+        'event: contact.updated\ndata: {"type": "contact.updated", "id": 3}\n\n'
+    )
+    assert await anext(stream) == ": ping\n\n"
+    await stream.aclose()
+    assert hub._local == {}
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_contact_service_publishes(monkeypatch):
+    publish = AsyncMock()
+    monkeypatch.setattr("src.services.contacts.event_hub.publish", publish)
+    contact = Contact(id=7, user_id=1, updated_at=datetime(2025, 1, 1))
+    service = ContactService(AsyncMock())
+    service.contact_repository = MagicMock(autocommit=True)
+    service.contact_repository.remove_contact = AsyncMock(return_value=contact)
+
+    await service.remove_contact(7, User(id=1))
+
+    publish.assert_awaited_once_with(1, {"type": "contact.deleted", "id": 7})
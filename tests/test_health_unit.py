@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from src.services.health import HealthProber
+
+
+def make_prober(**checks):
+    return HealthProber(
+        checks, critical=["database"], interval=5, timeout=0.05, slow_ms=20
+    )
+
+
+async def ok():
+    return None
+
+
+@pytest.mark.asyncio
+async def test_ready_when_critical_checks_pass():
+    async def database():
+        return {"pool": {"checked_out": 1, "capacity": 10, "saturation": 0.1}}
+
+    async def smtp():
+        raise ConnectionError("smtp is down")
+
+    prober = make_prober(database=database, smtp=smtp)
+    await prober.refresh()
+
+    ready, report = prober.readiness()
+
+    assert ready
+    assert report["status"] == "degraded"
+    assert report["checks"]["database"]["status"] == "ok"
+    assert report["checks"]["database"]["pool"]["saturation"] == 0.1
+    assert report["checks"]["smtp"]["status"] == "down"
+    assert not report["checks"]["smtp"]["critical"]
+    assert "smtp is down" in report["checks"]["smtp"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_not_ready_when_critical_check_times_out():
+    async def database():
+        await asyncio.sleep(1)
+
+    prober = make_prober(database=database)
+    await prober.refresh()
+
+    ready, report = prober.readiness()
+
+    assert not ready
+    assert report["status"] == "down"
+    assert "TimeoutError" in report["checks"]["database"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_slow_or_saturated_check_is_degraded():
+    async def database():
+        return {"pool": {"checked_out": 9, "capacity": 10, "saturation": 0.9}}
+
+    async def redis():
+        await asyncio.sleep(0.03)
+
+    prober = make_prober(database=database, redis=redis)
+    await prober.refresh()
+
+    ready, report = prober.readiness()
+
+    assert ready
+    assert report["checks"]["database"]["status"] == "degraded"
+    assert report["checks"]["redis"]["status"] == "degraded"
+
+
+def test_not_ready_before_first_probe():
+    ready, report = make_prober(database=ok).readiness()
+
+    assert not ready
+    assert report["checks"]["database"]["error"] == "no recent result"
+
+
+@pytest.mark.asyncio
+async def test_refresh_respects_intervals():
+    calls = []
+
+    async def smtp():
+        calls.append(1)
+
+    prober = make_prober(database=ok, smtp=smtp)
+    prober.intervals["smtp"] = 60
+    await prober.refresh()
+    await prober.refresh()
+    await prober.refresh(force=True)
+
+    assert len(calls) == 2
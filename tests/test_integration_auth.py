@@ -1,17 +1,20 @@
-from unittest.mock import Mock
-
 import pytest
-from sqlalchemy import select
+from contextlib import contextmanager
+from unittest.mock import patch
+from sqlalchemy import event, select
 
-from src.database.models import User
+from src.database.models import EmailOutbox, User
+from src.services.auth import create_access_token, create_email_token
+from conftest import engine
 from tests.conftest import TestingSessionLocal
 
 user_data = {"username": "agent007", "email": "agent007@gmail.com", "password": "12345678"}
 
-def test_signup(client, monkeypatch):
-    mock_send_email = Mock()
-    monkeypatch.setattr("src.api.auth.send_email", mock_send_email)
-    response = client.post("api/auth/register", json=user_data)
+@pytest.mark.asyncio
+async def test_signup(client):
+    with patch("src.services.email.job_queue.enqueue") as enqueue_mock:
+        response = client.post("api/auth/register", json=user_data)
+        enqueue_mock.assert_awaited_once_with("email.deliver")
     assert response.status_code == 201, response.text
     data = response.json()
     assert data["username"] == user_data["username"]
@@ -19,14 +22,26 @@ def test_signup(client, monkeypatch):
     assert "hashed_password" not in data
     assert "avatar" in data
 
-def test_repeat_signup(client, monkeypatch):
-    mock_send_email = Mock()
-    monkeypatch.setattr("src.api.auth.send_email", mock_send_email)
+    async with TestingSessionLocal() as session:
+        outbox = await session.execute(
+            select(EmailOutbox).where(EmailOutbox.recipient == user_data["email"])
+        )
+        assert outbox.scalar_one().kind == "verify_email"
+
+def test_repeat_signup(client):
     response = client.post("api/auth/register", json=user_data)
     assert response.status_code == 409, response.text
     data = response.json()
     assert data["detail"] == "Користувач з таким email вже існує"
 
+def test_repeat_signup_username(client):
+    response = client.post(
+        "api/auth/register", json={**user_data, "email": "other007@gmail.com"}
+    )
+    assert response.status_code == 409, response.text
+    data = response.json()
+    assert data["detail"] == "Користувач з таким іменем вже існує"
+
 def test_not_confirmed_login(client):
     response = client.post("api/auth/login",
                            data={"username": user_data.get("username"), "password": user_data.get("password")})
@@ -76,4 +91,101 @@ def test_login_invalid_credentials(client):
     response = client.post("api/auth/login", data={"username": "test", "password": "invalid_password"})
     assert response.status_code == 401, response.text
     data = response.json()
-    assert "detail" in data
\ No newline at end of file
+    assert "detail" in data
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        with patch("src.services.email.job_queue.enqueue"):
+            yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+burst_user = {"username": "burst", "email": "burst@gmail.com", "password": "burstpass"}
+
+
+def test_signup_statements(client):
+    with count_statements() as statements:
+        response = client.post("api/auth/register", json=burst_user)
+    assert response.status_code == 201, response.text
+    # The user and its verification email, nothing else
+    assert statements == ["INSERT", "INSERT"]
+
+
+def test_request_email_statements(client):
+    with count_statements() as statements:
+        response = client.post(
+            "api/auth/request_email", json={"email": burst_user["email"]}
+        )
+    assert response.status_code == 200, response.text
+    assert statements == ["SELECT", "INSERT"]
+
+
+def test_confirmed_email_statements(client):
+    token = create_email_token({"sub": burst_user["email"]})
+    with count_statements() as statements:
+        response = client.get(f"api/auth/confirmed_email/{token}")
+    assert response.json()["message"] == "Електронну пошту підтверджено"
+    assert statements == ["UPDATE"]
+
+    with count_statements() as statements:
+        response = client.get(f"api/auth/confirmed_email/{token}")
+    assert response.json()["message"] == "Ваша електронна пошта вже підтверджена"
+    assert statements == ["UPDATE", "SELECT"]
+
+
+def test_login_statements(client):
+    with count_statements() as statements:
+        response = client.post(
+            "api/auth/login",
+            data={"username": burst_user["username"], "password": burst_user["password"]},
+        )
+    assert response.status_code == 200, response.text
+    assert statements == ["SELECT"]
+
+
+@pytest.mark.asyncio
+async def test_update_password_statements(client):
+    token = await create_access_token(data={"sub": burst_user["username"]})
+    with count_statements() as statements, patch(
+        "src.services.auth.redis_client"
+    ) as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.patch(
+            "api/auth/update_password",
+            json={"password": "newpass"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert response.status_code == 200, response.text
+    # The current user, then the update
+    assert statements == ["SELECT", "UPDATE"]
+
+
+def test_request_email_reset_password_statements(client):
+    with count_statements() as statements:
+        response = client.post(
+            "api/auth/request_email_reset_password",
+            json={"email": burst_user["email"]},
+        )
+    assert response.status_code == 200, response.text
+    assert statements == ["SELECT", "INSERT"]
+
+
+def test_reset_password_statements(client):
+    token = create_email_token({"sub": burst_user["email"]})
+    with count_statements() as statements:
+        response = client.get(f"api/auth/reset_password/{token}")
+    assert response.status_code == 200, response.text
+    assert statements == ["UPDATE"]
+
+    token = create_email_token({"sub": "nobody@gmail.com"})
+    response = client.get(f"api/auth/reset_password/{token}")
+    assert response.status_code == 400, response.text
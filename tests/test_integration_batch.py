@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from conftest import engine
+
+CONTACT = {
+    "first_name": "Batch",
+    "last_name": "Sync",
+    "email": "batch@example.com",
+    "phone": "380501234567",
+    "birthday": "1990-05-05",
+}
+
+
+def run_batch(client, token, operations, atomic=True):
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        redis_mock.get.return_value = None
+        return client.post(
+            "/api/batch",
+            json={"operations": operations, "atomic": atomic},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+
+@contextmanager
+def count_commits():
+    commits = []
+
+    def record(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", record)
+    try:
+        yield commits
+    finally:
+        event.remove(engine.sync_engine, "commit", record)
+
+
+def test_batch_atomic(client, get_token):
+    with count_commits() as commits, patch(
+        "src.services.contacts.event_hub.publish"
+    ) as publish:
+        response = run_batch(
+            client,
+            get_token,
+            [
+                {"op": "create", "body": CONTACT},
+                {"op": "create", "body": {**CONTACT, "email": "batch2@example.com"}},
+            ],
+        )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["committed"] is True
+    assert [r["status"] for r in data["results"]] == [201, 201]
+    assert len(commits) == 1
+    assert [call.args[1]["type"] for call in publish.await_args_list] == [
+        "contact.created",
+        "contact.created",
+    ]
+
+    first, second = (r["data"]["id"] for r in data["results"])
+    response = run_batch(
+        client,
+        get_token,
+        [
+            {"op": "update", "id": first, "body": {"description": "updated"}},
+            {"op": "read", "id": second},
+            {"op": "delete", "id": second},
+        ],
+    )
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [200, 200, 200]
+    assert results[0]["data"]["description"] == "updated"
+
+    response = run_batch(client, get_token, [{"op": "read", "id": second}])
+    assert response.json()["results"][0]["status"] == 404
+
+
+def test_batch_atomic_rolls_back(client, get_token):
+    with patch("src.services.contacts.event_hub.publish") as publish:
+        response = run_batch(
+            client,
+            get_token,
+            [
+                {"op": "create", "body": {**CONTACT, "email": "rolled@example.com"}},
+                {"op": "update", "id": 99999, "body": {"description": "missing"}},
+                {"op": "create", "body": CONTACT},
+            ],
+        )
+    data = response.json()
+    assert data["committed"] is False
+    assert [r["status"] for r in data["results"]] == [201, 404, 424]
+    publish.assert_not_called()
+
+    created = data["results"][0]["data"]["id"]
+    response = run_batch(client, get_token, [{"op": "read", "id": created}])
+    assert response.json()["results"][0]["status"] == 404
+
+
+def test_batch_independent(client, get_token):
+    response = run_batch(
+        client,
+        get_token,
+        [
+            {"op": "create", "body": {**CONTACT, "phone": "x" * 20}},
+            {"op": "delete"},
+            {"op": "create", "body": {**CONTACT, "email": "kept@example.com"}},
+        ],
+        atomic=False,
+    )
+    data = response.json()
+    assert data["committed"] is True
+    assert [r["status"] for r in data["results"]] == [422, 422, 201]
+
+    created = data["results"][2]["data"]["id"]
+    response = run_batch(client, get_token, [{"op": "read", "id": created}])
+    assert response.json()["results"][0]["data"]["email"] == "kept@example.com"
+
+
+def test_batch_independent_database_errors(client, get_token):
+    created = run_batch(
+        client,
+        get_token,
+        [{"op": "create", "body": {**CONTACT, "email": "db@example.com"}}],
+    ).json()["results"][0]["data"]["id"]
+
+    errors = iter(
+        [
+            IntegrityError("DELETE", {}, Exception("constraint failed")),
+            OperationalError("DELETE", {}, Exception("disk I/O error")),
+        ]
+    )
+
+    async def fail(*args):
+        raise next(errors)
+
+    with patch(
+        "src.services.contacts.ContactRepository.remove_contact", side_effect=fail
+    ):
+        response = run_batch(
+            client,
+            get_token,
+            [
+                {"op": "update", "id": created, "body": {"description": "kept"}},
+                {"op": "delete", "id": created},
+                {"op": "delete", "id": created},
+            ],
+            atomic=False,
+        )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["committed"] is True
+    assert [r["status"] for r in data["results"]] == [200, 400, 500]
+
+    response = run_batch(client, get_token, [{"op": "read", "id": created}])
+    assert response.json()["results"][0]["data"]["description"] == "kept"
+
+
+def test_batch_too_many_operations(client, get_token):
+    with patch("src.api.batch.settings.BATCH_MAX_OPERATIONS", 2):
+        response = run_batch(client, get_token, [{"op": "read", "id": 1}] * 3)
+    assert response.status_code == 413, response.text
@@ -1,4 +1,9 @@
-from unittest.mock import patch
+from datetime import date
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import event
+
+from conftest import engine
 
 def test_get_contacts(client, get_token):
     with patch("src.services.auth.redis_client") as redis_mock:
@@ -137,4 +142,233 @@ def test_delete_contact_not_found(client, get_token):
         )
         assert response.status_code == 404, response.text
         data = response.json()
-        assert data["detail"] == "Contact not found"
\ No newline at end of file
+        assert data["detail"] == "Contact not found"
+
+def get_changes(client, token, since=None):
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.get(
+            "/api/contacts/changes",
+            params={"since": since} if since else {},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_contact_changes(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    with patch("src.services.contacts.settings.SYNC_WINDOW_SECONDS", 0), patch(
+        "src.services.auth.redis_client"
+    ) as redis_mock:
+        redis_mock.exists.return_value = False
+        ids = [
+            client.post(
+                "/api/contacts",
+                json={
+                    "first_name": "Sync",
+                    "last_name": str(i),
+                    "email": f"sync{i}@example.com",
+                    "phone": "1234567890",
+                    "birthday": "2000-01-01",
+                },
+                headers=headers,
+            ).json()["id"]
+            for i in range(3)
+        ]
+        snapshot = get_changes(client, get_token)
+        assert set(ids) <= {contact["id"] for contact in snapshot["changed"]}
+        assert snapshot["deleted"] == []
+
+        unchanged = get_changes(client, get_token, snapshot["next_token"])
+        assert unchanged["changed"] == [] and unchanged["deleted"] == []
+
+        client.put(
+            f"/api/contacts/{ids[0]}", json={"description": "new"}, headers=headers
+        )
+        client.delete(f"/api/contacts/{ids[1]}", headers=headers)
+        delta = get_changes(client, get_token, unchanged["next_token"])
+
+    assert [contact["id"] for contact in delta["changed"]] == [ids[0]]
+    assert delta["changed"][0]["description"] == "new"
+    assert delta["deleted"] == [ids[1]]
+    assert delta["has_more"] is False
+
+
+def test_contact_changes_repeats_recent_window(client, get_token):
+    first = get_changes(client, get_token)
+    again = get_changes(client, get_token, first["next_token"])
+    # Rows younger than SYNC_WINDOW_SECONDS are sent again
+    assert again["changed"]
+
+
+def test_contact_changes_invalid_token(client, get_token):
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.get(
+            "/api/contacts/changes",
+            params={"since": "not-a-token"},
+            headers={"Authorization": f"Bearer {get_token}"},
+        )
+    assert response.status_code == 400, response.text
+
+
+def test_contact_events_without_redis(client, get_token):
+    with patch("src.services.auth.redis_client") as redis_mock, patch(
+        "src.api.contacts.event_hub.subscribe", side_effect=ConnectionError("down")
+    ):
+        redis_mock.exists.return_value = False
+        response = client.get(
+            "/api/contacts/events", headers={"Authorization": f"Bearer {get_token}"}
+        )
+    assert response.status_code == 503, response.text
+
+
+def test_upcoming_birthdays_digest(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        client.get("/api/contacts/birthdays", headers=headers)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            cached = client.get("/api/contacts/birthdays", headers=headers).json()
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+        assert not any("FROM contacts" in statement for statement in statements)
+
+        # A birthday inside the window invalidates the digest
+        birthday = date.today().replace(year=1990)
+        contact_id = client.post(
+            "/api/contacts",
+            json={
+                "first_name": "Birthday",
+                "last_name": "Today",
+                "email": "birthday@example.com",
+                "phone": "1234567890",
+                "birthday": birthday.isoformat(),
+            },
+            headers=headers,
+        ).json()["id"]
+        fresh = client.get("/api/contacts/birthdays", headers=headers).json()
+
+    assert contact_id not in [contact["id"] for contact in cached]
+    assert fresh[0]["id"] == contact_id
+
+
+def test_birthday_calendar(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.get(
+            "/api/contacts/birthdays/calendar",
+            params={"from": "2025-01-01", "to": "2025-12-31"},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+        days = {day["date"]: day for day in response.json()}
+        assert days["2025-01-01"]["count"] >= 1
+
+        response = client.get(
+            "/api/contacts/birthdays/calendar",
+            params={"from": "2025-01-01", "to": "2026-06-01"},
+            headers=headers,
+        )
+        assert response.status_code == 400, response.text
+
+
+def test_lookup_contacts(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.post(
+            "/api/contacts",
+            json={
+                "first_name": "Caller",
+                "last_name": "Id",
+                "email": " Caller.Id@Example.COM",
+                "phone": "050 765 43 21",
+                "birthday": "1990-05-17",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 201, response.text
+        contact_id = response.json()["id"]
+
+        response = client.get(
+            "/api/contacts/lookup", params={"phone": "0507654321"}, headers=headers
+        )
+        assert response.status_code == 200, response.text
+        assert [contact["id"] for contact in response.json()] == [contact_id]
+
+        response = client.get(
+            "/api/contacts/lookup",
+            params={"email": "caller.id@example.com"},
+            headers=headers,
+        )
+        assert [contact["id"] for contact in response.json()] == [contact_id]
+
+        response = client.get(
+            "/api/contacts/lookup", params={"phone": "0507654322"}, headers=headers
+        )
+        assert response.json() == []
+
+        response = client.get("/api/contacts/lookup", headers=headers)
+        assert response.status_code == 400, response.text
+        response = client.get(
+            "/api/contacts/lookup", params={"phone": "12"}, headers=headers
+        )
+        assert response.status_code == 400, response.text
+
+
+def test_duplicates(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    with patch("src.services.auth.redis_client") as redis_mock, patch(
+        "src.api.contacts.job_queue"
+    ) as queue_mock:
+        redis_mock.exists.return_value = False
+        response = client.get("/api/contacts/duplicates", headers=headers)
+        assert response.status_code == 404, response.text
+
+        queue_mock.enqueue = AsyncMock(return_value="job-1")
+        response = client.post("/api/contacts/duplicates/scan", headers=headers)
+        assert response.status_code == 202, response.text
+        assert response.json() == {"job_id": "job-1"}
+        queue_mock.enqueue.assert_awaited_once()
+
+        ids = []
+        for phone in ("050 999 88 77", "+380509998877"):
+            response = client.post(
+                "/api/contacts",
+                json={
+                    "first_name": "Twin",
+                    "last_name": "Contact",
+                    "email": "twin@example.com",
+                    "phone": phone,
+                    "birthday": "1990-05-17",
+                },
+                headers=headers,
+            )
+            ids.append(response.json()["id"])
+
+        response = client.post(
+            "/api/contacts/duplicates/merge",
+            json={"clusters": [[ids[0]]]},
+            headers=headers,
+        )
+        assert response.status_code == 400, response.text
+
+        response = client.post(
+            "/api/contacts/duplicates/merge",
+            json={"clusters": [ids]},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == {"kept": [ids[0]], "removed": 1}
+        response = client.get(f"/api/contacts/{ids[1]}", headers=headers)
+        assert response.status_code == 404, response.text
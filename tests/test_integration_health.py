@@ -0,0 +1,12 @@
+from unittest.mock import patch
+
+
+def test_health_probes_are_served_from_memory(client):
+    with patch("src.api.utils.prober.checks", {}):
+        response = client.get("/api/health/live")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ok"
+
+        response = client.get("/api/health/ready")
+        assert response.status_code == 200, response.text
+        assert response.json() == {"status": "ok", "loop_lag_ms": 0.0, "checks": {}}
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from src.services.metrics import (
+    REQUESTS_IN_FLIGHT,
+    MetricsMiddleware,
+    RequestDurationCollector,
+    mark_process_dead,
+)
+
+
+def test_metrics_exposes_route_templates(client, get_token):
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        client.get(
+            "/api/contacts/999", headers={"Authorization": f"Bearer {get_token}"}
+        )
+
+    response = client.get("/metrics")
+    assert response.status_code == 200, response.text
+    assert 'route="/api/contacts/{contact_id}"' in response.text
+    assert 'status="404"' in response.text
+    assert "http_requests_in_flight" in response.text
+    assert "bcrypt_pool_queue_depth" in response.text
+
+
+def test_request_durations_add_up_across_processes(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    collector = RequestDurationCollector((0.1, 1))
+    collector.add({("GET", "/api/contacts", 200): ([1, 0, 0], 0.05)})
+    collector.write(str(tmp_path))
+    # The totals another worker wrote
+    (tmp_path / "http_requests_1.json").write_text(
+        '[["GET", "/api/contacts", 200, [0, 1, 1], 2.5]]'
+    )
+
+    [family] = collector.collect()
+    samples = {
+        (sample.name, sample.labels.get("le")): sample.value
+        for sample in family.samples
+    }
+    assert samples[("http_request_duration_seconds_bucket", "0.1")] == 1
+    assert samples[("http_request_duration_seconds_bucket", "1.0")] == 2
+    assert samples[("http_request_duration_seconds_bucket", "+Inf")] == 3
+    assert samples[("http_request_duration_seconds_count", None)] == 3
+    assert samples[("http_request_duration_seconds_sum", None)] == 2.55
+
+
+@pytest.mark.asyncio
+async def test_in_flight_is_live():
+    before = REQUESTS_IN_FLIGHT._value.get()
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(REQUESTS_IN_FLIGHT._value.get())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    await MetricsMiddleware(app)(scope, None, send)
+    assert seen == [before + 1]
+    assert REQUESTS_IN_FLIGHT._value.get() == before
+
+
+def test_dead_workers_are_marked(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    # A pid that is no longer running
+    dead = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    for pid in (dead, os.getpid()):
+        (tmp_path / f"gauge_livesum_{pid}.db").write_bytes(b"")
+    (tmp_path / f"counter_{dead}.db").write_bytes(b"")
+
+    mark_process_dead()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f"counter_{dead}.db",
+        f"gauge_livesum_{os.getpid()}.db",
+    ]
+
+    mark_process_dead(os.getpid())
+    assert [path.name for path in tmp_path.iterdir()] == [f"counter_{dead}.db"]
@@ -1,6 +1,14 @@
 import pytest
+from io import BytesIO
 from unittest.mock import patch
-from conftest import test_user, admin_user
+
+from PIL import Image
+
+from conftest import TestingSessionLocal, test_user, admin_user
+from src.services.avatar_cache import AvatarCache
+from src.services.storage import LocalStorage
+from src.services.upload_file import AvatarService
+from src.services.users import UserService
 
 
 @pytest.mark.asyncio
@@ -25,9 +33,9 @@ async def test_get_me_unauthorized(client):
         assert response.status_code == 401, response.text
 
 
-@patch("src.services.upload_file.UploadFileService.upload_file")
+@patch("src.api.users.job_queue.enqueue")
 @pytest.mark.asyncio
-async def test_update_avatar_user_non_admin_forbidden(mock_upload_file, client, get_token):
+async def test_update_avatar_user_non_admin_forbidden(mock_enqueue, client, get_token):
     headers = {"Authorization": f"Bearer {get_token}"}
     file_data = {"file": ("avatar.jpg", b"fake image content", "image/jpeg")}
 
@@ -38,7 +46,7 @@ async def test_update_avatar_user_non_admin_forbidden(mock_upload_file, client,
         assert response.status_code == 403, response.text
         data = response.json()
         assert data["detail"] == "Недостатньо прав доступу для виконання цієї дії"
-        mock_upload_file.assert_not_called()
+        mock_enqueue.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -63,25 +71,82 @@ async def test_update_avatar_user_empty_file(client, get_token):
         assert response.status_code == 403, response.text
 
 
-@patch("src.services.upload_file.UploadFileService.upload_file")
+def png_image(size=(400, 300)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def local_avatars(tmp_path):
+    service = AvatarService(
+        LocalStorage(str(tmp_path / "media"), "/media"),
+        {"sm": 64, "md": 250},
+        "md",
+        str(tmp_path / "staging"),
+    )
+    with patch("src.api.users.avatar_service", service):
+        yield service
+
+
 @pytest.mark.asyncio
-async def test_update_avatar_user_admin_success(mock_upload_file, client, get_admin_token):
-    fake_url = "http://example.com/admin_avatar.jpg"
-    mock_upload_file.return_value = fake_url
+async def test_update_avatar_user_admin_success(client, get_admin_token, local_avatars):
+    headers = {"Authorization": f"Bearer {get_admin_token}"}
+    file_data = {"file": ("avatar.png", png_image(), "image/png")}
 
+    with patch("src.services.auth.redis_client") as redis_mock, patch(
+        "src.api.users.job_queue.enqueue", return_value="job1"
+    ) as mock_enqueue:
+        redis_mock.exists.return_value = False
+        response = client.patch("/api/users/avatar", headers=headers, files=file_data)
+        assert response.status_code == 202, response.text
+
+    data = response.json()
+    assert data["job_id"] == "job1"
+    assert data["avatar"].startswith("/media/avatars/")
+    name, payload = mock_enqueue.await_args.args
+    assert name == "avatar.process"
+    assert payload["email"] == admin_user["email"]
+
+    async with TestingSessionLocal() as session:
+        avatar_url = await local_avatars.finalize(
+            session, payload["email"], payload["staged"], payload["digest"]
+        )
+        assert avatar_url == data["avatar"]
+        user = await UserService(session).get_user_by_email(admin_user["email"])
+        assert user.avatar == data["avatar"]
+
+    media = local_avatars.storage.root / "avatars" / payload["digest"]
+    with Image.open(media / "sm.webp") as small:
+        assert small.size == (64, 64)
+    assert (media / "md.webp").exists()
+    assert not (local_avatars.staging_dir / payload["staged"]).exists()
+
+
+@pytest.mark.asyncio
+async def test_update_avatar_user_rejects_non_image(
+    client, get_admin_token, local_avatars
+):
     headers = {"Authorization": f"Bearer {get_admin_token}"}
     file_data = {"file": ("avatar.jpg", b"fake image content", "image/jpeg")}
 
     with patch("src.services.auth.redis_client") as redis_mock:
         redis_mock.exists.return_value = False
         response = client.patch("/api/users/avatar", headers=headers, files=file_data)
-        assert response.status_code == 200, response.text
+        assert response.status_code == 400, response.text
 
-        data = response.json()
-        assert data["username"] == admin_user["username"]
-        assert data["email"] == admin_user["email"]
-        assert data["avatar"] == fake_url
-        mock_upload_file.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_update_avatar_user_too_large(client, get_admin_token, local_avatars):
+    headers = {"Authorization": f"Bearer {get_admin_token}"}
+    file_data = {"file": ("avatar.png", png_image(), "image/png")}
+
+    with patch("src.services.auth.redis_client") as redis_mock, patch(
+        "src.api.users.settings.AVATAR_MAX_BYTES", 100
+    ):
+        redis_mock.exists.return_value = False
+        response = client.patch("/api/users/avatar", headers=headers, files=file_data)
+        assert response.status_code == 413, response.text
 
 
 @pytest.mark.asyncio
@@ -135,3 +200,95 @@ async def test_moderator_route_forbidden_for_user(client, get_token):
         redis_mock.exists.return_value = False
         response = client.get("/api/users/moderator", headers=headers)
         assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_admin_access(client, get_admin_token):
+    headers = {"Authorization": f"Bearer {get_admin_token}"}
+
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.get("/api/users/admin/slow_queries", headers=headers)
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+        response = client.get(
+            "/api/users/admin/slow_queries", params={"limit": 0}, headers=headers
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_forbidden_for_user(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+
+    with patch("src.services.auth.redis_client") as redis_mock:
+        redis_mock.exists.return_value = False
+        response = client.get("/api/users/admin/slow_queries", headers=headers)
+        assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_read_job(client, get_token):
+    job = {
+        "id": "abc",
+        "name": "avatar.upload",
+        "status": "queued",
+        "attempts": 0,
+        "user_id": 1,
+        "result": None,
+        "error": None,
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00",
+    }
+    headers = {"Authorization": f"Bearer {get_token}"}
+    with patch("src.services.auth.redis_client") as redis_mock, patch(
+        "src.api.jobs.job_queue.status", return_value=job
+    ):
+        redis_mock.exists.return_value = False
+        response = client.get("/api/jobs/abc", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == "queued"
+
+        job["user_id"] = 2
+        response = client.get("/api/jobs/abc", headers=headers)
+        assert response.status_code == 404, response.text
+        assert response.json()["detail"] == "Завдання не знайдено"
+
+
+@pytest.mark.asyncio
+async def test_read_avatar(client, tmp_path):
+    media = tmp_path / "media"
+    (media / "avatars" / "abc").mkdir(parents=True)
+    (media / "avatars" / "abc" / "lg.webp").write_bytes(png_image((600, 600)))
+    async with TestingSessionLocal() as session:
+        user = await UserService(session).get_user_by_email(test_user["email"])
+        await UserService(session).update_avatar_url(
+            test_user["email"], "/media/avatars/abc/md.webp"
+        )
+    cache = AvatarCache(str(tmp_path / "cache"), 1024 * 1024)
+
+    with patch("src.api.users.avatar_cache", cache), patch(
+        "src.services.avatar_cache.settings.AVATAR_LOCAL_DIR", str(media)
+    ):
+        response = client.get(f"/api/users/{user.id}/avatar?size=sm")
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["cache-control"] == "public, no-cache"
+        with Image.open(BytesIO(response.content)) as image:
+            assert image.size == (64, 64)
+
+        etag = response.headers["etag"]
+        response = client.get(
+            f"/api/users/{user.id}/avatar?size=sm", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        response = client.get(
+            f"/api/users/{user.id}/avatar?size=sm&v={etag.strip(chr(34))}"
+        )
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        assert len(cache._entries) == 1
+
+        response = client.get(f"/api/users/{user.id}/avatar?size=huge")
+        assert response.status_code == 400, response.text
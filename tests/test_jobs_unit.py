@@ -0,0 +1,135 @@
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.services.jobs import JobQueue, Worker, task, tasks
+
+
+@pytest.fixture
+def queue():
+    queue = MagicMock(spec=JobQueue)
+    queue.start.return_value = 1
+    queue.fail.return_value = True
+    return queue
+
+
+@pytest.fixture
+def handler():
+    handler = AsyncMock(return_value={"ok": True})
+    task("test.job")(handler)
+    yield handler
+    tasks.pop("test.job")
+
+
+def message(name="test.job", payload=None):
+    return "1-0", {"id": "abc", "name": name, "payload": json.dumps(payload or {})}
+
+
+@pytest.mark.asyncio
+async def test_process_acknowledges_success(queue, handler):
+    await Worker(queue).process(*message(payload={"email": "a@example.com"}))
+
+    handler.assert_awaited_once_with({"email": "a@example.com"})
+    queue.complete.assert_awaited_once_with("1-0", "abc", {"ok": True})
+    queue.fail.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_failure_is_retried(queue, handler):
+    handler.side_effect = ValueError("boom")
+    queue.start.return_value = 2
+
+    await Worker(queue).process(*message())
+
+    queue.complete.assert_not_awaited()
+    message_id, fields, attempts, error = queue.fail.await_args.args
+    assert (message_id, fields["id"], attempts) == ("1-0", "abc", 2)
+    assert "boom" in error
+
+
+@pytest.mark.asyncio
+async def test_process_leaves_job_pending_when_redis_fails(queue, handler):
+    queue.start.side_effect = ConnectionError("redis is down")
+
+    await Worker(queue).process(*message())
+
+    handler.assert_not_awaited()
+    queue.complete.assert_not_awaited()
+    queue.fail.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_poll_fills_free_slots(queue):
+    queue.claim_stale.return_value = [message()]
+    queue.read.return_value = []
+    worker = Worker(queue, concurrency=4)
+    worker._spawn = MagicMock()
+
+    assert await worker.poll(claim=True) == 1
+
+    queue.promote_due.assert_awaited_once()
+    assert queue.read.await_args.args[1] == 3
+    worker._spawn.assert_called_once()
+
+
+def make_queue(redis_client):
+    redis_client.register_script.return_value = AsyncMock()
+    return JobQueue(redis_client, max_attempts=3, retry_base=10)
+
+
+def test_backoff_grows_exponentially():
+    queue = make_queue(MagicMock())
+
+    assert 9 <= queue.backoff(1) <= 11
+    assert 36 <= queue.backoff(3) <= 44
+    assert queue.backoff(30) <= 3600 * 1.1
+
+
+@pytest.mark.asyncio
+async def test_status():
+    redis_client = MagicMock()
+    redis_client.hgetall = AsyncMock(
+        return_value={
+            "name": "avatar.upload",
+            "status": "succeeded",
+            "attempts": "1",
+            "user_id": "7",
+            "result": '{"avatar": "https://example.com/a.png"}',
+            "error": "",
+            "created_at": "2025-01-01T00:00:00+00:00",
+            "updated_at": "2025-01-01T00:00:01+00:00",
+        }
+    )
+    queue = make_queue(redis_client)
+
+    job = await queue.status("abc")
+
+    redis_client.hgetall.assert_awaited_once_with("job:abc")
+    assert job["id"] == "abc"
+    assert job["attempts"] == 1
+    assert job["user_id"] == 7
+    assert job["result"] == {"avatar": "https://example.com/a.png"}
+    assert job["error"] is None
+
+
+@pytest.mark.asyncio
+async def test_status_unknown_job():
+    redis_client = MagicMock()
+    redis_client.hgetall = AsyncMock(return_value={})
+
+    assert await make_queue(redis_client).status("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_enqueue_once():
+    redis_client = MagicMock()
+    redis_client.set = AsyncMock(side_effect=[True, None])
+    queue = make_queue(redis_client)
+    queue.enqueue = AsyncMock(return_value="job1")
+
+    assert await queue.enqueue_once("birthdays.refresh", "2025-01-01") == "job1"
+    assert await queue.enqueue_once("birthdays.refresh", "2025-01-01") is None
+    queue.enqueue.assert_awaited_once_with("birthdays.refresh", None)
+    key = redis_client.set.await_args.args[0]
+    assert key.endswith(":once:birthdays.refresh:2025-01-01")
@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.services.rate_limit import RateLimiter, Rate, parse_rate
+
+
+@pytest.fixture
+def script():
+    return AsyncMock(return_value=[1, 0])
+
+
+@pytest.fixture
+def rate_limiter(script):
+    redis_client = MagicMock()
+    redis_client.register_script.return_value = script
+    return RateLimiter(
+        redis_client,
+        default="100/minute",
+        routes={"/api/users/me": "10/minute"},
+        lease_size=20,
+    )
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == Rate(10, 60)
+    assert parse_rate("5/seconds") == Rate(5, 1)
+    with pytest.raises(ValueError):
+        parse_rate("ten/minute")
+
+
+@pytest.mark.asyncio
+async def test_hit_spends_lease_locally(rate_limiter, script):
+    script.return_value = [10, 0]
+    rate = Rate(100, 60)
+
+    for _ in range(10):
+        assert await rate_limiter.hit("rl:ip:1:*", rate) == 0
+
+    script.assert_awaited_once()
+    assert script.await_args.kwargs["args"][2] == 10
+
+
+@pytest.mark.asyncio
+async def test_hit_rejected(rate_limiter, script):
+    script.return_value = [0, 1500]
+
+    assert await rate_limiter.hit("rl:ip:1:*", Rate(10, 60)) == 1.5
+
+
+@pytest.mark.asyncio
+async def test_hit_fails_open(rate_limiter, script):
+    script.side_effect = ConnectionError("redis is down")
+
+    assert await rate_limiter.hit("rl:ip:1:*", Rate(10, 60)) == 0
+    assert await rate_limiter.hit("rl:ip:1:*", Rate(10, 60)) == 0
+    script.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_check_applies_route_and_client_limits(rate_limiter, script):
+    scope = {
+        "type": "http",
+        "path": "/api/users/me",
+        "headers": [],
+        "client": ("10.0.0.1", 1),
+    }
+
+    await rate_limiter.check(scope)
+
+    keys = [call.kwargs["keys"][0] for call in script.await_args_list]
+    assert keys == ["rl:ip:10.0.0.1:/api/users/me", "rl:ip:10.0.0.1:*"]
+
+
+def test_limited_route_returns_429(client, get_token):
+    from src.services.rate_limit import limiter
+
+    original = limiter._script
+    limiter._script = AsyncMock(return_value=[0, 30000])
+    limiter._redis_down_until = 0.0
+    try:
+        response = client.get(
+            "/api/users/me", headers={"Authorization": f"Bearer {get_token}"}
+        )
+    finally:
+        limiter._script = original
+    assert response.status_code == 429, response.text
+    assert response.headers["Retry-After"] == "30"
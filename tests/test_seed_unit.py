@@ -0,0 +1,22 @@
+import random
+from datetime import date
+
+from src.database.seed import allocate_contacts, contact_row, transliterate
+
+
+def test_allocate_contacts_is_skewed_and_exact():
+    counts = allocate_contacts(random.Random(1), 1000, 100_000)
+
+    assert sum(counts) == 100_000
+    assert max(counts) > 10 * (100_000 / 1000)
+
+
+def test_contact_rows_are_reproducible():
+    first = [contact_row(random.Random(7), 1, date(2025, 1, 1)) for _ in range(3)]
+    second = [contact_row(random.Random(7), 1, date(2025, 1, 1)) for _ in range(3)]
+
+    assert first == second
+
+
+def test_transliterate():
+    assert transliterate("Шевченко") == "shevchenko"
@@ -0,0 +1,307 @@
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+
+from src.conf.config import settings
+from src.database.db import DatabaseSessionManager, ShardMap
+from src.database.models import (
+    Base,
+    Contact,
+    ContactTombstone,
+    DuplicateReport,
+    User,
+    UserShard,
+)
+from src.repositories.contacts import ContactRepository
+from src.repositories.shards import ShardRepository
+from src.schemas import ContactModel
+from src.services.shards import (
+    ShardMoveError,
+    UnregisteredShardError,
+    UserMovingError,
+    contact_session,
+    get_contact_db,
+    move_user,
+    register_shards,
+    resolve_shard,
+)
+
+UPDATED_AT = datetime(2025, 1, 1)
+
+
+def contact(contact_id: int, user_id: int, **values) -> dict:
+    return {
+        "id": contact_id,
+        "first_name": "Ivan",
+        "last_name": f"Petrenko{contact_id}",
+        "email": f"ivan{contact_id}@example.com",
+        "phone": f"050{contact_id:07d}",
+        "birthday": date(1990, 5, 17),
+        "user_id": user_id,
+        "updated_at": UPDATED_AT + timedelta(seconds=contact_id),
+        **values,
+    }
+
+
+@pytest_asyncio.fixture
+async def shards(tmp_path):
+    managers = {
+        name: DatabaseSessionManager(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        for name in ("global", "s1", "s2")
+    }
+    for manager in managers.values():
+        async with manager._engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    async with managers["global"].session() as db:
+        await db.execute(
+            insert(User),
+            [
+                {"id": i, "username": f"u{i}", "email": f"u{i}@example.com"}
+                for i in (1, 2)
+            ],
+        )
+        await db.commit()
+    shard_map = ShardMap(
+        managers["global"], {"s1": managers["s1"], "s2": managers["s2"]}
+    )
+    with (
+        patch("src.services.shards.shard_map", shard_map),
+        patch("src.services.shards.event_hub") as hub,
+        patch("src.services.shards.contact_cache") as cache,
+    ):
+        hub.publish = AsyncMock()
+        cache.bump = AsyncMock()
+        yield shard_map
+    for manager in managers.values():
+        await manager._engine.dispose()
+
+
+async def place(shards: ShardMap, user_id: int, shard: str) -> None:
+    async with shards.global_manager.session() as db:
+        await ShardRepository(db).assign(user_id, shard)
+        await db.commit()
+    async with shards.session(shard) as session:
+        await ShardRepository(session).add_user(user_id)
+        await session.commit()
+
+
+def test_place_is_deterministic(shards):
+    placements = [shards.place(user_id) for user_id in range(1, 101)]
+    assert placements == [shards.place(user_id) for user_id in range(1, 101)]
+    assert set(placements) == {"s1", "s2"}
+
+
+def test_unsharded_map():
+    manager = SimpleNamespace()
+    shard_map = ShardMap(manager)
+    assert not shard_map.sharded
+    assert shard_map.names == ["default"]
+    assert shard_map.is_global("default")
+
+
+@pytest.mark.asyncio
+async def test_resolve_shard_places_once(shards):
+    async with shards.global_manager.session() as db:
+        for index, name in enumerate(shards.names):
+            await ShardRepository(db).add_id_range(name, index + 1)
+        await db.commit()
+        placement = await resolve_shard(db, 1)
+        assert placement.shard == shards.place(1)
+        assert (await resolve_shard(db, 1)).shard == placement.shard
+        assert len((await db.scalars(select(UserShard))).all()) == 1
+    # The shard gets a row for the user, which its foreign keys point to
+    async with shards.session(placement.shard) as session:
+        assert await session.get(User, 1) is not None
+
+
+@pytest.mark.asyncio
+async def test_unmigrated_shards_are_not_placed_on(shards):
+    # Users from before sharding may have their data on the global database
+    async with shards.global_manager.session() as db:
+        with pytest.raises(UnregisteredShardError):
+            await resolve_shard(db, 1)
+        dependency = get_contact_db(SimpleNamespace(method="GET"), User(id=1), db)
+        with pytest.raises(HTTPException) as error:
+            await anext(dependency)
+        assert error.value.status_code == 503
+        assert await ShardRepository(db).get_placement(1) is None
+
+
+@pytest.mark.asyncio
+async def test_register_shards(shards, tmp_path):
+    span = settings.SHARD_ID_SPAN
+    # No shard shares the global database, which holds unplaced users
+    with pytest.raises(ShardMoveError):
+        await register_shards()
+
+    assert await register_shards(existing="s2") == {"s2": 1, "s1": span}
+    async with shards.global_manager.session() as db:
+        placements = (await db.scalars(select(UserShard))).all()
+        assert {(p.user_id, p.shard) for p in placements} == {(1, "s2"), (2, "s2")}
+
+    # Ranges stay with their shards when shards are added or reordered
+    added = DatabaseSessionManager(f"sqlite+aiosqlite:///{tmp_path / 'a0'}.db")
+    async with added._engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    reordered = ShardMap(
+        shards.global_manager,
+        {"a0": added, "s2": shards.shards["s2"], "s1": shards.shards["s1"]},
+    )
+    with patch("src.services.shards.shard_map", reordered):
+        assert await register_shards() == {"s2": 1, "s1": span, "a0": 2 * span}
+    await added._engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_get_contact_db(shards):
+    await place(shards, 1, "s2")
+    async with shards.global_manager.session() as db:
+        dependency = get_contact_db(SimpleNamespace(method="POST"), User(id=1), db)
+        session = await anext(dependency)
+        assert session.bind.url.database.endswith("s2.db")
+        await dependency.aclose()
+
+        await ShardRepository(db).set_moving(1, "s1")
+        await db.commit()
+        dependency = get_contact_db(SimpleNamespace(method="GET"), User(id=1), db)
+        assert (await anext(dependency)).bind.url.database.endswith("s2.db")
+        await dependency.aclose()
+        with pytest.raises(HTTPException) as error:
+            await anext(get_contact_db(SimpleNamespace(method="PUT"), User(id=1), db))
+        assert error.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_contact_session_refuses_users_being_moved(shards):
+    await place(shards, 1, "s2")
+    async with contact_session(1) as session:
+        assert session.bind.url.database.endswith("s2.db")
+
+    async with shards.global_manager.session() as db:
+        await ShardRepository(db).set_moving(1, "s1")
+        await db.commit()
+    with pytest.raises(UserMovingError):
+        async with contact_session(1):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_move_user(shards):
+    await place(shards, 1, "s1")
+    async with shards.session("s1") as session:
+        await session.execute(insert(Contact), [contact(i, 1) for i in (1, 2, 3)])
+        await session.execute(
+            insert(ContactTombstone),
+            {"contact_id": 4, "user_id": 1, "deleted_at": datetime(2025, 1, 2)},
+        )
+        session.add(
+            DuplicateReport(
+                user_id=1, computed_at=datetime(2025, 1, 3), clusters=[[1, 2]]
+            )
+        )
+        await session.commit()
+    await place(shards, 2, "s2")
+    async with shards.session("s2") as session:
+        await session.execute(insert(Contact), contact(100, 2))
+        await session.commit()
+
+    async def write_during_grace(seconds):
+        # A write that passed the check just before writes were refused
+        async with shards.session("s1") as session:
+            await session.execute(
+                update(Contact)
+                .where(Contact.id == 3)
+                .values(
+                    description="late", updated_at=UPDATED_AT + timedelta(seconds=3)
+                )
+            )
+            await session.commit()
+
+    with patch("src.services.shards.asyncio.sleep", write_during_grace):
+        result = await move_user(1, "s2", batch_size=2)
+    assert result["from"] == "s1" and result["to"] == "s2"
+
+    async with shards.session("s2") as session:
+        moved = (
+            await session.scalars(select(Contact).where(Contact.user_id == 1))
+        ).all()
+        assert [c.id for c in moved] == [1, 2, 3]
+        assert moved[2].description == "late"
+        tombstones = (await session.scalars(select(ContactTombstone))).all()
+        assert [(t.contact_id, t.user_id) for t in tombstones] == [(4, 1)]
+        assert (await session.get(DuplicateReport, 1)).clusters == [[1, 2]]
+    async with shards.session("s1") as session:
+        assert (await session.scalars(select(Contact))).all() == []
+        assert await session.get(User, 1) is None
+    async with shards.global_manager.session() as db:
+        placement = await db.get(UserShard, 1)
+        assert (placement.shard, placement.moving_to) == ("s2", None)
+
+
+async def create(shards: ShardMap, user_id: int) -> int:
+    async with shards.global_manager.session() as db:
+        shard = (await ShardRepository(db).get_placement(user_id)).shard
+    body = ContactModel(
+        first_name="Olena",
+        last_name="Koval",
+        email=f"olena{user_id}@example.com",
+        phone="0501234567",
+        birthday=date(1991, 3, 8),
+    )
+    async with shards.session(shard) as session:
+        contact = await ContactRepository(session).create_contact(
+            body, User(id=user_id)
+        )
+        return contact.id
+
+
+@pytest.mark.asyncio
+async def test_moves_keep_sqlite_ids_in_range(shards):
+    span = settings.SHARD_ID_SPAN
+    assert await register_shards(existing="s1") == {"s1": 1, "s2": span}
+    async with shards.session("s1") as session:
+        await ShardRepository(session).add_user(1)
+        await ShardRepository(session).add_user(2)
+        await session.commit()
+
+    assert await create(shards, 1) == 1
+    await move_user(1, "s2", grace_seconds=0)
+    # Not after the moved contact, nor in the range of s1, which is now empty
+    assert await create(shards, 1) == span
+    assert await create(shards, 2) == 2
+    await move_user(1, "s1", grace_seconds=0)
+    assert await create(shards, 2) == 3
+    await move_user(2, "s2", grace_seconds=0)
+    assert await create(shards, 2) == span + 1
+
+    async with shards.session("s1") as session:
+        ids = await session.scalars(select(Contact.id).order_by(Contact.id))
+        assert ids.all() == [1, span]
+    async with shards.session("s2") as session:
+        ids = await session.scalars(select(Contact.id).order_by(Contact.id))
+        assert ids.all() == [2, 3, span + 1]
+
+
+@pytest.mark.asyncio
+async def test_move_user_refuses_taken_ids(shards):
+    await place(shards, 1, "s1")
+    async with shards.session("s1") as session:
+        await session.execute(insert(Contact), [contact(i, 1) for i in (1, 2)])
+        await session.commit()
+    async with shards.session("s2") as session:
+        await session.execute(insert(Contact), contact(2, 2))
+        await session.commit()
+
+    with pytest.raises(ShardMoveError):
+        await move_user(1, "s2", grace_seconds=0)
+    async with shards.global_manager.session() as db:
+        placement = await db.get(UserShard, 1)
+        assert (placement.shard, placement.moving_to) == ("s1", None)
+    async with shards.session("s2") as session:
+        taken = await session.scalar(select(Contact).where(Contact.id == 2))
+        assert taken.user_id == 2
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database.models import Base
+from src.database.slow_query import SlowQueryLog, normalize_sql, parameters_shape
+from src.repositories.users import UserRepository
+
+
+def test_normalize_sql():
+    sql = "SELECT * FROM contacts WHERE user_id = $1 AND id IN (1, 2, 3)\n AND email ILIKE '%a%'"
+    assert (
+        normalize_sql(sql)
+        == "SELECT * FROM contacts WHERE user_id = ? AND id IN (...) AND email ILIKE ?"
+    )
+    assert (
+        normalize_sql("SELECT id FROM contacts WHERE id = :id::integer")
+        == "SELECT id FROM contacts WHERE id = ?::integer"
+    )
+
+
+def test_parameters_shape():
+    assert parameters_shape({"email": "a@b.c", "id": 1}) == {
+        "email": "str",
+        "id": "int",
+    }
+    assert parameters_shape([(1,), (2,)], executemany=True) == {
+        "rows": 2,
+        "row": ["int"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_slow_query_records_repository_method():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    log = SlowQueryLog(threshold_ms=0)
+    log.attach(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    log.clear()
+
+    async with async_sessionmaker(bind=engine)() as session:
+        await UserRepository(session).get_user_by_email("test@example.com")
+    await engine.dispose()
+
+    entry = log.entries()[0]
+    assert entry["caller"] == "db.UserRepository.get_user_by_email"
+    assert entry["sql"].startswith("SELECT users.id")
+    assert entry["parameters"] == ["str"]
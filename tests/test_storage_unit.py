@@ -0,0 +1,123 @@
+import struct
+import zlib
+from io import BytesIO
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from src.services.storage import LocalStorage, S3Storage, get_storage
+from src.services.upload_file import (
+    UploadLimitMiddleware,
+    check_image,
+    resize_variants,
+)
+
+
+@pytest.mark.asyncio
+async def test_local_storage(tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media/")
+
+    await storage.save("avatars/abc/md.webp", b"data", "image/webp")
+
+    assert (tmp_path / "avatars" / "abc" / "md.webp").read_bytes() == b"data"
+    assert storage.url("avatars/abc/md.webp") == "/media/avatars/abc/md.webp"
+
+
+@pytest.mark.asyncio
+async def test_s3_storage():
+    client = boto3.client(
+        "s3",
+        region_name="us-east-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    storage = S3Storage("avatars", "https://cdn.example.com/", client)
+
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "put_object",
+            {},
+            {
+                "Bucket": "avatars",
+                "Key": "avatars/abc/md.webp",
+                "Body": b"data",
+                "ContentType": "image/webp",
+                "CacheControl": ANY,
+            },
+        )
+        await storage.save("avatars/abc/md.webp", b"data", "image/webp")
+        stubber.assert_no_pending_responses()
+
+    assert storage.url("avatars/abc/md.webp") == (
+        "https://cdn.example.com/avatars/abc/md.webp"
+    )
+
+
+def test_get_storage_unknown():
+    with pytest.raises(ValueError):
+        get_storage("ftp")
+
+
+def test_resize_variants_crops_to_squares():
+    buffer = BytesIO()
+    Image.new("RGBA", (800, 400), (0, 0, 255, 128)).save(buffer, "PNG")
+
+    variants = resize_variants(buffer.getvalue(), {"sm": 32, "lg": 256})
+
+    for name, size in (("sm", 32), ("lg", 256)):
+        with Image.open(BytesIO(variants[name])) as image:
+            assert image.format == "WEBP"
+            assert image.size == (size, size)
+
+
+def png_header(width: int, height: int) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IEND", b"")
+
+
+def test_check_image_refuses_decompression_bombs():
+    with pytest.raises(HTTPException) as error:
+        check_image(png_header(20000, 20000), 40_000_000)
+    assert error.value.status_code == 400
+
+
+def upload_app(limit: int) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File()):
+        return {"size": len(await file.read())}
+
+    return TestClient(UploadLimitMiddleware(app, {"/upload": limit}))
+
+
+def test_upload_limit_refuses_by_content_length():
+    client = upload_app(1000)
+    response = client.post("/upload", files={"file": ("a.bin", b"x" * 100)})
+    assert response.json() == {"size": 100}
+    response = client.post("/upload", files={"file": ("a.bin", b"x" * 5000)})
+    assert response.status_code == 413
+
+
+def test_upload_limit_refuses_streamed_body():
+    client = upload_app(1000)
+    body = b"--b\r\nContent-Disposition: form-data; name=file; filename=a.bin\r\n\r\n"
+    chunks = [body, *[b"x" * 500] * 10, b"\r\n--b--\r\n"]
+    response = client.post(
+        "/upload",
+        content=iter(chunks),
+        headers={"Content-Type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
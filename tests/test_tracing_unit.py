@@ -0,0 +1,77 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.services.tracing import (
+    Exporter,
+    FileExporter,
+    TracingMiddleware,
+    span,
+    traced,
+)
+
+
+class ListExporter(Exporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace: dict) -> None:
+        self.traces.append(trace)
+
+
+@traced("db.lookup")
+async def lookup():
+    with span("redis.exists"):
+        return 42
+
+
+def build_client(sample_rate, exporter):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"value": await lookup()}
+
+    app.add_middleware(TracingMiddleware, sample_rate=sample_rate, exporter=exporter)
+    return TestClient(app)
+
+
+def test_sampled_request_has_server_timing():
+    exporter = ListExporter()
+    response = build_client(1.0, exporter).get("/items/1")
+
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert "db.lookup;dur=" in timing
+    assert "redis.exists;dur=" in timing
+    assert "total;dur=" in timing
+
+    trace = exporter.traces[0]
+    assert trace["name"] == "GET /items/{item_id}"
+    spans = {s["name"]: s for s in trace["spans"]}
+    assert spans["redis.exists"]["parent"] == "db.lookup"
+    assert spans["db.lookup"]["parent"] is None
+
+
+def test_unsampled_request_is_not_traced():
+    exporter = ListExporter()
+    response = build_client(0.0, exporter).get("/items/1")
+
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+    assert exporter.traces == []
+
+
+def test_file_exporter_writes_batches_off_the_request(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = FileExporter(str(path), flush_interval=60)
+    response = build_client(1.0, exporter).get("/items/1")
+    build_client(1.0, exporter).get("/items/2")
+
+    assert response.status_code == 200
+    # Still buffered, until the interval passes or the app shuts down
+    assert not path.exists()
+    exporter.close()
+    traces = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [trace["name"] for trace in traces] == ["GET /items/{item_id}"] * 2
@@ -39,6 +39,39 @@ async def test_create_user(users_repository, mock_session):
     assert user.hashed_password == "password"
 
 
+@pytest.mark.asyncio
+async def test_create_user_if_absent(users_repository, mock_session, user):
+    body = UserCreate(username="testuser", email="test@example.com", password="hashed")
+    mock_session.get_bind = MagicMock()
+    mock_session.get_bind.return_value.dialect.name = "sqlite"
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = user
+    mock_session.scalars.return_value = mock_result
+
+    result = await users_repository.create_user_if_absent(body)
+
+    assert result is user
+    sql = str(mock_session.scalars.await_args.args[0])
+    assert "ON CONFLICT DO NOTHING" in sql
+    assert "RETURNING" in sql
+    mock_session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_conflicting_field(users_repository, mock_session):
+    mock_result = MagicMock()
+    mock_session.scalars.return_value = mock_result
+
+    mock_result.all.return_value = ["test@example.com"]
+    assert await users_repository.get_conflicting_field("test@example.com", "x") == "email"
+
+    mock_result.all.return_value = ["other@example.com"]
+    assert await users_repository.get_conflicting_field("test@example.com", "x") == "username"
+
+    mock_result.all.return_value = []
+    assert await users_repository.get_conflicting_field("test@example.com", "x") is None
+
+
 @pytest.mark.asyncio
 async def test_get_user_by_id(users_repository, mock_session, user):
     mock_result = MagicMock()
@@ -75,49 +108,65 @@ async def test_get_user_by_email(users_repository, mock_session, user):
     assert result.email == "test@example.com"
 
 
+def mock_update(mock_session, user):
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = user
+    mock_session.scalars.return_value = mock_result
+
+
+def assert_single_update(mock_session, column):
+    mock_session.scalars.assert_awaited_once()
+    mock_session.execute.assert_not_awaited()
+    mock_session.refresh.assert_not_awaited()
+    mock_session.commit.assert_awaited_once()
+    sql = str(mock_session.scalars.await_args.args[0])
+    assert sql.startswith("UPDATE users SET")
+    assert f"{column}=" in sql
+    assert "RETURNING" in sql
+
+
 @pytest.mark.asyncio
 async def test_confirmed_email(users_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = user
-    mock_session.execute.return_value = mock_result
+    mock_update(mock_session, user)
 
-    await users_repository.confirmed_email("test@example.com")
+    result = await users_repository.confirmed_email("test@example.com")
 
-    user = await users_repository.get_user_by_email("test@example.com")
-    assert user.confirmed is True
+    assert result is user
+    assert_single_update(mock_session, "confirmed")
 
 
 @pytest.mark.asyncio
 async def test_update_avatar_url(users_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = user
-    mock_session.execute.return_value = mock_result
+    mock_update(mock_session, user)
 
     updated_user = await users_repository.update_avatar_url("test@example.com", "new_avatar_url")
 
-    user = await users_repository.get_user_by_email("test@example.com")
-    assert updated_user.avatar == "new_avatar_url"
+    assert updated_user is user
+    assert_single_update(mock_session, "avatar")
 
 
 @pytest.mark.asyncio
 async def test_reset_password(users_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = user
-    mock_session.execute.return_value = mock_result
+    mock_update(mock_session, user)
 
     updated_user = await users_repository.reset_password("test@example.com")
 
-    user = await users_repository.get_user_by_email("test@example.com")
-    assert updated_user.hashed_password is None
+    assert updated_user is user
+    assert_single_update(mock_session, "hashed_password")
 
 
 @pytest.mark.asyncio
 async def test_update_password(users_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = user
-    mock_session.execute.return_value = mock_result
+    mock_update(mock_session, user)
 
     updated_user = await users_repository.update_password("test@example.com", "new_password")
 
-    user = await users_repository.get_user_by_email("test@example.com")
-    assert updated_user.hashed_password == "new_password"
\ No newline at end of file
+    assert updated_user is user
+    assert_single_update(mock_session, "hashed_password")
+
+
+@pytest.mark.asyncio
+async def test_update_missing_user(users_repository, mock_session):
+    mock_update(mock_session, None)
+
+    assert await users_repository.update_password("missing@example.com", "x") is None
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import importlib
+import logging
+import signal
+
+from src.conf.config import settings
+from src.services.jobs import TASK_MODULES, Worker, job_queue, run_daily, tasks
+
+
+async def run(concurrency: int, outbox: bool):
+    worker = Worker.from_settings(job_queue)
+    worker.concurrency = concurrency
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    background = [
+        asyncio.create_task(
+            run_daily(job_queue, "birthdays.refresh", settings.BIRTHDAYS_REFRESH_HOUR)
+        )
+    ]
+    if outbox:
+        from src.services.email import get_dispatcher
+
+        # Sweeps up emails whose delivery job could not be queued
+        background.append(asyncio.create_task(get_dispatcher().run_forever()))
+    try:
+        await worker.run()
+    finally:
+        for job in background:
+            job.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs")
+    parser.add_argument("--concurrency", type=int, default=settings.JOBS_CONCURRENCY)
+    parser.add_argument(
+        "--no-outbox",
+        action="store_true",
+        help="do not poll the email outbox in this process",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+    logging.info("Worker running jobs: %s", ", ".join(sorted(tasks)))
+    asyncio.run(run(args.concurrency, not args.no_outbox))